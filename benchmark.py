@@ -0,0 +1,606 @@
+
+#
+# Program: benchmark.py
+#
+# Purpose:
+#
+#	Time the assayload library routines on large input files.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	benchmark.py makeresults fileName megabytes
+#		writes a synthetic In_Situ_results.txt style file of about
+#		the given size (use a few thousand MB for a multi-GB test)
+#
+#	benchmark.py tokenize fileName nColumns
+#		reads fileName with readlines() and str.split() per line (the
+#		loaders' former reader) and with tabfilelib.validate() + readRows(),
+#		each in a child process, and reports the elapsed time, throughput
+#		and peak memory of each
+#
+#	benchmark.py compress fileName nColumns
+#		writes a compressed copy of fileName at each of levels (gz, and
+#		zst if zstandard is installed), reads it back with tabfilelib,
+#		and reports the size, write and read throughput of each against
+#		the plain file (MB/sec of uncompressed data)
+#
+#	benchmark.py copy bcpFile repeats
+#		converts a tab-delimited bcp file of a load (e.g.
+#		GXD_InSituResult.bcp) to the binary COPY format, COPYs each
+#		from memory into a temporary copy of its table the given
+#		number of times, and reports the conversion time and the best
+#		load time and rate of each format
+#
+#	benchmark.py startup check|record [budgetFile]
+#		times the imports of each entry point (entryPoints), i.e. the
+#		time to its first line of work, with python -X importtime;
+#		budgetFile defaults to ${ASSAYLOAD}/startup.budget, the budget
+#		shipped with the load
+#		record:  writes the times and imported modules to budgetFile
+#		check:   exits 1 if an entry point exceeds its budget:  it
+#			 is slower (by more than startupTolerance and
+#			 startupSlack), or imports an MGI library (db,
+#			 loadlib, ...) or other package its budget does not
+#			 have; the other modules it imports that its budget
+#			 does not have are listed, and an entry point that is
+#			 not in budgetFile is reported, but neither fails
+#		Only the time of the load's own modules and of the standard
+#		library modules they import is counted, not that of the MGI
+#		libraries or other packages, so the budget does not depend on
+#		their versions; it does depend on the machine, so re-record it
+#		if the loads run on a slower one, and when an import is added
+#		on purpose.
+#
+# Envvars:
+#
+#	ASSAYLOAD
+#	MGD_DBSERVER, MGD_DBNAME, MGD_DBUSER, MGD_DBPASSWORDFILE (copy)
+#
+# Inputs:
+#
+# Outputs:
+#
+#	timings, to stdout
+#
+# Exit Codes:
+#
+#	0 on success, 1 on a usage error or a startup regression
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	The imports of an entry point are its leading lines, up to its last
+#	top-level import (the sys.path set up included); they are run by a
+#	new interpreter startupRepeats times, and the least of the sums of
+#	the self times of the modules it imports is the entry point's time.
+#	A module that is neither in the load nor in the standard library
+#	(sys.stdlib_module_names), and the modules it imports, are not
+#	timed (the module itself is in the module list); nor are the
+#	interpreter's own startup imports.
+#
+
+import sys
+import os
+import time
+import resource
+
+libpath = os.environ['ASSAYLOAD'] + '/lib'
+sys.path.insert(0, libpath)
+import tabfilelib
+import compresslib
+import pgbinarylib
+
+#globals
+
+TAB = '\t'		# tab
+CRT = '\n'		# carriage return/newline
+
+usage = '''Usage:
+	benchmark.py makeresults fileName megabytes
+	benchmark.py tokenize fileName nColumns
+	benchmark.py compress fileName nColumns
+	benchmark.py copy bcpFile repeats
+	benchmark.py startup check|record [budgetFile]
+'''
+
+levels = ['none', 'gz:1', 'gz:6', 'gz:9', 'zst:1', 'zst:3', 'zst:9', 'zst:19']	# compress
+
+entryPoints = [		# startup
+    'insituload.py', 'immunoload.py', 'gelload.py', 'indexload.py',
+    'insituconvert.py', 'rnainsitu10.py', 'rnainsitu14.py',
+    'validateload.py', 'snapshot.py', 'refreshCaches.py',
+    'createPrbReference.py', 'updatePutative.py',
+    ]
+startupRepeats = 5		# number of times each entry point's imports are timed
+startupTolerance = 1.5		# a time within budget * startupTolerance + startupSlack passes
+startupSlack = 10.0		# milliseconds
+startupMarker = '--- imports'	# written to stderr before an entry point's imports
+startupBudget = 'startup.budget'	# default budget file, in ${ASSAYLOAD}
+
+copyTypes = {		# column type oid : pgbinarylib type (copy)
+    23 : 'int4',
+    25 : 'text',
+    1043 : 'text',	# varchar
+    1114 : 'timestamp',
+    }
+
+# Purpose:  writes a synthetic In_Situ results file
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  writes the file
+# Throws:   nothing
+
+def makeResults(
+    fileName,	# output file name (str.
+    megabytes	# approximate size of the file (integer)
+    ):
+
+    strengths = ['Absent', 'Weak', 'Moderate', 'Strong', 'Present']
+    patterns = ['Homogeneous', 'Regionally restricted', 'Not Applicable']
+
+    size = megabytes * 1048576
+    written = 0
+    assay = 1
+
+    fp = open(fileName, 'w')
+
+    while written < size:
+        lines = []
+        for result in range(1, 44):
+            lines.append(TAB.join([str(assay), '1', str(result),
+                strengths[result % len(strengths)], patterns[result % len(patterns)],
+                'EMAPA:%d' % (16000 + result), str(20 + result % 5), '', '1|A']) + CRT)
+        block = ''.join(lines)
+        fp.write(block)
+        written = written + len(block)
+        assay = assay + 1
+
+    fp.close()
+
+# Purpose:  reads a file the way the loaders used to
+# Returns:  generator of (line number, tokens)
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   nothing
+
+def splitRows(
+    fileName,	# input file name (str.
+    nColumns	# minimum number of fields per line (integer)
+    ):
+
+    lineNum = 0
+    fp = open(fileName, 'r')
+    for line in fp.readlines():
+        lineNum = lineNum + 1
+        tokens = str.split(line[:-1], TAB)
+        if len(tokens) < nColumns:
+            break
+        yield lineNum, tokens
+    fp.close()
+
+# Purpose:  reads a file the way the loaders used to
+# Returns:  number of rows (integer)
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   nothing
+
+def splitReader(
+    fileName,	# input file name (str.
+    nColumns	# minimum number of fields per line (integer)
+    ):
+
+    rows = 0
+    for lineNum, tokens in splitRows(fileName, nColumns):
+        rows = rows + 1
+    return rows
+
+# Purpose:  reads a file with tabfilelib
+# Returns:  number of rows (integer)
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   nothing
+
+def tabfileReader(
+    fileName,	# input file name (str.
+    nColumns	# minimum number of fields per line (integer)
+    ):
+
+    rows = 0
+    if len(tabfilelib.validate(fileName, nColumns)) > 0:
+        return rows
+    for lineNum, tokens in tabfilelib.readRows(fileName, nColumns):
+        rows = rows + 1
+    return rows
+
+# Purpose:  times a reader
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  runs the reader in a child process, so that its peak
+#	    memory is its own; prints the elapsed time, throughput
+#	    and peak memory
+# Throws:   nothing
+
+def timeReader(
+    name,	# reader name (str.
+    reader,	# reader function
+    fileName,	# input file name (str.
+    nColumns	# minimum number of fields per line (integer)
+    ):
+
+    sys.stdout.flush()
+
+    pid = os.fork()
+    if pid > 0:
+        os.waitpid(pid, 0)
+        return
+
+    megabytes = os.path.getsize(fileName) / 1048576.0
+    start = time.time()
+    rows = reader(fileName, nColumns)
+    elapsed = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print('%-10s %10d rows %8.2f sec %8.1f MB/sec %8.1f MB peak' \
+        % (name, rows, elapsed, megabytes / max(elapsed, 0.000001), peak))
+    sys.stdout.flush()
+    os._exit(0)
+
+# Purpose:  times the compression levels
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  writes and removes a compressed copy of the file for each
+#	    level; prints the size, write and read throughput of each
+# Throws:   nothing
+
+def timeCompression(
+    fileName,	# input file name (str.
+    nColumns	# minimum number of fields per line (integer)
+    ):
+
+    megabytes = os.path.getsize(fileName) / 1048576.0
+
+    for level in levels:
+
+        try:
+            suffix, n = compresslib.parseCompression(level)
+        except ValueError as message:
+            print(message)
+            continue
+
+        if suffix == '':
+            copyName = fileName
+            writeTime = 0.0
+        else:
+            copyName = fileName + suffix
+            start = time.time()
+            inFile = open(fileName, 'rb')
+            outFile = compresslib.openFile(copyName, 'wb', n)
+            for block in iter(lambda: inFile.read(tabfilelib.blockSize), b''):
+                outFile.write(block)
+            outFile.close()
+            inFile.close()
+            writeTime = time.time() - start
+
+        start = time.time()
+        rows = tabfileReader(copyName, nColumns)
+        readTime = time.time() - start
+
+        size = os.path.getsize(copyName) / 1048576.0
+        if suffix != '':
+            os.remove(copyName)
+
+        if writeTime > 0:
+            write = '%8.1f MB/sec write' % (megabytes / writeTime)
+        else:
+            write = '%8s MB/sec write' % ('-')
+
+        print('%-8s %10d rows %10.1f MB %6.1f%% %s %8.1f MB/sec read' \
+            % (level, rows, size, 100.0 * size / max(megabytes, 0.000001),
+               write, megabytes / max(readTime, 0.000001)))
+        sys.stdout.flush()
+
+# Purpose:  times COPY of a bcp file in the text and binary formats
+# Returns:  nothing
+# Assumes:  the table of the bcp file (its name up to the first .) is in mgd
+# Effects:  COPYs the rows into a temporary table, which is dropped
+#	    (rolled back) at the end; prints the conversion time and the
+#	    best COPY time of each format
+# Throws:   nothing
+
+def timeCopy(
+    fileName,	# tab-delimited bcp file name (str.
+    repeats	# number of times each format is loaded (integer)
+    ):
+
+    import io
+    import psycopg2
+
+    table = str.split(os.path.basename(fileName), '.')[0]
+
+    fp = open(os.environ['MGD_DBPASSWORDFILE'], 'r')
+    password = str.strip(fp.readline())
+    fp.close()
+
+    conn = psycopg2.connect(host = os.environ['MGD_DBSERVER'], dbname = os.environ['MGD_DBNAME'],
+        user = os.environ['MGD_DBUSER'], password = password)
+    cursor = conn.cursor()
+
+    cursor.execute('create temp table benchmark (like mgd.%s)' % (table))
+    cursor.execute('select * from benchmark limit 0')
+
+    columnTypes = []
+    for column in cursor.description:
+        if column.type_code not in copyTypes:
+            print('%s.%s: type %d cannot be written in binary' % (table, column.name, column.type_code))
+            conn.rollback()
+            conn.close()
+            return
+        columnTypes.append(copyTypes[column.type_code])
+
+    fp = open(fileName, 'rb')
+    textData = fp.read()
+    fp.close()
+
+    start = time.time()
+    rows = 0
+    binaryData = io.BytesIO()
+    binaryData.write(pgbinarylib.header)
+    for line in str.split(textData.decode(pgbinarylib.encoding), CRT):
+        if line == '':
+            continue
+        binaryData.write(pgbinarylib.encodeRow(columnTypes, str.split(line, TAB)))
+        rows = rows + 1
+    binaryData.write(pgbinarylib.trailer)
+    binaryData = binaryData.getvalue()
+    print('%-8s %10d rows %8.2f sec to convert' % ('binary', rows, time.time() - start))
+
+    for name, data, cmd in (
+        ('text', textData, 'copy benchmark from stdin with null as \'\''),
+        ('binary', binaryData, 'copy benchmark from stdin with binary'),
+        ):
+
+        best = None
+        for i in range(repeats):
+            cursor.execute('truncate benchmark')
+            start = time.time()
+            cursor.copy_expert(cmd, io.BytesIO(data))
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+
+        print('%-8s %10d rows %10.1f MB %8.2f sec %10.0f rows/sec' \
+            % (name, rows, len(data) / 1048576.0, best, rows / max(best, 0.000001)))
+        sys.stdout.flush()
+
+    conn.rollback()
+    conn.close()
+
+# Purpose:  returns the imports of an entry point
+# Returns:  source code (str.
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   IOError if the file cannot be read
+
+def prologue(
+    fileName	# entry point file name (str.
+    ):
+
+    import ast
+
+    fp = open(fileName, 'r')
+    source = fp.read()
+    fp.close()
+
+    lastLine = 0
+    for statement in ast.parse(source).body:
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            lastLine = statement.end_lineno
+
+    return ''.join(source.splitlines(True)[:lastLine])
+
+# Purpose:  returns the modules of the load
+# Returns:  set of module names
+# Assumes:  nothing
+# Effects:  lists ${ASSAYLOAD} and ${ASSAYLOAD}/lib
+# Throws:   nothing
+
+def loadModules():
+
+    modules = set()
+
+    for directory in (os.environ['ASSAYLOAD'], libpath):
+        for fileName in os.listdir(directory):
+            if fileName.endswith('.py'):
+                modules.add(fileName[:-3])
+
+    return modules
+
+# Purpose:  tells whether a module is neither in the load nor in the
+#	    standard library (e.g. an MGI library)
+# Returns:  boolean
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def isOther(
+    name,	# module name (str.
+    ownModules	# modules of the load (set; see loadModules())
+    ):
+
+    package = str.split(name, '.')[0]
+
+    return package not in ownModules and package not in sys.stdlib_module_names
+
+# Purpose:  times the imports of an entry point once
+# Returns:  (milliseconds, set of the modules imported), or None if the
+#	    imports fail; only the modules of the load (ownModules) and the
+#	    standard library modules they import are timed
+# Assumes:  nothing
+# Effects:  runs the imports in a new interpreter
+# Throws:   nothing
+
+def importTime(
+    fileName,	# entry point file name (str.
+    ownModules	# modules of the load (set; see loadModules())
+    ):
+
+    import subprocess
+
+    code = 'import sys\nsys.stderr.write(%r)\n%s' % (startupMarker + '\n', prologue(fileName))
+    p = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+        stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, universal_newlines = True)
+
+    if p.returncode != 0:
+        sys.stderr.write(p.stderr)
+        return None
+
+    imports = []	# (depth, module, self microseconds), in the order -X importtime writes them
+    lines = str.split(p.stderr, CRT)
+
+    for line in lines[lines.index(startupMarker) + 1:]:
+        if not line.startswith('import time:'):
+            continue
+        fields = str.split(line, '|')
+        if not fields[1].strip().isdigit():
+            continue		# the header line
+        name = fields[2][1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((depth, name.strip(), int(str.split(fields[0], ':')[1])))
+
+    # a module is written after the modules it imports, so in reverse
+    # each module comes before its imports
+
+    micros = 0
+    modules = set()
+    other = []		# depths of the enclosing modules that are not timed
+
+    for depth, name, selfMicros in reversed(imports):
+        while len(other) > 0 and other[-1] >= depth:
+            other.pop()
+        if len(other) > 0:
+            continue
+        modules.add(name)
+        if isOther(name, ownModules):
+            other.append(depth)
+            continue
+        micros = micros + selfMicros
+
+    return micros / 1000.0, modules
+
+# Purpose:  times the imports of the entry points against a budget
+# Returns:  number of entry points that exceed their budget or whose
+#	    imports fail (integer); check:  all of them if budgetFile is
+#	    missing or empty
+# Assumes:  nothing
+# Effects:  record:  writes budgetFile (entry point, milliseconds,
+#	    comma-separated modules); check:  reads it
+#	    prints the time of each entry point
+# Throws:   IOError if budgetFile cannot be read or written
+
+def timeStartup(
+    action,		# check or record (str.
+    budgetFileName	# budget file name (str.
+    ):
+
+    budget = {}
+    if action == 'check':
+        if os.path.exists(budgetFileName):
+            fp = open(budgetFileName, 'r')
+            for line in fp.readlines():
+                tokens = str.split(line[:-1], TAB)
+                budget[tokens[0]] = (float(tokens[1]), set(str.split(tokens[2], ',')))
+            fp.close()
+        if len(budget) == 0:
+            sys.stderr.write('No startup budget in %s; record one first:\n' \
+                '\tbenchmark.py startup record %s\n' % (budgetFileName, budgetFileName))
+            return len(entryPoints)
+
+    regressions = 0
+    results = []
+    ownModules = loadModules()
+
+    for entryPoint in entryPoints:
+
+        fileName = os.path.join(os.environ['ASSAYLOAD'], entryPoint)
+        best = None
+        for i in range(startupRepeats):
+            result = importTime(fileName, ownModules)
+            if result is None:
+                break
+            if best is None or result[0] < best[0]:
+                best = result
+
+        if best is None:
+            print('%-24s imports failed' % (entryPoint))
+            regressions = regressions + 1
+            continue
+
+        milliseconds, modules = best
+        results.append((entryPoint, milliseconds, modules))
+
+        if action == 'record':
+            print('%-24s %8.1f ms %5d modules' % (entryPoint, milliseconds, len(modules)))
+            continue
+
+        if entryPoint not in budget:
+            print('%-24s %8.1f ms %5d modules  not in %s' % (entryPoint, milliseconds, len(modules), budgetFileName))
+            continue
+
+        budgetTime, budgetModules = budget[entryPoint]
+        status = []
+        newModules = sorted(modules - budgetModules)
+        newOther = [m for m in newModules if isOther(m, ownModules)]
+        if milliseconds > budgetTime * startupTolerance + startupSlack:
+            status.append('slower than the budget')
+        if len(newOther) > 0:
+            status.append('imports %s, which the budget does not' % (','.join(newOther)))
+        if len(status) > 0:
+            regressions = regressions + 1
+        if len(newOther) < len(newModules):
+            status.append('new imports: %s' % (','.join([m for m in newModules if m not in newOther])))
+
+        print('%-24s %8.1f ms %5d modules  budget %8.1f ms %5d modules  %s' \
+            % (entryPoint, milliseconds, len(modules), budgetTime, len(budgetModules),
+               '; '.join(status) or 'ok'))
+        sys.stdout.flush()
+
+    if action == 'record':
+        fp = open(budgetFileName, 'w')
+        for entryPoint, milliseconds, modules in results:
+            fp.write('%s\t%.1f\t%s\n' % (entryPoint, milliseconds, ','.join(sorted(modules))))
+        fp.close()
+
+    return regressions
+
+#
+# Main
+#
+
+if len(sys.argv) == 3 and sys.argv[1] == 'startup':
+    sys.argv.append(os.path.join(os.environ['ASSAYLOAD'], startupBudget))
+
+if len(sys.argv) != 4:
+    sys.stderr.write(usage)
+    sys.exit(1)
+
+if sys.argv[1] == 'makeresults':
+    makeResults(sys.argv[2], int(sys.argv[3]))
+elif sys.argv[1] == 'tokenize':
+    timeReader('split', splitReader, sys.argv[2], int(sys.argv[3]))
+    timeReader('tabfile', tabfileReader, sys.argv[2], int(sys.argv[3]))
+elif sys.argv[1] == 'compress':
+    timeCompression(sys.argv[2], int(sys.argv[3]))
+elif sys.argv[1] == 'copy':
+    timeCopy(sys.argv[2], int(sys.argv[3]))
+elif sys.argv[1] == 'startup' and sys.argv[2] in ('check', 'record'):
+    if timeStartup(sys.argv[2], sys.argv[3]) > 0:
+        sys.exit(1)
+else:
+    sys.stderr.write(usage)
+    sys.exit(1)
+
+sys.exit(0)
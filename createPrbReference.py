@@ -0,0 +1,126 @@
+
+#
+# Program: createPrbReference.py
+#
+# Purpose:
+#
+#	Create the Probe Reference (PRB_Reference) records of new GXD
+#	Assays:  for each reference, associate it with each probe of its
+#	assays' probe preps that is not yet associated with it.
+#
+#	All of the references are done in one batch (see lib/postloadlib.py).
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	createPrbReference.py J:##### [J:##### ...]
+#	createPrbReference.py -m manifestFile
+#
+#	-m	the references of the assays loaded by the load of the
+#		manifest file (e.g. insituload.manifest)
+#
+# Envvars:
+#
+#	ASSAYLOAD
+#	MGD_DBUSER
+#	MGD_DBPASSWORDFILE
+#	CREATEDBY	login of the creator of the records; default is mgd_dbo
+#
+# Inputs:
+#
+# Outputs:
+#
+#	the number of records created for each reference, to stdout
+#
+# Exit Codes:
+#
+#	0 on success, 1 on a usage error or an unknown reference
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	Replaces the body of createPrbReference.csh, which handled one
+#	J: number per run and is now a wrapper for this program.
+#
+
+import sys
+import os
+import getopt
+import loadlib
+
+libpath = os.environ['ASSAYLOAD'] + '/lib'
+sys.path.insert(0, libpath)
+import postloadlib
+
+#globals
+
+usage = '''Usage: createPrbReference.py J:##### [J:##### ...]
+       createPrbReference.py -m manifestFile
+'''
+
+createdBy = os.environ.get('CREATEDBY', 'mgd_dbo')
+
+# Purpose: prints error message and exits
+# Returns: nothing
+# Assumes: nothing
+# Effects: exits with exit status
+# Throws: nothing
+
+def exit(
+    status,          # numeric exit status (integer)
+    message = None   # exit message (str.
+    ):
+
+    if message is not None:
+        sys.stderr.write('\n' + str(message) + '\n')
+
+    sys.exit(status)
+
+#
+# Main
+#
+
+try:
+    options, args = getopt.getopt(sys.argv[1:], 'm:')
+except getopt.GetoptError:
+    exit(1, usage)
+
+manifestFileName = None
+for option, value in options:
+    if option == '-m':
+        manifestFileName = value
+
+if (manifestFileName is None) == (len(args) == 0):
+    exit(1, usage)
+
+postloadlib.init()
+
+createdByKey = loadlib.verifyUser(createdBy, 0, sys.stderr)
+if createdByKey == 0:
+    exit(1, 'Invalid User: %s\n' % (createdBy))
+
+if manifestFileName is None:
+    refs, missing = postloadlib.referenceKeys(args)
+    if len(missing) > 0:
+        exit(1, 'Invalid Reference(s): %s\n' % (', '.join(missing)))
+else:
+    try:
+        refs = postloadlib.loadedReferences(manifestFileName)
+    except (IOError, OSError):
+        exit(1, 'Could not open file %s\n' % (manifestFileName))
+
+postloadlib.setReferences(refs)
+counts = postloadlib.createPrbReference(createdByKey)
+
+total = 0
+for jnum in sorted(refs):
+    n = counts.get(refs[jnum], 0)
+    total = total + n
+    print('%s\t%d PRB_Reference record(s) created' % (jnum, n))
+print('Total\t%d PRB_Reference record(s) created for %d reference(s)' % (total, len(refs)))
+
+sys.exit(0)
@@ -19,6 +19,9 @@
 # Envvars:
 #
 #	LOADFILE5	marker notes; leave blank if not individual notes are needed
+#	ASSAYLOADPROFILE	yes: profile each stage (lib/profilelib.py); default is no
+#	ASSAYLOADMEMORYREPORT	yes: report the memory of each stage (lib/profilelib.py);
+#				default is no
 #
 # Inputs:
 #
@@ -52,14 +55,11 @@
 
 import sys
 import os
-import string
-import db
 import mgi_utils
-import loadlib
 
 libpath = os.environ['ASSAYLOAD'] + '/lib'
 sys.path.insert(0, libpath)
-import gxdloadlib
+import profilelib
 
 #
 # from configuration file
@@ -107,7 +107,7 @@ commentsLookup = {}
 
 # constants
 
-loaddate = loadlib.loaddate
+loaddate = ''		# loadlib.loaddate (init())
 
 # Purpose: prints error message and exits
 # Returns: nothing
@@ -137,6 +137,8 @@ def exit(
 # Returns: nothing
 # Assumes: nothing
 # Effects: initializes global variables
+#          imports the database libraries (db, loadlib, gxdloadlib)
+#          as globals of this module
 #          exits if files cannot be opened
 # Throws: nothing
 
@@ -144,6 +146,13 @@ def init():
     global diagFile, errorFile, errorFileName, diagFileName
     global inCommentsFile, outIndexFile, outStagesFile
     global referenceKey, priorityKey, createdByKey, indexComments
+    global db, loadlib, gxdloadlib, loaddate
+
+    import db
+    import loadlib
+    import gxdloadlib
+
+    loaddate = loadlib.loaddate
  
     diagFileName = 'indexload.diagnostics'
     errorFileName = 'indexload.error'
@@ -157,6 +166,9 @@ def init():
         errorFile = open(errorFileName, 'w')
     except:
         exit(1, 'Could not open file %s\n' % errorFileName)
+
+    profilelib.init('indexload', diagFile)
+    profilelib.watch(sys.modules[__name__], loadlib, gxdloadlib)
                 
     # Input Files
 
@@ -435,6 +447,6 @@ def processAssay():
 
 init()
 verifyMode()
-processAssay()
-bcpFiles()
+profilelib.stage('index', processAssay)
+profilelib.stage('bulkload', bcpFiles)
 exit(0)
@@ -0,0 +1,168 @@
+
+#
+# Program: insituconvert.py
+#
+# Purpose:
+#
+#	To translate a wide in situ screen (one row per gene, one column
+#	per reported tissue) into input files for the insituload.py program,
+#	as described by a mapping file.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	insituconvert.py [-l [-k]] mappingFile
+#	insituconvert.py -j shards mappingFile
+#	insituconvert.py -c mappingFile
+#
+#	-c	check:  write the distinct result codes of the screen, the
+#		number of results of each and whether the mapping translates
+#		it, to stdout; nothing is converted
+#	-l	load:  hand the records to insituload.py in-process instead of
+#		writing the input files (ASSAYLOADMODE etc. as for insituload.py)
+#	-k	keep:  with -l, also write the input files
+#	-j	convert in this many worker processes (0 is one per cpu); the
+#		input files are the same as those of a sequential conversion
+#
+#	mappings/rnainsitu14.ini is a commented example mapping file.
+#
+# Envvars:
+#
+#	ASSAYLOAD
+#	any environment variable named in the mapping file
+#
+# Inputs:
+#
+#	Mapping file; see lib/insituconvertlib.py
+#	the Screen, Tissue and Probe files named in the mapping file
+#
+# Outputs:
+#
+#       4 tab-delimited files, in the output directory of the mapping file:
+#
+#	In_Situ_probeprep.txt
+#	In_Situ_assay.txt
+#	In_Situ_specimen.txt
+#	In_Situ_results.txt
+#	In_Situ_defaults.txt, if the mapping's [output] compact = yes
+#
+# Exit Codes:
+#
+#	0 on success, 1 on a usage, conversion or load error
+#	(with -c, 1 if a result code is not in the mapping)
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	See lib/insituconvertlib.py.
+#
+
+import sys
+import os
+import getopt
+
+libpath = os.environ['ASSAYLOAD'] + '/lib'
+sys.path.insert(0, libpath)
+import insituconvertlib
+import recordlib
+
+#globals
+
+usage = '''Usage: insituconvert.py [-l [-k]] mappingFile
+       insituconvert.py -j shards mappingFile
+       insituconvert.py -c mappingFile
+'''
+
+check = 0		# only report the result codes?
+load = 0		# hand the records to insituload.py?
+keep = 0		# also write the input files?
+shards = 1		# number of worker processes
+
+# Purpose:  loads the records of a mapping's screen
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  runs insituload.py in-process on the records (see insituload.main())
+#	    if keep, also writes the input files
+# Throws:   whatever insituconvertlib.records() throws
+
+def loadRecords(
+    mapping	# mapping (dictionary)
+    ):
+
+    import insituload
+
+    records = insituconvertlib.records(mapping)
+    if keep:
+        records = recordlib.teeRecords(records, mapping['output']['directory'],
+            insituconvertlib.recordDefaults(mapping))
+
+    insituload.main(records)
+
+# Purpose:  reports the result codes of a mapping's screen
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  writes one line per distinct result cell to stdout:
+#	    number of results, cell, and "not in mapping" if it does not translate
+#	    exits with status 1 if a cell does not translate
+# Throws:   whatever insituconvertlib.scanCodes() throws
+
+def checkCodes(
+    mapping	# mapping (dictionary)
+    ):
+
+    index, codes, assays = insituconvertlib.scanCodes(mapping,
+        insituconvertlib.readTissues(mapping), insituconvertlib.readProbes(mapping))
+    badCodes = insituconvertlib.checkCodes(mapping, codes)
+
+    bad = set([c[0] for c in badCodes])
+    counts = {}
+    for (cell, override), (count, lineNum) in codes.items():
+        counts[cell] = counts.get(cell, 0) + count
+
+    for cell in sorted(counts, key = lambda c: -counts[c]):
+        if cell in bad:
+            print('%10d\t"%s"\tnot in mapping' % (counts[cell], cell))
+        else:
+            print('%10d\t"%s"' % (counts[cell], cell))
+
+    if len(badCodes) > 0:
+        insituconvertlib.exit(1, '%d result code(s) not in mapping file\n' % (len(badCodes)))
+
+#
+# Main
+#
+
+try:
+    options, args = getopt.getopt(sys.argv[1:], 'clkj:')
+except getopt.GetoptError:
+    insituconvertlib.exit(1, usage)
+
+for option, value in options:
+    if option == '-c':
+        check = 1
+    elif option == '-l':
+        load = 1
+    elif option == '-k':
+        keep = 1
+    elif option == '-j':
+        try:
+            shards = int(value)
+        except ValueError:
+            insituconvertlib.exit(1, usage)
+        if shards <= 0:
+            shards = os.cpu_count() or 1
+
+if len(args) != 1 or (keep and not load) or (check and load) or (shards > 1 and (check or load)):
+    insituconvertlib.exit(1, usage)
+
+if check:
+    insituconvertlib.run(args[0], checkCodes)
+elif load:
+    insituconvertlib.run(args[0], loadRecords)
+else:
+    insituconvertlib.run(args[0], lambda mapping: insituconvertlib.convert(mapping, shards))
+sys.exit(0)
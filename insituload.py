@@ -22,6 +22,11 @@
 # Usage:
 #	insituload.py
 #
+#	or, from a parser, without the input files:
+#
+#	import insituload
+#	insituload.main(records)	(see lib/recordlib.py)
+#
 # Envvars:
 #
 # Inputs:
@@ -76,6 +81,14 @@
 #			example with null pane/include pipe "|"
 #				4|
 #
+#	Defaults file (optional), In_Situ_defaults.txt, a tab-delimited file
+#	in the format:
+#		field 1: Input File Name (one of the above)
+#		field 2: Field # (1-based)
+#		field 3: Default Value
+#	an empty field of that input file takes the default value
+#	(see lib/assayloadlib.py)
+#
 # Outputs:
 #
 #       BCP files:
@@ -86,11 +99,9 @@
 #	GXD_Specimen.bcp		Specimens
 #	GXD_InSituResult.bcp		InSitu Results
 #	GXD_ISResultStructure.bcp	InSitu Result Structures
+#	GXD_InSituResultImage.bcp	InSitu Result Image Panes
 #       ACC_Accession.bcp               Accession records
-#	Result_Image.txt		Results/Image text file (see gxdimageload/assocResultImage)
-#		field 1: Result key
-#		field 2: Figure Label
-#	
+#
 #       Diagnostics file of all input parameters and SQL commands
 #       Error file
 #
@@ -98,7 +109,8 @@
 #
 # Assumes:
 #
-#	That no one else is adding records to the database.
+#	Unless ASSAYLOADCONCURRENT=yes, that no one else is adding
+#	records to the database.
 #
 # Bugs:
 #
@@ -119,796 +131,110 @@
 #       differ on assayID. This required addition logic to be added to the
 #       processPrepFile() method to keep it from adding duplicate records
 #       to GXD_ProbePrep.
-#       
+#
+# 10/19/2026
+#	- init/verifyMode/setPrimaryKeys/bcpFiles and the probe prep, assay,
+#	  specimen and results stages moved to lib/assayloadlib.py
+#	- ASSAYLOADCONCURRENT; keys and MGI ids are reserved up front (reserve)
+#	- main(records); the stages can take recordlib records from a parser
+#	- In_Situ_defaults.txt; constant columns may be left empty in the input files
+#	- ASSAYLOADDELTA; assays already in the database are skipped (delta)
+#	- the rows of a rejected probe prep, assay or specimen are skipped
+#	  and reported once (assayloadlib.skipRow())
+#	- ASSAYLOADPROFILE; each stage can be profiled (profilelib.stage())
+#
 
 import sys
 import os
-import string
-import db
-import mgi_utils
-import agelib
-import loadlib
 
 libpath = os.environ['ASSAYLOAD'] + '/lib'
 sys.path.insert(0, libpath)
-import gxdloadlib
-
-#
-# from configuration file
-#
-user = os.environ['MGD_DBUSER']
-passwordFileName = os.environ['MGD_DBPASSWORDFILE']
-mode = os.environ['ASSAYLOADMODE']
-
-DEBUG = 0		# if 0, not in debug mode
-TAB = '\t'		# tab
-CRT = '\n'		# carriage return/newline
-bcpdelim = TAB		# bcp file delimiter
-
-bcpon = 1		# can the bcp files be bcp-ed into the database?  default is yes.
-
-diagFile = ''		# diagnostic file descriptor
-errorFile = ''		# error file descriptor
+import assayloadlib
 
-# input files
-
-inPrepFile = ''           # file descriptor
-inAssayFile = ''          # file descriptor
-inAssayNoteFile = ''      # file descriptor
-inSpecimenFile = ''       # file descriptor
-inResultsFile = ''        # file descriptor
+#globals
 
 inPrepFileName = 'In_Situ_probeprep.txt'
 inAssayFileName = 'In_Situ_assay.txt'
 inSpecimenFileName = 'In_Situ_specimen.txt'
 inResultsFileName = 'In_Situ_results.txt'
+inDefaultsFileName = 'In_Situ_defaults.txt'
+
+# tables, in bcp order
+
+tables = [
+    'GXD_ProbePrep',
+    'GXD_Assay',
+    'GXD_AssayNote',
+    'GXD_Specimen',
+    'GXD_InSituResult',
+    'GXD_ISResultStructure',
+    'ACC_Accession',
+    'GXD_InSituResultImage',
+    ]
+
+# input file whose rows bound the rows of each table (ASSAYLOADCONCURRENT reservations)
+
+reserve = {
+    'GXD_ProbePrep' : inPrepFileName,
+    'GXD_Assay' : inAssayFileName,
+    'GXD_Specimen' : inSpecimenFileName,
+    'GXD_InSituResult' : inResultsFileName,
+    'GXD_ISResultStructure' : inResultsFileName,
+    'GXD_InSituResultImage' : (inResultsFileName, 8),
+    'ACC_Accession' : inAssayFileName,
+    }
+
+# where the fingerprint of an assay is in the input files (ASSAYLOADDELTA)
+
+delta = {
+    'assay' : inAssayFileName,
+    'prep' : inPrepFileName,
+    'labels' : (inSpecimenFileName, 2),
+    'structures' : (inResultsFileName, 5, 6),
+    }
 
-# output files
-
-outPrepFile = ''	# file descriptor
-outAssayFile = ''	# file descriptor
-outAssayNoteFile = ''	# file descriptor
-outSpecimenFile = ''	# file descriptor
-outResultStFile = ''	# file descriptor
-outResultFile = ''	# file descriptor
-outAccFile = ''         # file descriptor
-outResultImageFile = '' # file descriptor
-
-probeprepTable = 'GXD_ProbePrep'
-assayTable = 'GXD_Assay'
-assaynoteTable = 'GXD_AssayNote'
-specimenTable = 'GXD_Specimen'
-resultTable = 'GXD_InSituResult'
-resultStTable = 'GXD_ISResultStructure'
-accTable = 'ACC_Accession'
-resultImageTable = 'GXD_InSituResultImage'
-
-outPrepFileName = probeprepTable + '.bcp'
-outAssayFileName = assayTable + '.bcp'
-outAssayNoteFileName = assaynoteTable + '.bcp'
-outSpecimenFileName = specimenTable + '.bcp'
-outResultFileName = resultTable + '.bcp'
-outResultStFileName = resultStTable + '.bcp'
-outAccFileName = accTable + '.bcp'
-outResultImageFileName = resultImageTable + '.bcp'
-
-diagFileName = ''	# diagnostic file name
-errorFileName = ''	# error file name
-
-# primary keys
-
-prepKey = 0		# GXD_ProbePrep._ProbePrep_key
-assayKey = 0		# GXD_Assay._Assay_key
-specimenKey = 0		# GXD_GelLane._GelLane_key
-resultKey = 0		# GXD_GelRow._GelRow_key
-resultImageKey = 0      # GXD_InSituResultImage._ResultImage_key
-resultStructureKey = 0  # GXD_ISResultStructure._ResultStructure_key
-accKey = 0              # ACC_Accession._Accession_key
-mgiKey = 0              # ACC_AccessionMax.maxNumericPart
-
-# accession constants
-
-assayMgiTypeKey = '8'   # Assay
-mgiPrefix = "MGI:"      # Prefix for MGI accession ID
-accLogicalDBKey = '1'   # Logical DB Key for MGI accession ID
-accPrivate = '0'        # Private status for MGI accession ID (false)
-accPreferred = '1'      # Preferred status MGI accession ID (true)
-
-assayProbePrep = {}	# Assay ID/Probe Prep keys
-assayAssay= {}		# Assay ID/Assay keys
-assaySpecimen = {}	# Assay ID/Specimen ID and Specimen keys
-
-imagePaneLookup = {}	# Image Figure Label|Pane Label = pane key
-
-loaddate = loadlib.loaddate
-
-# Purpose: prints error message and exits
-# Returns: nothing
-# Assumes: nothing
-# Effects: exits with exit status
-# Throws: nothing
-
-def exit(
-    status,          # numeric exit status (integer)
-    message = None   # exit message (str.
-    ):
-
-    if message is not None:
-        sys.stderr.write('\n' + str(message) + '\n')
- 
-    try:
-        diagFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
-        errorFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
-        diagFile.close()
-        errorFile.close()
-    except:
-        pass
-
-    sys.exit(status)
- 
-# Purpose: process command line options
-# Returns: nothing
-# Assumes: nothing
-# Effects: initializes global variables
-#          exits if files cannot be opened
-# Throws: nothing
-
-def init():
-    global diagFile, errorFile, errorFileName, diagFileName
-    global outAccFile, outPrepFile, outAssayFile, outAssayNoteFile
-    global outSpecimenFile, outResultStFile, outResultFile, outResultImageFile
-    global inPrepFile, inAssayFile, inSpecimenFile, inResultsFile
- 
-    db.set_sqlUser(user)
-    db.set_sqlPasswordFromFile(passwordFileName)
- 
-    diagFileName = 'insituload.diagnostics'
-    errorFileName = 'insituload.error'
-
-    try:
-        diagFile = open(diagFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % diagFileName)
-                
-    try:
-        errorFile = open(errorFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % errorFileName)
-                
-    # Input Files
-
-    try:
-        inPrepFile = open(inPrepFileName, 'r')
-    except:
-        exit(1, 'Could not open file %s\n' % inPrepFileName)
-
-    try:
-        inAssayFile = open(inAssayFileName, 'r')
-    except:
-        exit(1, 'Could not open file %s\n' % inAssayFileName)
-
-    try:
-        inSpecimenFile = open(inSpecimenFileName, 'r')
-    except:
-        exit(1, 'Could not open file %s\n' % inSpecimenFileName)
-
-    try:
-        inResultsFile = open(inResultsFileName, 'r')
-    except:
-        exit(1, 'Could not open file %s\n' % inResultsFileName)
-
-    # Output Files
-
-    try:
-        outPrepFile = open(outPrepFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % outPrepFileName)
-
-    try:
-        outAssayFile = open(outAssayFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % outAssayFileName)
-
-    try:
-        outAssayNoteFile = open(outAssayNoteFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % outAssayNoteFileName)
-
-    try:
-        outSpecimenFile = open(outSpecimenFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % outSpecimenFileName)
-
-    try:
-        outResultStFile = open(outResultStFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % outResultStFileName)
-
-    try:
-        outResultFile = open(outResultFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % outResultFileName)
-
-    try:
-        outAccFile = open(outAccFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % outAccFileName)
-
-    try:
-        outResultImageFile = open(outResultImageFileName, 'w')
-    except:
-        exit(1, 'Could not open file %s\n' % outResultImageFileName)
-
-    # Log all SQL
-    db.set_sqlLogFunction(db.sqlLogAll)
-
-    diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
-    diagFile.write('Server: %s\n' % (db.get_sqlServer()))
-    diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
-
-    errorFile.write('Start Date/Time: %s\n\n' % (mgi_utils.date()))
-
-    return
-
-# Purpose: verify processing mode
-# Returns: nothing
-# Assumes: nothing
-# Effects: if the processing mode is not valid, exits.
-#	   else, sets global variables
-# Throws:  nothing
-
-def verifyMode():
-
-    global DEBUG
-
-    if mode == 'preview':
-        DEBUG = 1
-        bcpon = 0
-    elif mode != 'load':
-        exit(1, 'Invalid Processing Mode:  %s\n' % (mode))
-
-# Purpose:  sets global primary key variables
-# Returns:  nothing
-# Assumes:  nothing
-# Effects:  sets global primary key variables
-# Throws:   nothing
-
-def setPrimaryKeys():
-
-    global accKey, mgiKey, prepKey, assayKey
-    global specimenKey, resultKey
-    global resultImageKey, resultStructureKey
-
-    results = db.sql('select nextval('gxd_probeprep_seq') as maxKey from GXD_ProbePrep', 'auto')
-    prepKey = results[0]['maxKey']
-
-    results = db.sql('select nextval('gxd_assay_seq') as maxKey from GXD_Assay', 'auto')
-    assayKey = results[0]['maxKey']
-
-    results = db.sql(''' select nextval('gxd_specimen_seq') as maxKey ''', 'auto')
-    specimenKey = results[0]['maxKey']
-
-    results = db.sql(''' select nextval('gxd_insituresult_seq') as maxKey ''', 'auto')
-    resultKey = results[0]['maxKey']
-
-    results = db.sql(''' select nextval('gxd_insituresultimage_seq') as maxKey ''', 'auto')
-    resultImageKey = results[0]['maxKey']
-
-    results = db.sql(''' select nextval('gxd_isresultstructure_seq') as maxKey ''', 'auto')
-    resultStructureKey = results[0]['maxKey']
-
-    results = db.sql('select max(_Accession_key) + 1 as maxKey from ACC_Accession', 'auto')
-    accKey = results[0]['maxKey']
-
-    results = db.sql('''select maxNumericPart + 1 as maxKey from ACC_AccessionMax where prefixPart = '%s' ''' % (mgiPrefix), 'auto')
-    mgiKey = results[0]['maxKey']
-
-# Purpose:  BCPs the data into the database
-# Returns:  nothing
-# Assumes:  nothing
-# Effects:  BCPs the data into the database
-# Throws:   nothing
-
-def bcpFiles(
-   recordsProcessed	# number of records processed (integer)
-   ):
-
-    outPrepFile.close()
-    outAssayFile.close()
-    outAssayNoteFile.close()
-    outSpecimenFile.close()
-    outResultFile.close()
-    outResultStFile.close()
-    outAccFile.close()
-    outResultImageFile.close()
-
-    # update the max Accession ID value
-    db.sql('select * from ACC_setMax (%d)' % (recordsProcessed), None)
-
-    db.commit()
-
-    if DEBUG or not bcpon:
-        return
-
-    bcpCommand = os.environ['PG_DBUTILS'] + '/bin/bcpin.csh'
-    currentDir = os.getcwd()
-
-    bcp1 =  '%s %s %s %s %s %s "\\t" "\\n" mgd' \
-        % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), probeprepTable, currentDir, outPrepFileName)
-    bcp2 =  '%s %s %s %s %s %s "\\t" "\\n" mgd' \
-        % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), assayTable, currentDir, outAssayFileName)
-    bcp3 =  '%s %s %s %s %s %s "\\t" "\\n" mgd' \
-        % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), assaynoteTable, currentDir, outAssayNoteFileName)
-    bcp4 =  '%s %s %s %s %s %s "\\t" "\\n" mgd' \
-        % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), specimenTable, currentDir, outSpecimenFileName)
-    bcp5 =  '%s %s %s %s %s %s "\\t" "\\n" mgd' \
-        % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), resultTable, currentDir, outResultFileName)
-    bcp6 =  '%s %s %s %s %s %s "\\t" "\\n" mgd' \
-        % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), resultStTable, currentDir, outResultStFileName)
-    bcp7 =  '%s %s %s %s %s %s "\\t" "\\n" mgd' \
-        % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), accTable, currentDir, outAccFileName)
-    bcp8 =  '%s %s %s %s %s %s "\\t" "\\n" mgd' \
-        % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), resultImageTable, currentDir, outResultImageFileName)
-
-    for bcpCmd in [bcp1, bcp2, bcp3, bcp4, bcp5, bcp6, bcp7, bcp8]:
-        diagFile.write('%s\n' % bcpCmd)
-        os.system(bcpCmd)
-
-    db.commit()
-
-    db.sql(''' select setval('gxd_probeprep_seq', (select max(_ProbePrep) from GXD_Assay)) ''', None)
-    db.sql(''' select setval('gxd_assay_seq', (select max(_Assay_key) from GXD_Assay)) ''', None)
-    db.sql(''' select setval('gxd_specimen_seq', (select max(_Specimen_key) from GXD_Specimen)) ''', None)
-    db.sql(''' select setval('gxd_insituresult_seq', (select max(_result_key) from GXD_InSituResult)) ''', None)
-    db.sql(''' select setval('gxd_isresultstructure_seq', (select max(_resultstructure_key) from GXD_ISResultStructure)) ''', None)
-    db.sql(''' select setval('gxd_insituresultimage_seq', (select max(_resultimage_key) from GXD_InSituResultImage)) ''', None)
-    db.commit()
-
-    return
-
-# Purpose:  processes probe prep data
-# Returns:  nothing
-# Assumes:  nothing
-# Effects:  verifies and processes each line in the input file
-# Throws:   nothing
-
-def processPrepFile():
-
-    global assayProbePrep, prepKey
-
-    # This dictionary is used to keep track of each combination of probe key,
-    # sense key, label key, visualization key and prep type that are added.
-    # If the combination exists on multiple records in the probe prep input
-    # file, only one probe prep record will be created in the database and
-    # it will be shared by multiple assays.
-
-    probePrepLookup = {}
-
-    lineNum = 0
-    # For each line in the input file
-
-    for line in inPrepFile.readlines():
-
-        error = 0
-        lineNum = lineNum + 1
-
-        # Split the line into tokens
-        tokens = str.split(line[:-1], TAB)
-
-        try:
-            assayID = tokens[0]
-            probeID = tokens[1]
-            prepType = tokens[2]
-            hybridization = tokens[3]
-            labelledWith = tokens[4]
-            visualization = tokens[5]
-        except:
-            exit(1, 'Invalid Line (%d): %s\n' % (lineNum, line))
-
-        if gxdloadlib.verifyPrepType(prepType, lineNum, errorFile) == 0:
-            errorFile.write('\ngxdloadlib.verifyPrepType:  %s', prepType)
-            error = 1
-
-        probeKey = loadlib.verifyProbe(probeID, lineNum, errorFile)
-        senseKey = gxdloadlib.verifyPrepSense(hybridization, lineNum, errorFile)
-        labelKey = gxdloadlib.verifyPrepLabel(labelledWith, lineNum, errorFile)
-        visualizationKey = gxdloadlib.verifyPrepVisualization(visualization, lineNum, errorFile)
-
-        if probeKey == 0:
-            # set error flag to true
-            errorFile.write('\nloadlib.verifyProbe:  %s' % (probeID))
-            error = 1
-
-        if senseKey == 0: 
-            # set error flag to true
-            errorFile.write('\ngxdloadlib.verifyPrepSense:  %s' % (hybridization))
-            error = 1
-
-        if labelKey == 0:
-            # set error flag to true
-            errorFile.write('\ngxdloadlib.verifyPrepLabel:  %s' % (labelledWith))
-            error = 1
-
-        if visualizationKey == 0:
-            # set error flag to true
-            errorFile.write('\ngxdloadlib.verifyPrepVisualization:  %s' % (visualization))
-            error = 1
-
-        # if errors, continue to next record
-        if error:
-            continue
-
-        # if no errors, process
-
-        # Determine if the current combination of probe key, sense key,
-        # label key, visualization key and prep type has already been added
-        # to the output file.
-        #
-        key = '%s:%s:%s:%s:%s' % (str(probeKey),
-                                  str(senseKey),
-                                  str(labelKey),
-                                  str(visualizationKey),
-                                  prepType)
-
-        # If a probe prep record has already been created, add the existing
-        # probe prep key to the lookup for the current assayID.
-        #
-        if key in probePrepLookup:
-            assayProbePrep[assayID] = probePrepLookup[key]
-
-        # Otherwise, add a new probe prep key to the lookup for the current
-        # assayID and also add a new entry to the dictionary for this
-        # combination of probe key, sense key, label key, visualization key
-        # and prep type.
-        #
-        else:
-            outPrepFile.write(str(prepKey) + TAB + \
-                str(probeKey) + TAB + \
-                str(senseKey) + TAB + \
-                str(labelKey) + TAB + \
-                str(visualizationKey) + TAB + \
-                prepType + TAB + \
-                loaddate + TAB + loaddate + CRT)
-
-            assayProbePrep[assayID] = prepKey
-            probePrepLookup[key] = prepKey
-            prepKey = prepKey + 1
+def process():
 
-    #	end of "for line in inPrepFile.readlines():"
+    import profilelib
 
-    return
+    assayloadlib.readDefaults(inDefaultsFileName)
+    profilelib.stage('delta', assayloadlib.setDelta, delta)
+    profilelib.stage('probeprep', assayloadlib.processProbePrepFile, inPrepFileName)
+    referenceKey = profilelib.stage('assay', assayloadlib.processAssayFile, inAssayFileName, 'GXD_ProbePrep')
+    profilelib.stage('specimen', assayloadlib.processSpecimenFile, inSpecimenFileName)
+    profilelib.stage('results', assayloadlib.processResultsFile, inResultsFileName, referenceKey)
 
-# Purpose:  processes assay data
+# Purpose:  runs the load
 # Returns:  nothing
 # Assumes:  nothing
-# Effects:  verifies and processes each line in the input file
+# Effects:  loads the input files, or the records of an in-process parser
+#	    exits
 # Throws:   nothing
 
-def processAssayFile():
-
-    global assayAssay, assayKey, accKey, mgiKey
-
-    lineNum = 0
-    # For each line in the input file
-
-    for line in inAssayFile.readlines():
-
-        error = 0
-        lineNum = lineNum + 1
-
-        # Split the line into tokens
-        tokens = str.split(line[:-1], TAB)
-
-        try:
-            assayID = tokens[0]
-            markerID = tokens[1]
-            jnum = tokens[2]
-            assayType = tokens[3]
-            reporterGene = tokens[4]
-            note = tokens[5]
-            createdBy = tokens[6]
-        except:
-            exit(1, 'Invalid Line (%d): %s\n' % (lineNum, line))
-
-        markerKey = loadlib.verifyMarker(markerID, lineNum, errorFile)
-        referenceKey = loadlib.verifyReference(jnum, lineNum, errorFile)
-        assayTypeKey = gxdloadlib.verifyAssayType(assayType, lineNum, errorFile)
-        createdByKey = loadlib.verifyUser(createdBy, lineNum, errorFile)
-
-        if markerKey == 0 or referenceKey == 0 or assayTypeKey == 0:
-            # set error flag to true
-            error = 1
-
-        if referenceKey == 0 or referenceKey == 0 or assayTypeKey == 0:
-            # set error flag to true
-            error = 1
-
-        if len(reporterGene) > 0:
-            reporterGeneKey = gxdloadlib.verifyReporterGene(reporterGene, lineNum, errorFile)
-            if reporterGeneKey == 0:
-                error = 1
-        else:
-            reporterGeneKey = ''
-
-        # if errors, continue to next record
-        if error:
-            continue
+def main(
+    records = None	# recordlib records (iterable); default is to read the input files
+    ):
 
-        if assayID in assayProbePrep:
-            probePrepKey = assayProbePrep[assayID]
+    import profilelib
+
+    assayloadlib.init('insituload', tables)
+    assayloadlib.verifyMode()
+    if not assayloadlib.restart():
+        if records is not None and assayloadlib.concurrent:
+            assayloadlib.exit(1, 'ASSAYLOADCONCURRENT reservations are sized from the input files; write them first\n')
+        if records is not None and assayloadlib.delta:
+            assayloadlib.exit(1, 'ASSAYLOADDELTA compares the input files with the database; write them first\n')
+        assayloadlib.setPrimaryKeys(reserve)
+        if records is None:
+            process()
         else:
-            probePrepKey = ''
-
-        # if no errors, process
-
-        outAssayFile.write(str(assayKey) + TAB + \
-            str(assayTypeKey) + TAB + \
-            str(referenceKey) + TAB + \
-            str(markerKey) + TAB + \
-            str(probePrepKey) + TAB + \
-            TAB + \
-            TAB + \
-            str(reporterGeneKey) + TAB + \
-            str(createdByKey) + TAB + \
-            str(createdByKey) + TAB + \
-            loaddate + TAB + loaddate + CRT)
-
-        if len(note) > 0:
-            outAssayNoteFile.write(str(assayKey) + TAB + \
-                    note + TAB + \
-                    loaddate + TAB + loaddate + CRT)
-
-        # MGI Accession ID for the assay
-
-        outAccFile.write(str(accKey) + TAB + \
-            mgiPrefix + str(mgiKey) + TAB + \
-            mgiPrefix + TAB + \
-            str(mgiKey) + TAB + \
-            accLogicalDBKey + TAB + \
-            str(assayKey) + TAB + \
-            assayMgiTypeKey + TAB + \
-            accPrivate + TAB + \
-            accPreferred + TAB + \
-            str(createdByKey) + TAB + \
-            str(createdByKey) + TAB + \
-            loaddate + TAB + loaddate + CRT)
-
-        assayAssay[assayID] = assayKey
-        accKey = accKey + 1
-        mgiKey = mgiKey + 1
-        assayKey = assayKey + 1
-
-    #	end of "for line in inAssayFile.readlines():"
-
-    return lineNum, referenceKey
-
-# Purpose:  processes specimen data
-# Returns:  nothing
-# Assumes:  nothing
-# Effects:  verifies and processes each line in the input file
-# Throws:   nothing
-
-def processSpecimenFile():
-
-    global assaySpecimen, specimenKey
-
-    lineNum = 0
-    # For each line in the input file
-
-    for line in inSpecimenFile.readlines():
-
-        error = 0
-        lineNum = lineNum + 1
-
-        # Split the line into tokens
-        tokens = str.split(line[:-1], TAB)
-
-        try:
-            assayID = tokens[0]
-            specimenID = tokens[1]
-            specimenLabel = tokens[2]
-            genotypeID = tokens[3]
-            age = tokens[4]
-            ageNote = tokens[5]
-            gender = tokens[6]
-            fixation = tokens[7]
-            embedding = tokens[8]
-            hybridization = tokens[9]
-            specimenNote = tokens[10]
-        except:
-            exit(1, 'Invalid Line (%d): %s\n' % (lineNum, line))
-
-        if gxdloadlib.verifyHybridization(hybridization, lineNum, errorFile) == 0:
-            errorFile.write('hybridization value not found : %s\n' % (hybridization))
-            error = 1
-
-        genotypeKey = gxdloadlib.verifyGenotype(genotypeID, lineNum, errorFile)
-        fixationKey = gxdloadlib.verifyFixationMethod(fixation, lineNum, errorFile)
-        embeddingKey = gxdloadlib.verifyEmbeddingMethod(embedding, lineNum, errorFile)
-        ageMin, ageMax = agelib.ageMinMax(age)
-
-        if genotypeKey == 0 or ageMin < 0 or ageMax < 0:
-            errorFile.write('genotype or ageMin/ageMax error\n')
-            errorFile.write('genotypeKey = ' + str(genotypeKey) + ', age = ' + str(age) + ', ageMin = ' + str(ageMin) + ', ageMax = ' + str(ageMax) + '\n')
-            errorFile.write(str(tokens) + '\n\n')
-            error = 1
-
-        # if errors, continue to next record
-        if error:
-            continue
-
-        # if no errors, process
-
-        outSpecimenFile.write(
-            str(specimenKey) + TAB + \
-            str(assayAssay[assayID]) + TAB + \
-            str(embeddingKey) + TAB + \
-            str(fixationKey) + TAB + \
-            str(genotypeKey) + TAB + \
-            specimenID + TAB + \
-            specimenLabel + TAB + \
-            gender + TAB + \
-            age + TAB + \
-            str(ageMin) + TAB + \
-            str(ageMax) + TAB + \
-            mgi_utils.prvalue(ageNote) + TAB + \
-            hybridization + TAB + \
-            mgi_utils.prvalue(specimenNote) + TAB + \
-            loaddate + TAB + loaddate + CRT)
-
-        key = '%s:%s' % (assayID, specimenID)
-        assaySpecimen[key] = specimenKey
-        specimenKey = specimenKey + 1
-
-    #	end of "for line in inSpecimenFile.readlines():"
-
-    return
-
-# Purpose:  processes results data
-# Returns:  nothing
-# Assumes:  nothing
-# Effects:  verifies and processes each line in the input file
-# Throws:   nothing
-
-def processResultsFile(referenceKey):
-
-    global resultKey, resultImageKey, resultStructureKey
-    global imagePaneLookup
-
-    prevAssay = 0
-    prevSpecimen = 0
-    prevResult = 0
-    lineNum = 0
-
-    #
-    # build imagePaneLookup lookup of figure label|pane label keys
-    # J:226028/227123
-    #
-    results = db.sql('''
-        select i.figureLabel, p.paneLabel, p._ImagePane_key 
-        from IMG_Image i, IMG_ImagePane p 
-        where i._Image_key = p._Image_key
-        and i._Refs_key = %s
-        ''' % (referenceKey), 'auto')
-    for r in results:
-        paneLabel = r['paneLabel']
-        if paneLabel == None:
-            paneLabel = ''
-        key = r['figureLabel'] + '|' + paneLabel
-        value =  r['_ImagePane_key']
-        imagePaneLookup[key] = []
-        imagePaneLookup[key].append(value)
-    #print imagePaneLookup['Zmiz1_b41_E11.5b_JL|']
-
-    # For each line in the input file
-
-    for line in inResultsFile.readlines():
-
-        error = 0
-        lineNum = lineNum + 1
-
-        # Split the line into tokens
-        tokens = str.split(line[:-1], TAB)
-
-        try:
-            assayID = tokens[0]
-            specimenID = tokens[1]
-            resultID = tokens[2]
-            strength = tokens[3]
-            pattern = tokens[4]
-            emapaID = tokens[5]
-            structureTS = tokens[6]
-            resultNote = tokens[7]
-            imagePanes = tokens[8]
-        except:
-            exit(1, 'Invalid Line (%d): %s\n' % (lineNum, line))
-
-        strengthKey = gxdloadlib.verifyStrength(strength, lineNum, errorFile)
-        patternKey = gxdloadlib.verifyPattern(pattern, lineNum, errorFile)
-
-        structureKey = loadlib.verifyTerm(emapaID, 90, '', lineNum, errorFile)
-
-        if strengthKey == 0 or patternKey == 0 or structureKey == 0:
-            # set error flag to true
-            error = 1
-
-        # if errors, continue to next record
-        if error:
-            continue
-
-        # if no errors, process
-
-        key = '%s:%s' % (assayID, specimenID)
-
-        if key not in assaySpecimen:
-            errorFile.write('Cannot find Assay:Speciman key "%s"\n' % (key))
-            errorFile.write(str(tokens) + '\n\n')
-            continue
-
-        specimenKey = assaySpecimen[key]
-
-        if prevAssay != assayID:
-            prevSpecimen = 0
-
-        if prevSpecimen != specimenKey:
-            prevResult = 0
-
-        if prevResult != resultID:
-
-            resultKey = resultKey + 1
-
-            outResultFile.write(
-                str(resultKey) + TAB + \
-                str(specimenKey) + TAB + \
-                str(strengthKey) + TAB + \
-                str(patternKey) + TAB + \
-                resultID + TAB + \
-                mgi_utils.prvalue(resultNote) + TAB + \
-                loaddate + TAB + loaddate + CRT)
-
-            for image in str.split(imagePanes,','):
-                if image in imagePaneLookup:
-                    imageKey = imagePaneLookup[image][0]
-                    resultImageKey = resultImageKey + 1
-                    outResultImageFile.write(
-                        str(resultImageKey) + TAB + \
-                        str(resultKey) + TAB + \
-                        str(imageKey) + TAB + \
-                        loaddate + TAB + loaddate + CRT)
-                #else:
-                    #print image
-
-        resultStructureKey = resultStructureKey + 1
-
-        outResultStFile.write(
-            str(resultStructureKey) + TAB + \
-            str(resultKey) + TAB + \
-            str(structureKey) + TAB + \
-            str(structureTS) + TAB + \
-            loaddate + TAB + loaddate + CRT)
-
-        prevAssay = assayID
-        prevSpecimen = specimenKey
-        prevResult = resultID
-
-    #	end of "for line in inResultsFile.readlines():"
-
-    return
-
-def process():
-
-    processPrepFile()
-    recordsProcessed, referenceKey = processAssayFile()
-    processSpecimenFile()
-    processResultsFile(referenceKey)
-    bcpFiles(recordsProcessed)
+            profilelib.stage('records', assayloadlib.processRecords, records, 'GXD_ProbePrep')
+        assayloadlib.bcpFiles()
+    assayloadlib.exit(0)
 
 #
 # Main
 #
 
-init()
-verifyMode()
-setPrimaryKeys()
-process()
-exit(0)
+if __name__ == '__main__':
+    main()
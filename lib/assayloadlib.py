@@ -0,0 +1,1924 @@
+
+#
+# Program: assayloadlib.py
+#
+# Purpose:
+#
+#	The loader engine shared by insituload.py, immunoload.py and gelload.py.
+#
+#	Each assay-type loader declares the tables it writes and its
+#	assay-type specific processing stages (prep, gel lane, gel band);
+#	everything else lives here:
+#
+#		- declarative table specifications (key column, sequence, columns)
+#		- diagnostics/error file handling, exit()
+#		- processing mode (preview/load/resume/rollback)
+#		- the load manifest: key ranges, row counts, checksums and
+#		  bulk load status of each table, for resume and rollback
+#		- primary key allocation
+#		- bcp file writers
+#		- bulk loading of the bcp files and sequence maintenance
+#		- the stages common to more than one assay type:
+#			probe prep, assay, specimen, in situ results
+#		  each stage reads its input file, or takes the typed records
+#		  of an in-process parser (recordlib, processRecords())
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import assayloadlib
+#
+#	assayloadlib.init(loadName, tables)
+#	assayloadlib.verifyMode()
+#	if not assayloadlib.restart():
+#		assayloadlib.setPrimaryKeys(reserve)
+#		...processing stages...
+#		assayloadlib.bcpFiles()
+#	assayloadlib.exit(0)
+#
+# Envvars:
+#
+#	MGD_DBUSER
+#	MGD_DBPASSWORDFILE
+#	ASSAYLOADMODE		preview, load, resume or rollback
+#				resume:   bulk load the tables of the manifest that
+#				          have not been loaded yet, using the existing
+#				          bcp files (no input processing)
+#				rollback: delete the rows of the manifest's loaded tables
+#				          by key range
+#	ASSAYLOADMANIFEST	manifest file name (optional)
+#				default is <load name>.manifest
+#	ASSAYLOADATOMIC		yes: load all bcp files, the ACC_AccessionMax update and
+#				the sequence updates in one transaction on one connection
+#				(constraints deferred); either everything is loaded or nothing
+#				default is no: one bcpin.csh per table
+#	ASSAYLOADCONCURRENT	yes: reserve the primary keys, accession keys and MGI ids
+#				up front (gxdloadlib.reserveKeys/reserveMGIIDs), sized
+#				from the input files, so that several loads (and curator
+#				edits) can run at the same time
+#				default is no: keys start at the current maximum and
+#				ACC_AccessionMax/the sequences are set after the load
+#	ASSAYLOADPUTATIVE	yes: once the tables are loaded, update the putative
+#				probe/marker relationships of the loaded references to
+#				encodes (postloadlib.updatePutative; see updatePutative.py)
+#				default is no
+#	ASSAYLOADCACHES		comma-separated caches to refresh, for the loaded assays
+#				only, once the tables are loaded (after ASSAYLOADPUTATIVE),
+#				e.g. gxdexpression,mrkref (postloadlib.refreshCaches;
+#				see refreshCaches.py); default is none
+#	ASSAYLOADCACHEJOBS	number of gxdexpression.py runs at a time (ASSAYLOADCACHES);
+#				default is 4
+#	ASSAYLOADDELTA		yes: skip the input assays that are already in the database
+#				(see setDelta()); default is no: load every input assay
+#	ASSAYLOADSORTMEMORY	megabytes of input rows held in memory when an unsorted
+#				results file is sorted (sortlib.sortRows; see
+#				processResultsFile()); default is 256
+#	ASSAYLOADMAPMEMORY	megabytes of entries each ID : key map (assayAssay, ...)
+#				holds in memory before it moves to a temporary database
+#				under TMPDIR (keymaplib.KeyMap); default is 256
+#				0: every map is on disk from its first entry
+#				(to try out a load that would spill)
+#	ASSAYLOADCOMPRESS	gz or zst, optionally with :level (e.g. zst:3):  write the
+#				bcp files compressed (<table name>.bcp.gz/.zst) and COPY
+#				them decompressed on the fly (see lib/compresslib.py);
+#				default is none
+#	ASSAYLOADBINARY		yes: write the tables with column types (see tableSpecs:
+#				the in situ results, result structures and images, and gel
+#				bands) in the PostgreSQL binary COPY format
+#				(<table name>.bin; see lib/pgbinarylib.py) and COPY them
+#				on a connection of their own; default is no
+#	ASSAYLOADPROFILE	yes: profile each stage (lib/profilelib.py):
+#				<load name>.<nn>.<stage>.pstats and .collapsed
+#				(for flamegraphs); default is no
+#	ASSAYLOADMEMORYREPORT	yes: report the memory of each stage (lib/profilelib.py):
+#				top allocation sites, lookup sizes and peak memory,
+#				to <load name>.memory; default is no
+#	PG_DBUTILS
+#
+# Inputs:
+#
+#	Defaults file (optional; see readDefaults()), a tab-delimited file
+#	in the format:
+#		field 1: Input File Name
+#		field 2: Field # (1-based)
+#		field 3: Default Value
+#	an empty field of that input file takes the default value, so that
+#	a parser can leave the columns that are the same on every line empty
+#
+# Outputs:
+#
+#	BCP files, one per table:  <table name>.bcp (.gz/.zst with ASSAYLOADCOMPRESS),
+#	or <table name>.bin with ASSAYLOADBINARY
+#	Diagnostics file of all input parameters and SQL commands
+#	Error file
+#	Manifest file, a tab-delimited file, rewritten after each bulk load:
+#		load	<load name>
+#		accmax	<first MGI numeric part>	<last MGI numeric part>	<status>
+#		table	<table>	<bcp file>	<first key>	<last key>	<rows>	<md5 checksum>	<status>
+#		sequences	<status>
+#
+#		status is one of pending, loaded, failed, rolledback, reserved
+#		(accmax/sequences of an ASSAYLOADCONCURRENT load are reserved
+#		up front and are neither set by the load nor reset by a rollback)
+#		the key range is the range of the first column of the bcp file
+#
+# Exit Codes:
+#
+# Assumes:
+#
+#	Unless ASSAYLOADCONCURRENT=yes, that no one else is adding records
+#	to the database.
+#
+# Bugs:
+#
+# Implementation:
+#
+
+import sys
+import os
+import hashlib
+import mgi_utils
+import tabfilelib
+import recordlib
+
+#globals
+
+#
+# from configuration file
+#
+user = os.environ['MGD_DBUSER']
+passwordFileName = os.environ['MGD_DBPASSWORDFILE']
+mode = os.environ['ASSAYLOADMODE']
+atomic = os.environ.get('ASSAYLOADATOMIC', 'no') == 'yes'
+concurrent = os.environ.get('ASSAYLOADCONCURRENT', 'no') == 'yes'
+putative = os.environ.get('ASSAYLOADPUTATIVE', 'no') == 'yes'
+cacheNames = [c for c in str.split(os.environ.get('ASSAYLOADCACHES', ''), ',') if c != '']
+delta = os.environ.get('ASSAYLOADDELTA', 'no') == 'yes'
+sortMemory = os.environ.get('ASSAYLOADSORTMEMORY', '256')
+mapMemory = os.environ.get('ASSAYLOADMAPMEMORY', '256')
+compression = os.environ.get('ASSAYLOADCOMPRESS', '')
+binary = os.environ.get('ASSAYLOADBINARY', 'no') == 'yes'
+
+DEBUG = 0		# if 0, not in debug mode
+TAB = '\t'		# tab
+CRT = '\n'		# carriage return/newline
+bcpdelim = TAB		# bcp file delimiter
+
+bcpon = 1		# can the bcp files be bcp-ed into the database?  default is yes.
+
+diagFile = ''		# diagnostic file descriptor
+errorFile = ''		# error file descriptor
+diagFileName = ''	# diagnostic file name
+errorFileName = ''	# error file name
+
+outputDir = ''		# directory of the bcp files
+bcpSuffix = ''		# compressed bcp file suffix (ASSAYLOADCOMPRESS)
+bcpLevel = None		# compression level of the bcp files (ASSAYLOADCOMPRESS)
+binarySuffix = '.bin'	# binary COPY file suffix (ASSAYLOADBINARY)
+
+loadName = ''		# name of the load
+manifestFileName = ''	# manifest file name
+manifest = {}		# table name/'accmax'/'sequences' : manifest record (dictionary)
+
+#
+# table specifications
+#
+#	sequence:  the sequence that generates the primary key (first column)
+#		   None if the table has no sequence of its own
+#	columns:   the table columns, in bcp file order
+#	types:	   the column types (pgbinarylib.types), of the tables that
+#		   are written in the binary COPY format with ASSAYLOADBINARY
+#
+#	creation_date/modification_date are always the last two columns
+#	and are filled in by writeRow()
+#
+
+tableSpecs = {
+    'GXD_ProbePrep' : {
+        'sequence' : 'gxd_probeprep_seq',
+        'columns' : ['_ProbePrep_key', '_Probe_key', '_Sense_key', '_Label_key',
+                     '_Visualization_key', 'type',
+                     'creation_date', 'modification_date'],
+        },
+    'GXD_AntibodyPrep' : {
+        'sequence' : 'gxd_antibodyprep_seq',
+        'columns' : ['_AntibodyPrep_key', '_Antibody_key', '_Secondary_key', '_Label_key',
+                     'creation_date', 'modification_date'],
+        },
+    'GXD_Assay' : {
+        'sequence' : 'gxd_assay_seq',
+        'columns' : ['_Assay_key', '_AssayType_key', '_Refs_key', '_Marker_key',
+                     '_ProbePrep_key', '_AntibodyPrep_key', '_ImagePane_key', '_ReporterGene_key',
+                     '_CreatedBy_key', '_ModifiedBy_key',
+                     'creation_date', 'modification_date'],
+        },
+    'GXD_AssayNote' : {
+        'sequence' : None,
+        'columns' : ['_Assay_key', 'assayNote',
+                     'creation_date', 'modification_date'],
+        },
+    'GXD_Specimen' : {
+        'sequence' : 'gxd_specimen_seq',
+        'columns' : ['_Specimen_key', '_Assay_key', '_Embedding_key', '_Fixation_key', '_Genotype_key',
+                     'sequenceNum', 'specimenLabel', 'sex', 'age', 'ageMin', 'ageMax', 'ageNote',
+                     'hybridization', 'specimenNote',
+                     'creation_date', 'modification_date'],
+        },
+    'GXD_InSituResult' : {
+        'sequence' : 'gxd_insituresult_seq',
+        'columns' : ['_Result_key', '_Specimen_key', '_Strength_key', '_Pattern_key',
+                     'sequenceNum', 'resultNote',
+                     'creation_date', 'modification_date'],
+        'types' : ['int4', 'int4', 'int4', 'int4',
+                   'int4', 'text',
+                   'timestamp', 'timestamp'],
+        },
+    'GXD_ISResultStructure' : {
+        'sequence' : 'gxd_isresultstructure_seq',
+        'columns' : ['_ResultStructure_key', '_Result_key', '_EMAPA_Term_key', '_Stage_key',
+                     'creation_date', 'modification_date'],
+        'types' : ['int4', 'int4', 'int4', 'int4',
+                   'timestamp', 'timestamp'],
+        },
+    'GXD_InSituResultImage' : {
+        'sequence' : 'gxd_insituresultimage_seq',
+        'columns' : ['_ResultImage_key', '_Result_key', '_ImagePane_key',
+                     'creation_date', 'modification_date'],
+        'types' : ['int4', 'int4', 'int4',
+                   'timestamp', 'timestamp'],
+        },
+    'GXD_GelLane' : {
+        'sequence' : 'gxd_gellane_seq',
+        'columns' : ['_GelLane_key', '_Assay_key', '_Genotype_key', '_GelRNAType_key', '_GelControl_key',
+                     'sequenceNum', 'laneLabel', 'sampleAmount', 'sex', 'age', 'ageMin', 'ageMax',
+                     'ageNote', 'laneNote',
+                     'creation_date', 'modification_date'],
+        },
+    'GXD_GelLaneStructure' : {
+        'sequence' : 'gxd_gellanestructure_seq',
+        'columns' : ['_GelLaneStructure_key', '_GelLane_key', '_EMAPA_Term_key', '_Stage_key',
+                     'creation_date', 'modification_date'],
+        },
+    'GXD_GelRow' : {
+        'sequence' : 'gxd_gelrow_seq',
+        'columns' : ['_GelRow_key', '_Assay_key', '_GelUnits_key',
+                     'sequenceNum', 'size', 'rowNote',
+                     'creation_date', 'modification_date'],
+        },
+    'GXD_GelBand' : {
+        'sequence' : 'gxd_gelband_seq',
+        'columns' : ['_GelBand_key', '_GelLane_key', '_GelRow_key', '_Strength_key', 'bandNote',
+                     'creation_date', 'modification_date'],
+        'types' : ['int4', 'int4', 'int4', 'int4', 'text',
+                   'timestamp', 'timestamp'],
+        },
+    'ACC_Accession' : {
+        'sequence' : None,
+        'columns' : ['_Accession_key', 'accID', 'prefixPart', 'numericPart', '_LogicalDB_key',
+                     '_Object_key', '_MGIType_key', 'private', 'preferred',
+                     '_CreatedBy_key', '_ModifiedBy_key',
+                     'creation_date', 'modification_date'],
+        },
+    }
+
+tables = []		# tables written by this load, in bcp order
+outFiles = {}		# table name : bcp file descriptor
+binaryTables = {}	# table name : column types, of the tables written in binary (ASSAYLOADBINARY)
+rowCounts = {}		# table name : number of rows written
+firstKeys = {}		# table name : first column of the first row written
+lastKeys = {}		# table name : first column of the last row written
+
+# primary keys
+
+primaryKeys = {}	# table name : next primary key
+reservedKeys = {}	# table name : last reserved primary key (ASSAYLOADCONCURRENT)
+accSequence = 'acc_accession_seq'	# ACC_Accession._Accession_key sequence
+accKey = 0		# ACC_Accession._Accession_key
+mgiKey = 0		# ACC_AccessionMax.maxNumericPart
+firstMgiKey = 0		# first ACC_AccessionMax.maxNumericPart assigned
+assaysProcessed = 0	# number of MGI accession ids assigned
+
+# accession constants
+
+assayMgiTypeKey = '8'	# Assay
+mgiPrefix = 'MGI:'	# Prefix for MGI accession ID
+accLogicalDBKey = '1'	# Logical DB Key for MGI accession ID
+accPrivate = '0'	# Private status for MGI accession ID (false)
+accPreferred = '1'	# Preferred status MGI accession ID (true)
+
+assayNoteLength = 0	# characters per GXD_AssayNote row of a note split over
+			# several rows (gelload:  255); 0:  one row per note
+
+inputDefaults = {}	# input file name : list of (0-based column, default value)
+skipAssays = set()	# Assay IDs of the input assays already in the database (ASSAYLOADDELTA)
+
+# ID : key maps that grow with the submission (see ASSAYLOADMAPMEMORY)
+
+assayPrep = None	# Assay ID/Probe or Antibody Prep keys (keymaplib.KeyMap; init())
+assayAssay = None	# Assay ID/Assay keys (keymaplib.KeyMap; init())
+assaySpecimen = None	# Assay ID:Specimen ID/Specimen keys (keymaplib.KeyMap; init())
+
+rejected = {}		# (row type, row ID) of a rejected or skipped row :
+			#	(row type, row ID, line number) of the rejected row it descends from
+skipped = {}		# (row type, row ID, line number) of a rejected row :
+			#	{row type : number of its descendant rows skipped}
+
+imagePaneLookup = {}	# Image Figure Label|Pane Label = pane key
+imagePaneReference = None	# reference key of imagePaneLookup
+
+probePrepLookup = {}	# probe:sense:label:visualization:prep type/Probe Prep keys
+referenceKey = 0	# reference key of the last assay processed
+
+prevAssay = 0		# Assay ID of the last result processed
+prevSpecimen = 0	# Specimen key of the last result processed
+prevResult = 0		# Result # of the last result processed
+resultKey = 0		# GXD_InSituResult key of the last result processed
+resultColumns = (0, 1, 2)	# Assay #, Specimen #, Result # of a result line
+
+loaddate = ''		# load date of the rows (loadlib.loaddate; init())
+
+# Purpose: prints error message and exits
+# Returns: nothing
+# Assumes: nothing
+# Effects: exits with exit status
+# Throws: nothing
+
+def exit(
+    status,          # numeric exit status (integer)
+    message = None   # exit message (str.
+    ):
+
+    if message is not None:
+        sys.stderr.write('\n' + str(message) + '\n')
+
+    try:
+        diagFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
+        errorFile.write('\n\nEnd Date/Time: %s\n' % (mgi_utils.date()))
+        diagFile.close()
+        errorFile.close()
+    except:
+        pass
+
+    sys.exit(status)
+
+# Purpose: initialize the load
+# Returns: nothing
+# Assumes: nothing
+# Effects: initializes global variables
+#          imports the database libraries (db, loadlib, agelib, gxdloadlib)
+#          as globals of this module
+#          opens the diagnostics, error and bcp files
+#          exits if files cannot be opened
+# Throws: nothing
+#
+#	the database libraries are imported here, the first use of every
+#	load, and not with this module, so that importing it costs nothing
+#	until a load starts
+
+def init(
+    name,		# name of the load, used for the diagnostics/error/manifest file (str.
+    loadTables,		# tables written by this load, in bcp order (list)
+    bcpDir = ''		# directory of the bcp files (str.
+    ):
+
+    global diagFile, errorFile, errorFileName, diagFileName
+    global tables, outputDir, loadName, manifestFileName, bcpSuffix, bcpLevel
+    global db, loadlib, agelib, gxdloadlib
+    global loaddate, assayPrep, assayAssay, assaySpecimen
+
+    import db
+    import loadlib
+    import agelib
+    import gxdloadlib
+    import keymaplib
+    import compresslib
+    import profilelib
+
+    loaddate = loadlib.loaddate
+    assayPrep = keymaplib.KeyMap()
+    assayAssay = keymaplib.KeyMap()
+    assaySpecimen = keymaplib.KeyMap()
+
+    db.set_sqlUser(user)
+    db.set_sqlPasswordFromFile(passwordFileName)
+
+    loadName = name
+    diagFileName = loadName + '.diagnostics'
+    errorFileName = loadName + '.error'
+    manifestFileName = os.environ.get('ASSAYLOADMANIFEST', loadName + '.manifest')
+
+    try:
+        diagFile = open(diagFileName, 'w')
+    except:
+        exit(1, 'Could not open file %s\n' % diagFileName)
+
+    try:
+        errorFile = open(errorFileName, 'w')
+    except:
+        exit(1, 'Could not open file %s\n' % errorFileName)
+
+    profilelib.init(loadName, diagFile)
+    profilelib.watch(sys.modules[__name__], sys.modules['__main__'], loadlib, gxdloadlib)
+
+    # Output Files
+
+    tables = loadTables
+    outputDir = bcpDir
+    if len(outputDir) == 0:
+        outputDir = os.getcwd()
+
+    try:
+        bcpSuffix, bcpLevel = compresslib.parseCompression(compression)
+    except ValueError as message:
+        exit(1, 'Invalid ASSAYLOADCOMPRESS:  %s\n' % (message))
+
+    for table in tables:
+        if table not in tableSpecs:
+            exit(1, 'Unknown table %s\n' % (table))
+
+        rowCounts[table] = 0
+
+        if binary and 'types' in tableSpecs[table]:
+            binaryTables[table] = tableSpecs[table]['types']
+
+        # a restart re-uses the bcp files of the previous run
+        if mode in ('resume', 'rollback'):
+            continue
+
+        outFileName = bcpFileName(table)
+        try:
+            if table in binaryTables:
+                import pgbinarylib
+                outFiles[table] = compresslib.openFile(outFileName, 'wb', bcpLevel)
+                outFiles[table].write(pgbinarylib.header)
+            else:
+                outFiles[table] = compresslib.openFile(outFileName, 'w', bcpLevel)
+        except:
+            exit(1, 'Could not open file %s\n' % outFileName)
+
+    if len(binaryTables) > 0:
+        import pgbinarylib
+        try:
+            pgbinarylib.encodeTimestamp(loaddate)
+        except ValueError as message:
+            exit(1, '%s\n' % (message))
+
+    # Log all SQL
+    db.set_sqlLogFunction(db.sqlLogAll)
+
+    diagFile.write('Start Date/Time: %s\n' % (mgi_utils.date()))
+    diagFile.write('Server: %s\n' % (db.get_sqlServer()))
+    diagFile.write('Database: %s\n' % (db.get_sqlDatabase()))
+
+    errorFile.write('Start Date/Time: %s\n\n' % (mgi_utils.date()))
+
+    return
+
+# Purpose: verify processing mode
+# Returns: nothing
+# Assumes: nothing
+# Effects: if the processing mode (or an ASSAYLOADCACHES cache,
+#	   ASSAYLOADCACHEJOBS, ASSAYLOADSORTMEMORY or ASSAYLOADMAPMEMORY) is not valid, exits.
+#	   else, sets global variables DEBUG and bcpon
+# Throws:  nothing
+
+def verifyMode():
+
+    global DEBUG, bcpon
+
+    import keymaplib
+
+    if mode == 'preview':
+        DEBUG = 1
+        bcpon = 0
+    elif mode not in ('load', 'resume', 'rollback'):
+        exit(1, 'Invalid Processing Mode:  %s\n' % (mode))
+
+    if len(cacheNames) > 0:
+        import postloadlib
+
+        for name in cacheNames:
+            if name not in postloadlib.caches:
+                exit(1, 'Invalid ASSAYLOADCACHES cache:  %s\n' % (name))
+
+        if 'gxdexpression' in cacheNames and \
+           (not postloadlib.expressionJobs.isdigit() or int(postloadlib.expressionJobs) == 0):
+            exit(1, 'Invalid ASSAYLOADCACHEJOBS:  %s\n' % (postloadlib.expressionJobs))
+
+    if not sortMemory.isdigit() or int(sortMemory) == 0:
+        exit(1, 'Invalid ASSAYLOADSORTMEMORY:  %s\n' % (sortMemory))
+
+    if not mapMemory.isdigit():
+        exit(1, 'Invalid ASSAYLOADMAPMEMORY:  %s\n' % (mapMemory))
+
+    keymaplib.memory = int(mapMemory) * 1048576
+
+# Purpose:  counts the rows a reservation must cover
+# Returns:  number of rows (integer)
+# Assumes:  nothing
+# Effects:  reads the input file
+# Throws:   nothing
+
+def countRows(
+    source	# input file name (str.
+		# or (input file name, column) to count the comma-separated
+		# values of a column (tuple)
+    ):
+
+    if type(source) is tuple:
+        inFileName, column = source
+    else:
+        inFileName, column = source, None
+
+    try:
+        if column is None:
+            return tabfilelib.countLines(inFileName)
+
+        count = 0
+        for lineNum, (values,) in tabfilelib.readRows(inFileName, column + 1, (column,)):
+            if len(values) > 0:
+                count = count + len(str.split(values, ','))
+        return count
+    except (IOError, OSError):
+        exit(1, 'Could not open file %s\n' % inFileName)
+
+# Purpose:  reserves the primary keys, accession keys and MGI ids of this load
+# Returns:  nothing
+# Assumes:  init() has been called
+# Effects:  sets primaryKeys, reservedKeys, accKey, mgiKey
+#	    the sequences and ACC_AccessionMax are advanced past the reserved
+#	    ranges (see gxdloadlib.reserveKeys/reserveMGIIDs)
+#	    exits if the size of a table's reservation is unknown
+# Throws:   nothing
+
+def reservePrimaryKeys(
+    reserve	# table name : input file whose rows bound the table's rows (dictionary)
+    ):
+
+    global accKey, mgiKey, firstMgiKey
+
+    for table in tables:
+        sequence = tableSpecs[table]['sequence']
+        if table == 'ACC_Accession':
+            sequence = accSequence
+        if sequence is None:
+            continue
+        if table not in reserve:
+            exit(1, 'No reservation size for %s\n' % (table))
+
+        count = countRows(reserve[table])
+        if count == 0:
+            primaryKeys[table] = 1
+            reservedKeys[table] = 0
+            continue
+
+        keyColumn = tableSpecs[table]['columns'][0]
+        primaryKeys[table] = gxdloadlib.reserveKeys(sequence, table, keyColumn, count)
+        reservedKeys[table] = primaryKeys[table] + count - 1
+        diagFile.write('Reserved %s %d-%d\n' % (table, primaryKeys[table], reservedKeys[table]))
+
+        if table == 'ACC_Accession':
+            accKey = primaryKeys[table]
+            mgiKey = gxdloadlib.reserveMGIIDs(count, mgiPrefix)
+            firstMgiKey = mgiKey
+            diagFile.write('Reserved %s%d-%d\n' % (mgiPrefix, mgiKey, mgiKey + count - 1))
+
+# Purpose:  sets global primary key variables
+# Returns:  nothing
+# Assumes:  init() has been called
+# Effects:  sets primaryKeys for each table that has a sequence
+#	    sets accKey, mgiKey
+#	    if ASSAYLOADCONCURRENT, reserves them (reservePrimaryKeys())
+# Throws:   nothing
+
+def setPrimaryKeys(
+    reserve = {}	# table name : input file whose rows bound the table's rows (dictionary)
+			# only used if ASSAYLOADCONCURRENT
+    ):
+
+    global accKey, mgiKey, firstMgiKey
+
+    if concurrent:
+        reservePrimaryKeys(reserve)
+        return
+
+    for table in tables:
+        sequence = tableSpecs[table]['sequence']
+        if sequence is None:
+            continue
+        results = db.sql(''' select nextval('%s') as maxKey ''' % (sequence), 'auto')
+        primaryKeys[table] = results[0]['maxKey']
+
+    results = db.sql('select max(_Accession_key) + 1 as maxKey from ACC_Accession', 'auto')
+    accKey = results[0]['maxKey']
+
+    results = db.sql('''select maxNumericPart + 1 as maxKey from ACC_AccessionMax where prefixPart = '%s' ''' % (mgiPrefix), 'auto')
+    mgiKey = results[0]['maxKey']
+    firstMgiKey = mgiKey
+
+# Purpose:  return the next primary key of a table
+# Returns:  the primary key (integer)
+# Assumes:  setPrimaryKeys() has been called
+# Effects:  increments the table's primary key
+#	    exits if the table's reserved key range is exhausted
+# Throws:   nothing
+
+def nextKey(
+    table	# table name (str.
+    ):
+
+    key = primaryKeys[table]
+    if table in reservedKeys and key > reservedKeys[table]:
+        exit(1, 'Reserved keys of %s exhausted at %d\n' % (table, key))
+    primaryKeys[table] = key + 1
+    return key
+
+# Purpose:  return the bcp file name of a table
+# Returns:  full path name of the bcp file (str.
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def bcpFileName(
+    table	# table name (str.
+    ):
+
+    if table in binaryTables:
+        return os.path.join(outputDir, table + binarySuffix + bcpSuffix)
+
+    return os.path.join(outputDir, table + '.bcp' + bcpSuffix)
+
+# Purpose:  tells whether a bcp file is in the binary COPY format
+# Returns:  1 if it is, else 0
+# Assumes:  the file was named by bcpFileName()
+# Effects:  nothing
+# Throws:   nothing
+
+def isBinary(
+    fileName	# bcp file name (str.
+    ):
+
+    import compresslib
+
+    if compresslib.isCompressed(fileName):
+        fileName = os.path.splitext(fileName)[0]
+
+    return os.path.splitext(fileName)[1] == binarySuffix
+
+# Purpose:  writes one row to a table's bcp file
+# Returns:  nothing
+# Assumes:  fields do not include creation_date/modification_date
+# Effects:  writes the row, followed by the load date (x2)
+#	    exits if a binary table's row has a value its column type
+#	    cannot hold (the text bcp files leave that to the bulk load)
+# Throws:   nothing
+
+def writeRow(
+    table,	# table name (str.
+    fields	# column values, in table order (list)
+    ):
+
+    if table in binaryTables:
+        import pgbinarylib
+        try:
+            row = pgbinarylib.encodeRow(binaryTables[table], fields + [loaddate, loaddate],
+                tableSpecs[table]['columns'])
+        except ValueError as message:
+            errorFile.write('%s row %d (key %s): %s\n' % (table, rowCounts[table] + 1, fields[0], message))
+            errorFile.write(str(fields) + '\n\n')
+            exit(1, '%s in %s; see %s\n' % (message, table, errorFileName))
+        outFiles[table].write(row)
+    else:
+        outFiles[table].write(TAB.join(map(str, fields)) + TAB + loaddate + TAB + loaddate + CRT)
+
+    # keys are allocated in ascending order, so the first and last
+    # keys written are the key range of the table
+    if table not in firstKeys:
+        firstKeys[table] = fields[0]
+    lastKeys[table] = fields[0]
+    rowCounts[table] = rowCounts[table] + 1
+
+# Purpose:  records a row that failed validation
+# Returns:  nothing
+# Assumes:  the errors of the row have been written to the error file
+# Effects:  adds the row to global rejected, so that its descendants are
+#	    skipped (see skipRow())
+# Throws:   nothing
+
+def rejectRow(
+    rowType,		# row type:  prep, assay, specimen, lane (str.
+    rowID,		# row ID:  Assay ID, or Assay ID:Specimen/Lane ID (str.
+    lineNum		# line/record number (integer)
+    ):
+
+    if (rowType, rowID) not in rejected:
+        root = (rowType, rowID, lineNum)
+        rejected[(rowType, rowID)] = root
+        skipped[root] = {}
+
+# Purpose:  decides whether a row whose parent was not processed descends
+#	    from a rejected row
+# Returns:  1 if the parent was rejected or skipped (the row is skipped), else 0
+# Assumes:  the parent of the row is not in the key lookups
+# Effects:  counts the row under the rejected row it descends from
+#	    (written once by writeSkipped(), instead of an error for each row)
+#	    and adds it to global rejected, so that its own descendants are skipped
+# Throws:   nothing
+
+def skipRow(
+    rowType,		# row type:  assay, specimen, result, lane, band (str.
+    rowID,		# row ID (str.), or None if the row has no descendants
+    parentType,		# row type of the parent (str.
+    parentID		# row ID of the parent (str.
+    ):
+
+    if (parentType, parentID) not in rejected:
+        return 0
+
+    root = rejected[(parentType, parentID)]
+
+    if rowID is not None and (rowType, rowID) not in rejected:
+        rejected[(rowType, rowID)] = root
+
+    skipped[root][rowType] = skipped[root].get(rowType, 0) + 1
+
+    return 1
+
+# Purpose:  reports the rows skipped because an ancestor was rejected
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  writes one line for each rejected row that had descendants
+#	    to the error file, and the totals to the diagnostics file
+# Throws:   nothing
+
+def writeSkipped():
+
+    totals = {}
+
+    for root in skipped:
+        if len(skipped[root]) == 0:
+            continue
+        rowType, rowID, lineNum = root
+        counts = []
+        for childType in sorted(skipped[root]):
+            counts.append('%d %s' % (skipped[root][childType], childType))
+            totals[childType] = totals.get(childType, 0) + skipped[root][childType]
+        errorFile.write('Rejected %s %s (%d); skipped its %s row(s)\n' \
+            % (rowType, rowID, lineNum, ', '.join(counts)))
+
+    for rowType in sorted(totals):
+        diagFile.write('Skipped : %d %s row(s) of rejected rows\n' % (totals[rowType], rowType))
+
+# Purpose:  reads a tab-delimited input file
+# Returns:  generator of (line number, tokens)
+#	    tokens are the first nColumns fields of the line (tuple),
+#	    with the empty fields that have a default (readDefaults()) filled in
+#	    the lines of skipped assays (field 1 in skipAssays; see setDelta())
+#	    are not returned
+# Assumes:  nothing
+# Effects:  validates the column count of every line before the first row
+#	    is returned; writes each invalid line to the error file and exits
+#	    if there are any, if the file cannot be opened, or if it is not in
+#	    the input encoding (tabfilelib.encoding)
+# Throws:   nothing
+
+def readInput(
+    inFileName,		# input file name (str.
+    nColumns		# minimum number of fields per line (integer)
+    ):
+
+    try:
+        badLines = tabfilelib.validate(inFileName, nColumns)
+    except (IOError, OSError):
+        exit(1, 'Could not open file %s\n' % inFileName)
+    except UnicodeDecodeError as e:
+        errorFile.write('Invalid Encoding (%d): expected %s\n' % (e.lineNum, tabfilelib.encoding))
+        exit(1, 'Invalid Encoding at line %d of %s; see %s\n' % (e.lineNum, inFileName, errorFileName))
+
+    if len(badLines) > 0:
+        for lineNum, nFields in badLines:
+            errorFile.write('Invalid Line (%d): %d fields, expected %d\n' % (lineNum, nFields, nColumns))
+        exit(1, '%d Invalid Line(s) in %s; see %s\n' % (len(badLines), inFileName, errorFileName))
+
+    rows = tabfilelib.readRows(inFileName, nColumns,
+        defaults = inputDefaults.get(os.path.basename(inFileName)))
+
+    if len(skipAssays) == 0:
+        for lineNum, tokens in rows:
+            yield lineNum, tokens
+        return
+
+    for lineNum, tokens in rows:
+        if tokens[0] not in skipAssays:
+            yield lineNum, tokens
+
+# Purpose:  reads the defaults file of the input files, if there is one
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  sets global inputDefaults (see readInput())
+#	    writes the defaults to the diagnostics file
+#	    exits if a line is invalid
+# Throws:   nothing
+
+def readDefaults(
+    inFileName		# defaults file name (str.
+    ):
+
+    global inputDefaults
+
+    if not os.path.exists(inFileName):
+        return
+
+    try:
+        inputDefaults = recordlib.readDefaults(inFileName)
+    except (IOError, OSError):
+        exit(1, 'Could not open file %s\n' % inFileName)
+    except ValueError as message:
+        errorFile.write('%s\n' % (message))
+        exit(1, '%s in %s; see %s\n' % (message, inFileName, errorFileName))
+
+    for fileName in inputDefaults:
+        for column, value in inputDefaults[fileName]:
+            diagFile.write('Default:  %s field %d = %s\n' % (fileName, column + 1, value))
+
+# Purpose:  fingerprints the assays of the database for a set of references
+# Returns:  dictionary of fingerprint : list of _Assay_keys
+# Assumes:  postloadlib.setReferences() has loaded the references
+# Effects:  queries the database (one query for all of the references)
+# Throws:   nothing
+
+def existingFingerprints():
+
+    import postloadlib
+    import deltalib
+
+    results = db.sql('''
+        select a._Assay_key, 'jnum' as kind, c.jnumID as value
+        from %s r, GXD_Assay a, BIB_Citation_Cache c
+        where r._Refs_key = a._Refs_key and a._Refs_key = c._Refs_key
+        union all
+        select a._Assay_key, 'marker', ma.accID
+        from %s r, GXD_Assay a, ACC_Accession ma
+        where r._Refs_key = a._Refs_key
+        and a._Marker_key = ma._Object_key and ma._MGIType_key = 2
+        and ma._LogicalDB_key = 1 and ma.prefixPart = 'MGI:' and ma.preferred = 1
+        union all
+        select a._Assay_key, 'prep', pa.accID
+        from %s r, GXD_Assay a, GXD_ProbePrep pp, ACC_Accession pa
+        where r._Refs_key = a._Refs_key and a._ProbePrep_key = pp._ProbePrep_key
+        and pp._Probe_key = pa._Object_key and pa._MGIType_key = 3
+        and pa._LogicalDB_key = 1 and pa.prefixPart = 'MGI:' and pa.preferred = 1
+        union all
+        select a._Assay_key, 'prep', aa.accID
+        from %s r, GXD_Assay a, GXD_AntibodyPrep ap, ACC_Accession aa
+        where r._Refs_key = a._Refs_key and a._AntibodyPrep_key = ap._AntibodyPrep_key
+        and ap._Antibody_key = aa._Object_key and aa._MGIType_key = 6
+        and aa._LogicalDB_key = 1 and aa.prefixPart = 'MGI:' and aa.preferred = 1
+        union all
+        select a._Assay_key, 'label', coalesce(s.specimenLabel, '')
+        from %s r, GXD_Assay a, GXD_Specimen s
+        where r._Refs_key = a._Refs_key and a._Assay_key = s._Assay_key
+        union all
+        select a._Assay_key, 'label', coalesce(l.laneLabel, '')
+        from %s r, GXD_Assay a, GXD_GelLane l
+        where r._Refs_key = a._Refs_key and a._Assay_key = l._Assay_key
+        union all
+        select a._Assay_key, 'structure', ea.accID || ':' || ts.stage
+        from %s r, GXD_Assay a, GXD_Specimen s, GXD_InSituResult ir,
+            GXD_ISResultStructure rs, ACC_Accession ea, GXD_TheilerStage ts
+        where r._Refs_key = a._Refs_key and a._Assay_key = s._Assay_key
+        and s._Specimen_key = ir._Specimen_key and ir._Result_key = rs._Result_key
+        and rs._EMAPA_Term_key = ea._Object_key and ea._MGIType_key = 13 and ea.preferred = 1
+        and rs._Stage_key = ts._Stage_key
+        union all
+        select a._Assay_key, 'structure', ea.accID || ':' || ts.stage
+        from %s r, GXD_Assay a, GXD_GelLane l, GXD_GelLaneStructure ls,
+            ACC_Accession ea, GXD_TheilerStage ts
+        where r._Refs_key = a._Refs_key and a._Assay_key = l._Assay_key
+        and l._GelLane_key = ls._GelLane_key
+        and ls._EMAPA_Term_key = ea._Object_key and ea._MGIType_key = 13 and ea.preferred = 1
+        and ls._Stage_key = ts._Stage_key
+        ''' % tuple([postloadlib.refsTable] * 8), 'auto')
+
+    assays = {}		# _Assay_key : {'jnum', 'marker', 'prep' : value, 'label', 'structure' : list}
+
+    for r in results:
+        if r['_Assay_key'] not in assays:
+            assays[r['_Assay_key']] = {'jnum' : '', 'marker' : '', 'prep' : '', 'label' : [], 'structure' : []}
+        a = assays[r['_Assay_key']]
+        if r['kind'] in ('label', 'structure'):
+            a[r['kind']].append(r['value'])
+        else:
+            a[r['kind']] = r['value']
+
+    fingerprints = {}
+    for assayKey in sorted(assays):
+        a = assays[assayKey]
+        fp = deltalib.fingerprint(a['jnum'], a['marker'], a['prep'], a['label'], a['structure'])
+        if fp not in fingerprints:
+            fingerprints[fp] = []
+        fingerprints[fp].append(assayKey)
+
+    return fingerprints
+
+# Purpose:  selects the input assays to load in delta mode (ASSAYLOADDELTA)
+# Returns:  nothing
+# Assumes:  deltaSpec describes the input files of the load:
+#		'assay' : assay file (marker MGI ID in field 2, J: in field 3)
+#		'prep' : probe/antibody prep file (probe/antibody MGI ID in field 2)
+#		'labels' : (file, 0-based column of the specimen/lane label)
+#		'structures' : (file, 0-based column of the EMAPA ID, of the stage)
+#	    all input files have the Assay # in field 1
+# Effects:  if ASSAYLOADDELTA, fingerprints the input assays and the database
+#	    assays of their references (see deltalib.fingerprint()), and adds
+#	    each input assay that matches a database assay to skipAssays (each database
+#	    assay matches one input assay at most); writes the number of
+#	    unchanged (skipped) and new/changed (loaded) assays of each reference,
+#	    and the keys of the database assays no input assay matched,
+#	    to the diagnostics file
+# Throws:   nothing
+
+def setDelta(
+    deltaSpec		# see Assumes (dictionary)
+    ):
+
+    global skipAssays
+
+    if not delta:
+        return
+
+    import postloadlib
+    import deltalib
+
+    inputs = deltalib.inputFingerprints(deltaSpec, readInput)
+
+    refs, missing = postloadlib.referenceKeys(sorted(set([jnum for jnum, fp in inputs.values()])))
+    postloadlib.setReferences(refs)
+    existing = existingFingerprints()
+
+    counts = {}		# reference : [unchanged, new or changed]
+
+    for assayID, (jnum, fp) in inputs.items():
+        if jnum not in counts:
+            counts[jnum] = [0, 0]
+        if len(existing.get(fp, [])) > 0:
+            existing[fp].pop(0)
+            skipAssays.add(assayID)
+            counts[jnum][0] = counts[jnum][0] + 1
+        else:
+            counts[jnum][1] = counts[jnum][1] + 1
+
+    for jnum in sorted(counts):
+        diagFile.write('Delta %s : %d unchanged (skipped), %d new or changed\n' \
+            % (jnum, counts[jnum][0], counts[jnum][1]))
+
+    unmatched = sorted([k for keys in existing.values() for k in keys])
+    if len(unmatched) > 0:
+        diagFile.write('Delta : %d database assay(s) of these references not in the input (changed or removed?): %s\n' \
+            % (len(unmatched), ','.join([str(k) for k in unmatched])))
+
+# Purpose:  returns the md5 checksum of a file
+# Returns:  hex digest (str.
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   nothing
+
+def checksum(
+    fileName	# file name (str.
+    ):
+
+    md5 = hashlib.md5()
+    with open(fileName, 'rb') as f:
+        for block in iter(lambda: f.read(1048576), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+# Purpose:  writes the manifest file
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  (re)writes the manifest file; the previous copy is replaced
+#	    only once the new one is complete
+# Throws:   nothing
+
+def writeManifest():
+
+    tmpFileName = manifestFileName + '.tmp'
+    fp = open(tmpFileName, 'w')
+
+    fp.write('load' + TAB + loadName + CRT)
+
+    r = manifest['accmax']
+    fp.write(TAB.join(['accmax', str(r['first']), str(r['last']), r['status']]) + CRT)
+
+    for table in tables:
+        r = manifest[table]
+        fp.write(TAB.join(['table', table, r['file'], str(r['first']), str(r['last']),
+            str(r['rows']), r['checksum'], r['status']]) + CRT)
+
+    fp.write(TAB.join(['sequences', manifest['sequences']['status']]) + CRT)
+
+    fp.close()
+    os.replace(tmpFileName, manifestFileName)
+
+# Purpose:  reads the manifest file of a previous run
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  sets global manifest
+#	    exits if the manifest is missing or does not match this load
+# Throws:   nothing
+
+def readManifest():
+
+    global assaysProcessed
+
+    try:
+        fp = open(manifestFileName, 'r')
+    except:
+        exit(1, 'Could not open file %s\n' % manifestFileName)
+
+    for line in fp.readlines():
+        tokens = str.split(line[:-1], TAB)
+
+        if tokens[0] == 'accmax':
+            manifest['accmax'] = {'first' : int(tokens[1]), 'last' : int(tokens[2]), 'status' : tokens[3]}
+        elif tokens[0] == 'table':
+            manifest[tokens[1]] = {'file' : tokens[2], 'first' : tokens[3], 'last' : tokens[4],
+                'rows' : int(tokens[5]), 'checksum' : tokens[6], 'status' : tokens[7]}
+        elif tokens[0] == 'sequences':
+            manifest['sequences'] = {'status' : tokens[1]}
+
+    fp.close()
+
+    for table in tables:
+        if table not in manifest:
+            exit(1, 'Table %s is not in manifest %s\n' % (table, manifestFileName))
+
+    r = manifest['accmax']
+    assaysProcessed = r['last'] - r['first'] + 1
+
+    diagFile.write('Manifest: %s\n' % (manifestFileName))
+
+# Purpose:  records the bcp files of this run in the manifest
+# Returns:  nothing
+# Assumes:  the bcp files are closed
+# Effects:  sets global manifest, writes the manifest file
+# Throws:   nothing
+
+def setManifest():
+
+    status = 'pending'
+    if concurrent:
+        status = 'reserved'
+
+    manifest['accmax'] = {'first' : firstMgiKey, 'last' : firstMgiKey + assaysProcessed - 1, 'status' : status}
+
+    for table in tables:
+        manifest[table] = {
+            'file' : bcpFileName(table),
+            'first' : firstKeys.get(table, ''),
+            'last' : lastKeys.get(table, ''),
+            'rows' : rowCounts[table],
+            'checksum' : checksum(bcpFileName(table)),
+            'status' : 'pending',
+            }
+
+    manifest['sequences'] = {'status' : status}
+
+    writeManifest()
+
+# Purpose:  returns the SQL that resets the table sequences to the table maximum
+# Returns:  list of SQL commands
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def sequenceSQL():
+
+    cmds = []
+
+    for table in tables:
+        sequence = tableSpecs[table]['sequence']
+        if sequence is None:
+            continue
+        keyColumn = tableSpecs[table]['columns'][0]
+        cmds.append(''' select setval('%s', (select max(%s) from %s)) ''' % (sequence, keyColumn, table))
+
+    return cmds
+
+# Purpose:  resets the table sequences to the table maximum
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  updates the auto-sequence of each table
+# Throws:   nothing
+
+def setSequences():
+
+    for cmd in sequenceSQL():
+        db.sql(cmd, None)
+
+    db.commit()
+
+# Purpose:  returns the COPY command that loads a bcp file into a table
+# Returns:  SQL command (str.
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def copySQL(
+    table,	# table name (str.
+    fileName	# bcp file name (str.
+    ):
+
+    if isBinary(fileName):
+        return 'copy mgd.%s from stdin with binary' % (table)
+
+    return 'copy mgd.%s from stdin with null as \'\'' % (table)
+
+# Purpose:  opens a bcp file for COPY
+# Returns:  file object
+# Assumes:  nothing
+# Effects:  opens the file, decompressing it on the fly
+# Throws:   IOError/OSError if the file cannot be opened
+
+def openBcpFile(
+    fileName	# bcp file name (str.
+    ):
+
+    import compresslib
+
+    if isBinary(fileName):
+        return compresslib.openFile(fileName, 'rb')
+
+    return compresslib.openFile(fileName, 'r')
+
+# Purpose:  opens a connection of our own for bulk loading
+# Returns:  psycopg2 connection
+# Assumes:  nothing
+# Effects:  connects to the database; exits if the connection fails
+# Throws:   nothing
+
+def bulkConnection():
+
+    import psycopg2
+
+    try:
+        fp = open(passwordFileName, 'r')
+        password = str.strip(fp.readline())
+        fp.close()
+        return psycopg2.connect(host = db.get_sqlServer(), dbname = db.get_sqlDatabase(),
+            user = user, password = password)
+    except Exception as e:
+        exit(1, 'Could not connect to %s/%s: %s\n' % (db.get_sqlServer(), db.get_sqlDatabase(), e))
+
+# Purpose:  loads the tables of the manifest that are not yet loaded
+#	    in a single transaction
+# Returns:  nothing
+# Assumes:  the manifest is set
+# Effects:  on one connection, with constraints deferred:
+#		updates ACC_AccessionMax, COPYs each bcp file, updates the sequences
+#	    and commits once; on any error nothing is committed
+#	    records the status of each step in the manifest
+#	    exits if the load fails
+# Throws:   nothing
+
+def loadTablesAtomic():
+
+    import psycopg2
+
+    conn = bulkConnection()
+    cursor = conn.cursor()
+    table = None
+
+    try:
+        cursor.execute('set constraints all deferred')
+
+        # update the max Accession ID value
+        if manifest['accmax']['status'] == 'pending' and assaysProcessed > 0:
+            cursor.execute('select * from ACC_setMax (%d)' % (assaysProcessed))
+
+        for table in tables:
+
+            r = manifest[table]
+
+            if r['status'] == 'loaded':
+                continue
+
+            diagFile.write('%s < %s\n' % (copySQL(table, r['file']), r['file']))
+
+            fp = openBcpFile(r['file'])
+            cursor.copy_expert(copySQL(table, r['file']), fp)
+            fp.close()
+
+        table = None
+
+        # update auto-sequence
+        if manifest['sequences']['status'] == 'pending':
+            for cmd in sequenceSQL():
+                cursor.execute(cmd)
+
+        conn.commit()
+
+    except (psycopg2.Error, IOError, OSError, EOFError) as e:
+        conn.rollback()
+        conn.close()
+        if table is not None:
+            manifest[table]['status'] = 'failed'
+            writeManifest()
+        exit(1, 'Atomic load failed at %s; nothing was loaded: %s\n' % (table, e))
+
+    conn.close()
+
+    if manifest['accmax']['status'] == 'pending':
+        manifest['accmax']['status'] = 'loaded'
+    for table in tables:
+        manifest[table]['status'] = 'loaded'
+    if manifest['sequences']['status'] == 'pending':
+        manifest['sequences']['status'] = 'loaded'
+    writeManifest()
+
+# Purpose:  COPYs a compressed or binary bcp file
+# Returns:  1 if the table was loaded, else 0
+# Assumes:  nothing
+# Effects:  COPYs the file into the table on a connection of its own
+#	    and commits; writes the error to the diagnostics file
+# Throws:   nothing
+
+def copyTable(
+    table,	# table name (str.
+    fileName	# compressed or binary bcp file name (str.
+    ):
+
+    import psycopg2
+
+    conn = bulkConnection()
+
+    try:
+        fp = openBcpFile(fileName)
+        conn.cursor().copy_expert(copySQL(table, fileName), fp)
+        fp.close()
+        conn.commit()
+    except (psycopg2.Error, IOError, OSError, EOFError) as e:
+        conn.rollback()
+        conn.close()
+        diagFile.write('%s < %s failed: %s\n' % (copySQL(table, fileName), fileName, e))
+        return 0
+
+    conn.close()
+    return 1
+
+# Purpose:  BCPs the tables of the manifest that are not yet loaded
+# Returns:  nothing
+# Assumes:  the manifest is set
+# Effects:  BCPs the data into the database
+#	    updates ACC_AccessionMax and the table sequences
+#	    records the status of each step in the manifest
+#	    exits if a bulk load fails
+# Throws:   nothing
+
+def loadTables():
+
+    import compresslib
+
+    if atomic:
+        loadTablesAtomic()
+        return
+
+    # update the max Accession ID value
+    if manifest['accmax']['status'] == 'pending':
+        if assaysProcessed > 0:
+            db.sql('select * from ACC_setMax (%d)' % (assaysProcessed), None)
+            db.commit()
+        manifest['accmax']['status'] = 'loaded'
+        writeManifest()
+
+    bcpCommand = os.environ['PG_DBUTILS'] + '/bin/bcpin.csh'
+
+    for table in tables:
+
+        r = manifest[table]
+
+        if r['status'] == 'loaded':
+            continue
+
+        # bcpin.csh reads plain text files only
+        if compresslib.isCompressed(r['file']) or isBinary(r['file']):
+            diagFile.write('%s < %s\n' % (copySQL(table, r['file']), r['file']))
+            loaded = copyTable(table, r['file'])
+        else:
+            bcpCmd = '%s %s %s %s %s %s "\\t" "\\n" mgd' \
+                % (bcpCommand, db.get_sqlServer(), db.get_sqlDatabase(), table,
+                   os.path.dirname(r['file']), os.path.basename(r['file']))
+            diagFile.write('%s\n' % bcpCmd)
+            loaded = os.system(bcpCmd) == 0
+
+        if not loaded:
+            r['status'] = 'failed'
+            writeManifest()
+            exit(1, 'Bulk load of %s failed; re-run with ASSAYLOADMODE=resume or rollback\n' % (table))
+
+        r['status'] = 'loaded'
+        writeManifest()
+
+    db.commit()
+
+    # update auto-sequence
+    if manifest['sequences']['status'] == 'pending':
+        setSequences()
+        manifest['sequences']['status'] = 'loaded'
+        writeManifest()
+
+# Purpose:  BCPs the data into the database
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  writes the manifest
+#	    BCPs the data into the database
+#	    updates ACC_AccessionMax and the table sequences
+# Throws:   nothing
+
+def bcpFiles():
+
+    import profilelib
+
+    writeSkipped()
+
+    for table in tables:
+        if table in binaryTables:
+            import pgbinarylib
+            outFiles[table].write(pgbinarylib.trailer)
+        outFiles[table].close()
+
+    for table in tables:
+        diagFile.write('%s : %d rows\n' % (table, rowCounts[table]))
+
+    for name, keyMap in (('assayPrep', assayPrep), ('assayAssay', assayAssay), ('assaySpecimen', assaySpecimen)):
+        if keyMap.spilled():
+            diagFile.write('Spilled : %s (%d keys) past ASSAYLOADMAPMEMORY\n' % (name, len(keyMap)))
+
+    profilelib.stage('manifest', setManifest)
+
+    if DEBUG or not bcpon:
+        return
+
+    profilelib.stage('bulkload', loadTables)
+    profilelib.stage('postload', postLoad)
+
+    return
+
+# Purpose:  runs the post-load maintenance of the loaded references
+# Returns:  nothing
+# Assumes:  the tables of the manifest have been loaded
+# Effects:  if ASSAYLOADPUTATIVE, updates the putative relationships of the
+#	    references of the loaded assays (see lib/postloadlib.py) and
+#	    writes the number updated for each to the diagnostics file
+#	    refreshes the ASSAYLOADCACHES for the loaded assays and writes
+#	    the number of keys and elapsed time of each to the diagnostics file
+#	    exits if a refresh fails
+# Throws:   nothing
+
+def postLoad():
+
+    if 'GXD_Assay' not in tables or not (putative or len(cacheNames) > 0):
+        return
+
+    import postloadlib
+
+    if putative:
+        refs = postloadlib.loadedReferences(manifestFileName)
+        postloadlib.setReferences(refs)
+        counts = postloadlib.updatePutative()
+
+        for jnum in sorted(refs):
+            diagFile.write('%s : %d putative relationship(s) updated to encodes\n' \
+                % (jnum, counts.get(refs[jnum], 0)))
+
+    if len(cacheNames) > 0:
+        failures = 0
+        keys = postloadlib.loadedKeys(manifestFileName)
+        for name, refreshed, failed, seconds in postloadlib.refreshCaches(keys, cacheNames):
+            diagFile.write('Cache %s : %d refreshed, %d failed, %.2f sec\n' % (name, refreshed, failed, seconds))
+            failures = failures + failed
+
+        if failures > 0:
+            exit(1, '%d cache refresh(es) failed; re-run refreshCaches.py %s\n' % (failures, manifestFileName))
+
+# Purpose:  resumes or rolls back the load recorded in the manifest
+# Returns:  1 if this is a restart (ASSAYLOADMODE = resume or rollback), else 0
+# Assumes:  init() and verifyMode() have been called
+# Effects:  resume:   verifies the bcp file checksums and loads the
+#		      tables that have not been loaded
+#	    rollback: deletes the rows of each loaded (or failed) table by key range,
+#		      in reverse bcp order, restores ACC_AccessionMax and the sequences
+#		      unless they were reserved (ASSAYLOADCONCURRENT)
+# Throws:   nothing
+
+def restart():
+
+    if mode not in ('resume', 'rollback'):
+        return 0
+
+    readManifest()
+
+    if mode == 'resume':
+
+        for table in tables:
+            r = manifest[table]
+            if r['status'] == 'loaded':
+                continue
+            if checksum(r['file']) != r['checksum']:
+                exit(1, 'Checksum of %s does not match manifest %s\n' % (r['file'], manifestFileName))
+
+        loadTables()
+        postLoad()
+        return 1
+
+    for table in reversed(tables):
+
+        r = manifest[table]
+
+        if r['status'] not in ('loaded', 'failed') or r['rows'] == 0:
+            continue
+
+        keyColumn = tableSpecs[table]['columns'][0]
+        db.sql('delete from %s where %s between %s and %s' % (table, keyColumn, r['first'], r['last']), None)
+        r['status'] = 'rolledback'
+
+    # only restore ACC_AccessionMax if no one else has moved it since
+    r = manifest['accmax']
+    if r['status'] == 'loaded' and assaysProcessed > 0:
+        db.sql('''update ACC_AccessionMax set maxNumericPart = %d
+            where prefixPart = '%s' and maxNumericPart = %d''' % (r['first'] - 1, mgiPrefix, r['last']), None)
+        r['status'] = 'rolledback'
+
+    db.commit()
+
+    # reserved sequences stay where they are; another load may own the keys above ours
+    if manifest['sequences']['status'] != 'reserved':
+        setSequences()
+        manifest['sequences']['status'] = 'rolledback'
+    writeManifest()
+
+    return 1
+
+# Purpose:  processes one probe prep line or record
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  verifies and processes the line/record
+# Throws:   nothing
+#
+#	Probe Prep file, a tab-delimited file in the format:
+#		field 1: Assay #
+#		field 2: Probe MGI ID
+#		field 3: Probe Prep Type
+#		field 4: Hybridization
+#		field 5: Labelled With
+#		field 6: Visualized With
+#
+#	For TR9695 (EurExpress load), there are multiple markers for some
+#	assays, so the probe prep file may contain duplicate records that
+#	only differ by the assayID.  Each combination of probe key, sense key,
+#	label key, visualization key and prep type is added only once and
+#	is shared by the assays.
+
+def processProbePrep(
+    lineNum,		# line/record number (integer)
+    tokens		# the fields of the line (tuple) or a recordlib.ProbePrep
+    ):
+
+    error = 0
+
+    assayID = tokens[0]
+    probeID = tokens[1]
+    prepType = tokens[2]
+    hybridization = tokens[3]
+    labelledWith = tokens[4]
+    visualization = tokens[5]
+
+    if gxdloadlib.verifyPrepType(prepType, lineNum, errorFile) == 0:
+        error = 1
+
+    probeKey = loadlib.verifyProbe(probeID, lineNum, errorFile)
+    senseKey = gxdloadlib.verifyPrepSense(hybridization, lineNum, errorFile)
+    labelKey = gxdloadlib.verifyPrepLabel(labelledWith, lineNum, errorFile)
+    visualizationKey = gxdloadlib.verifyPrepVisualization(visualization, lineNum, errorFile)
+
+    if probeKey == 0 or senseKey == 0 or labelKey == 0 or visualizationKey == 0:
+        # set error flag to true
+        error = 1
+
+    # if errors, continue to next record
+    if error:
+        rejectRow('prep', assayID, lineNum)
+        return
+
+    # if no errors, process
+
+    key = '%s:%s:%s:%s:%s' % (probeKey, senseKey, labelKey, visualizationKey, prepType)
+
+    if key in probePrepLookup:
+        assayPrep[assayID] = probePrepLookup[key]
+    else:
+        prepKey = nextKey('GXD_ProbePrep')
+        writeRow('GXD_ProbePrep', [prepKey, probeKey, senseKey, labelKey, visualizationKey, prepType])
+        assayPrep[assayID] = prepKey
+        probePrepLookup[key] = prepKey
+
+# Purpose:  processes probe prep data
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  verifies and processes each line in the input file (processProbePrep())
+# Throws:   nothing
+
+def processProbePrepFile(
+    inFileName		# input file name (str.
+    ):
+
+    for lineNum, tokens in readInput(inFileName, 6):
+        processProbePrep(lineNum, tokens)
+
+
+# Purpose:  processes one assay line or record
+# Returns:  nothing
+# Assumes:  the probe prep of the assay has been processed
+# Effects:  verifies and processes the line/record
+#	    skips it if its parent was rejected (skipRow())
+#	    sets global referenceKey
+# Throws:   nothing
+#
+#	Assay file, a tab-delimited file in the format:
+#		field 1: Assay #
+#		field 2: MGI Marker Accession ID
+#		field 3: Reference (J:#####)
+#		field 4: Assay Type
+#		field 5: Reporter Gene
+#		field 6: Assay Note
+#		field 7: Created By
+
+def processAssay(
+    lineNum,		# line/record number (integer)
+    tokens,		# the fields of the line (tuple) or a recordlib.Assay
+    prepTable		# GXD_ProbePrep or GXD_AntibodyPrep (str.
+    ):
+
+    global accKey, mgiKey, assaysProcessed, referenceKey
+
+    error = 0
+
+    assayID = tokens[0]
+    markerID = tokens[1]
+    jnum = tokens[2]
+    assayType = tokens[3]
+    reporterGene = tokens[4]
+    note = tokens[5]
+    createdBy = tokens[6]
+
+    markerKey = loadlib.verifyMarker(markerID, lineNum, errorFile)
+    referenceKey = loadlib.verifyReference(jnum, lineNum, errorFile)
+    assayTypeKey = gxdloadlib.verifyAssayType(assayType, lineNum, errorFile)
+    createdByKey = loadlib.verifyUser(createdBy, lineNum, errorFile)
+
+    if markerKey == 0 or referenceKey == 0 or assayTypeKey == 0:
+        # set error flag to true
+        error = 1
+
+    if len(reporterGene) > 0:
+        reporterGeneKey = gxdloadlib.verifyReporterGene(reporterGene, lineNum, errorFile)
+        if reporterGeneKey == 0:
+            error = 1
+    else:
+        reporterGeneKey = ''
+
+    # an assay whose prep was rejected is skipped with it
+    if assayID not in assayPrep and skipRow('assay', assayID, 'prep', assayID):
+        return
+
+    # if errors, continue to next record
+    if error:
+        rejectRow('assay', assayID, lineNum)
+        return
+
+    # if no errors, process
+
+    probePrepKey = ''
+    antibodyPrepKey = ''
+
+    if assayID in assayPrep:
+        if prepTable == 'GXD_AntibodyPrep':
+            antibodyPrepKey = assayPrep[assayID]
+        else:
+            probePrepKey = assayPrep[assayID]
+
+    assayKey = nextKey('GXD_Assay')
+
+    writeRow('GXD_Assay', [assayKey, assayTypeKey, referenceKey, markerKey,
+        probePrepKey, antibodyPrepKey, '', reporterGeneKey, createdByKey, createdByKey])
+
+    if len(note) > 0:
+        length = assayNoteLength or len(note)
+        for i in range(0, len(note), length):
+            writeRow('GXD_AssayNote', [assayKey, note[i:i + length]])
+
+    # MGI Accession ID for the assay
+
+    writeRow('ACC_Accession', [accKey, mgiPrefix + str(mgiKey), mgiPrefix, mgiKey,
+        accLogicalDBKey, assayKey, assayMgiTypeKey, accPrivate, accPreferred,
+        createdByKey, createdByKey])
+
+    assayAssay[assayID] = assayKey
+    accKey = accKey + 1
+    mgiKey = mgiKey + 1
+    assaysProcessed = assaysProcessed + 1
+
+# Purpose:  processes assay data
+# Returns:  reference key of the last assay processed
+# Assumes:  the prep file has been processed
+# Effects:  verifies and processes each line in the input file (processAssay())
+# Throws:   nothing
+
+def processAssayFile(
+    inFileName,		# input file name (str.
+    prepTable		# GXD_ProbePrep or GXD_AntibodyPrep (str.
+    ):
+
+    for lineNum, tokens in readInput(inFileName, 7):
+        processAssay(lineNum, tokens, prepTable)
+
+    return referenceKey
+
+
+# Purpose:  processes one specimen line or record
+# Returns:  nothing
+# Assumes:  the assay of the specimen has been processed
+# Effects:  verifies and processes the line/record
+#	    skips it if its parent was rejected (skipRow())
+# Throws:   nothing
+#
+#	Specimen file, a tab-delimited file in the format:
+#		field 1: Assay #
+#		field 2: Specimen #
+#		field 3: Specimen Label
+#		field 4: Genotype ID
+#		field 5: Age
+#		field 6: Age Note
+#		field 7: Sex
+#		field 8: Fixation
+#		field 9: Embedding Method
+#		field 10: Hybridization
+#		field 11: Specimen Note
+
+def processSpecimen(
+    lineNum,		# line/record number (integer)
+    tokens		# the fields of the line (tuple) or a recordlib.Specimen
+    ):
+
+    error = 0
+
+    assayID = tokens[0]
+    specimenID = tokens[1]
+    specimenLabel = tokens[2]
+    genotypeID = tokens[3]
+    age = tokens[4]
+    ageNote = tokens[5]
+    gender = tokens[6]
+    fixation = tokens[7]
+    embedding = tokens[8]
+    hybridization = tokens[9]
+    specimenNote = tokens[10]
+
+    if gxdloadlib.verifyHybridization(hybridization, lineNum, errorFile) == 0:
+        error = 1
+
+    genotypeKey = gxdloadlib.verifyGenotype(genotypeID, lineNum, errorFile)
+    fixationKey = gxdloadlib.verifyFixationMethod(fixation, lineNum, errorFile)
+    embeddingKey = gxdloadlib.verifyEmbeddingMethod(embedding, lineNum, errorFile)
+    ageMin, ageMax = agelib.ageMinMax(age)
+
+    if genotypeKey == 0 or fixationKey == 0 or embeddingKey == 0 or ageMin < 0 or ageMax < 0:
+        errorFile.write('genotypeKey = %s, age = %s, ageMin = %s, ageMax = %s\n' \
+            % (genotypeKey, age, ageMin, ageMax))
+        errorFile.write(str(tokens) + '\n\n')
+        error = 1
+
+    key = '%s:%s' % (assayID, specimenID)
+
+    if assayID not in assayAssay:
+        if skipRow('specimen', key, 'assay', assayID):
+            return
+        errorFile.write('Cannot find Assay key "%s"\n' % (assayID))
+        errorFile.write(str(tokens) + '\n\n')
+        error = 1
+
+    # if errors, continue to next record
+    if error:
+        rejectRow('specimen', key, lineNum)
+        return
+
+    # if no errors, process
+
+    specimenKey = nextKey('GXD_Specimen')
+
+    writeRow('GXD_Specimen', [specimenKey, assayAssay[assayID], embeddingKey, fixationKey, genotypeKey,
+        specimenID, specimenLabel, gender, age, ageMin, ageMax,
+        mgi_utils.prvalue(ageNote), hybridization, mgi_utils.prvalue(specimenNote)])
+
+    assaySpecimen[key] = specimenKey
+
+# Purpose:  processes specimen data
+# Returns:  nothing
+# Assumes:  the assay file has been processed
+# Effects:  verifies and processes each line in the input file (processSpecimen())
+# Throws:   nothing
+
+def processSpecimenFile(
+    inFileName		# input file name (str.
+    ):
+
+    for lineNum, tokens in readInput(inFileName, 11):
+        processSpecimen(lineNum, tokens)
+
+
+# Purpose:  builds the image pane lookup for a reference
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  sets global imagePaneLookup (figure label|pane label = pane key),
+#	    imagePaneReference; the panes of the previous reference are dropped
+# Throws:   nothing
+
+def setImagePaneLookup(
+    referenceKey	# reference key (integer)
+    ):
+
+    global imagePaneReference
+
+    imagePaneReference = referenceKey
+    imagePaneLookup.clear()
+
+    results = db.sql('''
+        select i.figureLabel, p.paneLabel, p._ImagePane_key
+        from IMG_Image i, IMG_ImagePane p
+        where i._Image_key = p._Image_key
+        and i._Refs_key = %s
+        ''' % (referenceKey), 'auto')
+
+    for r in results:
+        paneLabel = r['paneLabel']
+        if paneLabel == None:
+            paneLabel = ''
+        key = r['figureLabel'] + '|' + paneLabel
+        imagePaneLookup[key] = r['_ImagePane_key']
+
+# Purpose:  processes one in situ result line or record
+# Returns:  nothing
+# Assumes:  the specimen of the result has been processed
+#	    the results of a given specimen are contiguous
+# Effects:  verifies and processes the line/record
+#	    skips it if its parent was rejected (skipRow())
+# Throws:   nothing
+#
+#	Specimen Results file, a tab-delimited file in the format:
+#		field 1: Assay #
+#		field 2: Specimen #
+#		field 3: Result #
+#		field 4: Strength
+#		field 5: Pattern
+#		field 6: MGI Structure (EMAPA) ID
+#		field 7: MGI Structure Theiler Stage
+#		field 8: Result Note
+#		field 9: Comma-Separated list of Image Panes (figure label|pane label)
+
+def processResult(
+    lineNum,		# line/record number (integer)
+    tokens		# the fields of the line (tuple) or a recordlib.Result
+    ):
+
+    global prevAssay, prevSpecimen, prevResult, resultKey
+
+    error = 0
+
+    assayID = tokens[0]
+    specimenID = tokens[1]
+    resultID = tokens[2]
+    strength = tokens[3]
+    pattern = tokens[4]
+    emapaID = tokens[5]
+    structureTS = tokens[6]
+    resultNote = tokens[7]
+    imagePanes = tokens[8]
+
+    strengthKey = gxdloadlib.verifyStrength(strength, lineNum, errorFile)
+    patternKey = gxdloadlib.verifyPattern(pattern, lineNum, errorFile)
+    structureKey = loadlib.verifyTerm(emapaID, 90, '', lineNum, errorFile)
+
+    if strengthKey == 0 or patternKey == 0 or structureKey == 0:
+        # set error flag to true
+        error = 1
+
+    key = '%s:%s' % (assayID, specimenID)
+
+    # a result whose specimen was rejected is skipped with it
+    if key not in assaySpecimen and skipRow('result', None, 'specimen', key):
+        return
+
+    # if errors, continue to next record
+    if error:
+        return
+
+    # if no errors, process
+
+    if key not in assaySpecimen:
+        errorFile.write('Cannot find Assay:Specimen key "%s"\n' % (key))
+        errorFile.write(str(tokens) + '\n\n')
+        return
+
+    specimenKey = assaySpecimen[key]
+
+    if prevAssay != assayID:
+        prevSpecimen = 0
+
+    if prevSpecimen != specimenKey:
+        prevResult = 0
+
+    if prevResult != resultID:
+
+        resultKey = nextKey('GXD_InSituResult')
+
+        writeRow('GXD_InSituResult', [resultKey, specimenKey, strengthKey, patternKey,
+            resultID, mgi_utils.prvalue(resultNote)])
+
+        for image in str.split(imagePanes, ','):
+            if image in imagePaneLookup:
+                writeRow('GXD_InSituResultImage', [nextKey('GXD_InSituResultImage'),
+                    resultKey, imagePaneLookup[image]])
+
+    writeRow('GXD_ISResultStructure', [nextKey('GXD_ISResultStructure'),
+        resultKey, structureKey, structureTS])
+
+    prevAssay = assayID
+    prevSpecimen = specimenKey
+    prevResult = resultID
+
+# Purpose:  processes in situ results data
+# Returns:  nothing
+# Assumes:  the specimen file has been processed
+# Effects:  verifies and processes each line in the input file (processResult())
+#	    in Assay #/Specimen #/Result # order:  if the lines are not in
+#	    that order, they are sorted first, within ASSAYLOADSORTMEMORY
+#	    (sortlib.sortRows()), so that the structures of a result are
+#	    contiguous
+# Throws:   nothing
+
+def processResultsFile(
+    inFileName,		# input file name (str.
+    referenceKey	# reference key of the image panes (integer)
+    ):
+
+    import sortlib
+
+    setImagePaneLookup(referenceKey)
+
+    rows = readInput(inFileName, 9)
+
+    if not sortlib.isSorted(tabfilelib.readRows(inFileName, 3), resultColumns):
+        diagFile.write('Sorted : %s (unsorted input)\n' % (inFileName))
+        rows = sortlib.sortRows(rows, resultColumns, int(sortMemory) * 1048576, outputDir)
+
+    for lineNum, tokens in rows:
+        processResult(lineNum, tokens)
+
+# Purpose:  processes the records of an in-process parser
+# Returns:  reference key of the last assay processed
+# Assumes:  the probe prep of an assay comes before the assay, the assay
+#	    before its specimens and a specimen before its results
+#	    (the order in which insituconvertlib.records() generates them)
+# Effects:  processes each record with the stage of its type;
+#	    the number of a record within its type is its line number
+#	    exits on a record of an unknown type
+# Throws:   nothing
+
+def processRecords(
+    records,		# recordlib records (iterable)
+    prepTable		# GXD_ProbePrep or GXD_AntibodyPrep (str.
+    ):
+
+    lineNums = {}	# record type : number of records
+
+    for record in records:
+
+        recordType = type(record)
+        lineNum = lineNums.get(recordType, 0) + 1
+        lineNums[recordType] = lineNum
+
+        if recordType is recordlib.Result:
+            if imagePaneReference != referenceKey:
+                setImagePaneLookup(referenceKey)
+            processResult(lineNum, record)
+        elif recordType is recordlib.Specimen:
+            processSpecimen(lineNum, record)
+        elif recordType is recordlib.Assay:
+            processAssay(lineNum, record, prepTable)
+        elif recordType is recordlib.ProbePrep:
+            processProbePrep(lineNum, record)
+        else:
+            exit(1, 'Invalid record type: %s\n' % (recordType.__name__))
+
+    return referenceKey
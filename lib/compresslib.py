@@ -0,0 +1,169 @@
+
+#
+# Program: compresslib.py
+#
+# Purpose:
+#
+#	Open plain, gzip (.gz) or Zstandard (.zst) files alike, so that the
+#	input files of the loads and converters can be kept compressed and
+#	the bcp files can be written compressed.
+#
+# Requirements Satisfied by This Program:
+#
+#	zstandard (python module), for .zst files only
+#
+# Usage:
+#
+#	import compresslib
+#
+#	fileName = compresslib.findFile('In_Situ_results.txt')
+#		(In_Situ_results.txt, else In_Situ_results.txt.gz/.zst)
+#	fp = compresslib.openFile(fileName, 'r')
+#
+#	suffix, level = compresslib.parseCompression('zst:3')
+#	fp = compresslib.openFile('GXD_Assay.bcp' + suffix, 'w', level)
+#
+# Envvars:
+#
+# Inputs:
+#
+# Outputs:
+#
+# Exit Codes:
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	The compression of a file is that of its suffix.  gzip and zstandard
+#	are imported only when a .gz or .zst file is opened.
+#
+
+import os
+
+#globals
+
+encoding = 'utf-8'	# encoding of the compressed text files
+
+suffixes = ['.gz', '.zst']	# compressed file suffixes, in findFile() order
+
+defaultLevels = {	# suffix : default compression level
+    '.gz' : 6,
+    '.zst' : 3,
+    }
+
+# Purpose:  tells whether a file name is of a compressed file
+# Returns:  1 if it is, else 0
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def isCompressed(
+    fileName	# file name (str.
+    ):
+
+    return os.path.splitext(fileName)[1] in suffixes
+
+# Purpose:  finds a file, or its compressed copy
+# Returns:  fileName if it exists, else the first existing
+#	    fileName + suffix, else fileName
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def findFile(
+    fileName	# file name (str.
+    ):
+
+    if os.path.exists(fileName):
+        return fileName
+
+    for suffix in suffixes:
+        if os.path.exists(fileName + suffix):
+            return fileName + suffix
+
+    return fileName
+
+# Purpose:  parses a compression setting
+# Returns:  (suffix, level); ('', None) if spec is empty or none
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   ValueError if spec is not gz or zst, optionally with a
+#	    :level (gz 1-9, zst 1-22), or if it is zst and zstandard
+#	    is not installed
+
+def parseCompression(
+    spec	# gz, gz:level, zst, zst:level, none or '' (str.
+    ):
+
+    if spec in ('', 'none'):
+        return '', None
+
+    name, sep, level = spec.partition(':')
+    suffix = '.' + name
+
+    if suffix not in suffixes or (sep and not level.isdigit()):
+        raise ValueError(spec)
+
+    if suffix == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError('%s (the zstandard module is not installed)' % (spec))
+
+    if not sep:
+        return suffix, defaultLevels[suffix]
+
+    level = int(level)
+    if level < 1 or level > {'.gz' : 9, '.zst' : 22}[suffix]:
+        raise ValueError(spec)
+
+    return suffix, level
+
+# Purpose:  opens a plain or compressed file
+# Returns:  file object
+# Assumes:  nothing
+# Effects:  opens the file
+# Throws:   IOError/OSError if the file cannot be opened, or if it is a
+#	    .zst file and zstandard is not installed
+
+def openFile(
+    fileName,		# file name (str.
+    mode = 'r',		# r, w (text) or rb, wb (str.
+    level = None	# compression level, when writing; default is defaultLevels
+    ):
+
+    suffix = os.path.splitext(fileName)[1]
+
+    if suffix not in suffixes:
+        return open(fileName, mode)
+
+    if level is None:
+        level = defaultLevels[suffix]
+
+    if 'b' not in mode:
+        textMode = mode + 't'
+    else:
+        textMode = mode
+
+    if suffix == '.gz':
+        import gzip
+        if 'b' in mode:
+            return gzip.open(fileName, mode, compresslevel = level)
+        return gzip.open(fileName, textMode, compresslevel = level, encoding = encoding)
+
+    try:
+        import zstandard
+    except ImportError:
+        raise IOError('%s: the zstandard module is not installed' % (fileName))
+
+    if 'w' in mode:
+        cctx = zstandard.ZstdCompressor(level = level)
+    else:
+        cctx = None
+
+    if 'b' in mode:
+        return zstandard.open(fileName, mode, cctx = cctx)
+    return zstandard.open(fileName, textMode, cctx = cctx, encoding = encoding)
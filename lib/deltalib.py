@@ -0,0 +1,113 @@
+
+#
+# Program: deltalib.py
+#
+# Purpose:
+#
+#	Fingerprint the assays of the input files of a delta load
+#	(ASSAYLOADDELTA=yes; see assayloadlib.setDelta()), so that an input
+#	assay can be compared with the assays already in the database.
+#
+#	This library does not use the database, so the fingerprints of the
+#	input files can be computed (and tested) without it.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import deltalib
+#
+#	fp = deltalib.fingerprint(jnum, markerID, prepID, labels, structures)
+#	inputs = deltalib.inputFingerprints(deltaSpec)
+#	inputs = deltalib.inputFingerprints(deltaSpec, assayloadlib.readInput)
+#
+# Envvars:
+#
+# Inputs:
+#
+#	the input files of insituload.py/gelload.py/immunoload.py
+#
+# Outputs:
+#
+# Exit Codes:
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	The fingerprint is the MD5 digest of the reference, the marker, the
+#	probe/antibody and the sorted labels and structures, so the order of
+#	the lines does not matter.
+#
+
+import hashlib
+import tabfilelib
+
+#globals
+
+TAB = '\t'		# tab
+
+# Purpose:  fingerprints an assay
+# Returns:  fingerprint (bytes)
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+#
+#	the fingerprint covers the reference, the marker, the probe/antibody
+#	of the prep, the specimen/lane labels and the result/lane structures
+#	(EMAPA ID:stage); the labels and structures are compared as sets
+#	with repeats, so the order of the lines does not matter
+
+def fingerprint(
+    jnum,		# reference (J:#####) (str.
+    markerID,		# marker MGI ID (str.
+    prepID,		# probe/antibody MGI ID (str.
+    labels,		# specimen/lane labels (list)
+    structures		# EMAPA ID:stage of each result/lane structure (list)
+    ):
+
+    return hashlib.md5(TAB.join([jnum, markerID, prepID,
+        '|'.join(sorted(labels)), '|'.join(sorted(structures))]).encode()).digest()
+
+# Purpose:  fingerprints the assays of the input files
+# Returns:  dictionary of Assay ID : (reference, fingerprint), in file order
+# Assumes:  deltaSpec describes the input files (see assayloadlib.setDelta())
+#	    and the input files have the layouts of insituload/gelload/immunoload
+# Effects:  reads the input files
+# Throws:   IOError/OSError if a file cannot be read, when readRows is
+#	    tabfilelib.readRows
+#
+#	readRows reads the (lineNum, tokens) of a file; the loads pass
+#	assayloadlib.readInput(), which reports the invalid lines of a file
+
+def inputFingerprints(
+    deltaSpec,		# see Assumes (dictionary)
+    readRows = tabfilelib.readRows	# readRows(fileName, nColumns) (function)
+    ):
+
+    assays = {}		# Assay ID : [reference, marker, prep, labels, structures]
+
+    for lineNum, tokens in readRows(deltaSpec['assay'], 3):
+        assays[tokens[0]] = [tokens[2], tokens[1], '', [], []]
+
+    for lineNum, tokens in readRows(deltaSpec['prep'], 2):
+        if tokens[0] in assays:
+            assays[tokens[0]][2] = tokens[1]
+
+    fileName, column = deltaSpec['labels']
+    for lineNum, tokens in readRows(fileName, column + 1):
+        if tokens[0] in assays:
+            assays[tokens[0]][3].append(tokens[column])
+
+    fileName, emapaColumn, stageColumn = deltaSpec['structures']
+    for lineNum, tokens in readRows(fileName, stageColumn + 1):
+        if tokens[0] in assays and len(tokens[emapaColumn]) > 0:
+            assays[tokens[0]][4].append(tokens[emapaColumn] + ':' + tokens[stageColumn])
+
+    fingerprints = {}
+    for assayID, (jnum, markerID, prepID, labels, structures) in assays.items():
+        fingerprints[assayID] = (jnum, fingerprint(jnum, markerID, prepID, labels, structures))
+
+    return fingerprints
@@ -26,6 +26,9 @@
 #
 # Implementation:
 #
+# 10/19/2026
+#	- reserveKeys/reserveMGIIDs; concurrency-safe key and MGI ID allocation
+#
 # 03/05/2014	lec
 #	- TR11471/verifyPrepAntibody/verifyPrepSecondary
 #
@@ -35,7 +38,6 @@
 
 import sys
 import os
-import accessionlib
 import db
 
 #globals
@@ -64,6 +66,56 @@ visualDict = {}         # probe visualization
 prepTypeList = ['DNA', 'RNA', 'Not Specified']  # probe prep types
 hybridizationList = ['section', 'whole mount', 'section from whole mount', 'Not Specified']
 
+allocationLock = 2026101901	# advisory lock id shared by all loaders that reserve keys
+
+# Purpose:  reserve a contiguous range of primary keys from a sequence
+# Returns:  the first key of the range (integer)
+# Assumes:  the sequence generates the keys of keyColumn in table
+# Effects:  under the allocation advisory lock, in its own transaction:
+#	moves the sequence up to the table maximum if it is behind it,
+#	then advances it by count in a single nextval (the sequence increment
+#	is set to count for the duration of the transaction, and ALTER SEQUENCE
+#	blocks any concurrent nextval until the commit), so the range
+#	can not be handed out to anyone else
+# Throws:  nothing
+
+def reserveKeys(
+    sequence,	# sequence name (str.
+    table,	# table name (str.
+    keyColumn,	# primary key column of table (str.
+    count	# number of keys to reserve (integer)
+    ):
+
+    db.sql('select pg_advisory_xact_lock(%d)' % (allocationLock), None)
+    db.sql('alter sequence %s increment by %d' % (sequence, count), None)
+    db.sql('''select setval('%s', greatest((select last_value from %s),
+        (select coalesce(max(%s), 0) from %s))) ''' % (sequence, sequence, keyColumn, table), None)
+    results = db.sql('''select nextval('%s') as lastKey ''' % (sequence), 'auto')
+    db.sql('alter sequence %s increment by 1' % (sequence), None)
+    db.commit()
+
+    return results[0]['lastKey'] - count + 1
+
+# Purpose:  reserve a contiguous range of accession numeric parts
+# Returns:  the first numeric part of the range (integer)
+# Assumes:  ACC_AccessionMax has a row for the prefix
+# Effects:  under the allocation advisory lock, in its own transaction:
+#	advances ACC_AccessionMax by count with a single update...returning;
+#	the row lock makes this safe against ACC_setMax/ACC_assignMGI
+# Throws:  nothing
+
+def reserveMGIIDs(
+    count,		# number of numeric parts to reserve (integer)
+    prefix = 'MGI:'	# accession prefix (str.
+    ):
+
+    db.sql('select pg_advisory_xact_lock(%d)' % (allocationLock), None)
+    results = db.sql('''update ACC_AccessionMax set maxNumericPart = maxNumericPart + %d
+        where prefixPart = '%s' returning maxNumericPart ''' % (count, prefix), 'auto')
+    db.commit()
+
+    return results[0]['maxNumericPart'] - count + 1
+
 # Purpose:  verify Antibody Accession ID
 # Returns:  Antibody Key if Antibody is valid, else 0
 # Assumes:  nothing
@@ -299,6 +351,7 @@ def verifyGenotype(
     if genotypeID in genotypeDict:
         genotypeKey = genotypeDict[genotypeID]
     else:
+        import accessionlib
         genotypeKey = accessionlib.get_Object_key(genotypeID, 'Genotype')
         if genotypeKey is None:
             if errorFile != None:
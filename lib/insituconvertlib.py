@@ -0,0 +1,791 @@
+
+#
+# Program: insituconvertlib.py
+#
+# Purpose:
+#
+#	Convert a wide in situ screen (one row per gene, one column per
+#	reported tissue) into the four input files of insituload.py:
+#
+#		In_Situ_probeprep.txt
+#		In_Situ_assay.txt
+#		In_Situ_specimen.txt
+#		In_Situ_results.txt
+#
+#	Everything that is particular to a screen (file names, column
+#	positions, the strength/pattern code tables, the probe prep, assay
+#	and specimen constants, tissue specific overrides) comes from a
+#	mapping file; see mappings/rnainsitu14.ini for a commented example.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import insituconvertlib
+#
+#	mapping = insituconvertlib.readMapping(mappingFileName)
+#	insituconvertlib.convert(mapping)
+#	insituconvertlib.convert(mapping, shards)	(in parallel)
+#
+#	or, to hand the records to the loader without writing the files:
+#
+#	assayloadlib.processRecords(insituconvertlib.records(mapping), 'GXD_ProbePrep')
+#
+#	or, as a program:
+#
+#	insituconvertlib.run(mappingFileName)
+#
+# Envvars:
+#
+#	any environment variable named in the mapping file ($NAME or ${NAME})
+#	ASSAYLOADPROFILE	yes: profile the stages of a conversion (lib/profilelib.py):
+#				<program>.<nn>.<stage>.pstats and .collapsed, in the
+#				output directory; default is no
+#	ASSAYLOADMEMORYREPORT	yes: report the memory of each stage (lib/profilelib.py),
+#				to <program>.memory in the output directory; default is no
+#
+# Inputs:
+#
+#	Mapping file, in configparser (.ini) format
+#
+#	Screen file, a tab-delimited file with one header line and one row
+#	per gene; the columns used are named in the mapping file
+#
+#	Tissue file, a tab-delimited file in the format:
+#		field 1: Reported Tissue
+#		field 2: MGI Tissue
+#		field 3: Theiler Stage
+#
+#	Probe file, a tab-delimited file; the MGI Marker Accession ID
+#	and Probe MGI ID columns are named in the mapping file
+#
+#	Each of the screen, tissue and probe files may be gzip or Zstandard
+#	compressed:  the file named in the mapping file, or if it does not
+#	exist, that name with .gz/.zst (see lib/compresslib.py)
+#
+# Outputs:
+#
+#       4 tab-delimited files, in the output directory of the mapping file:
+#
+#	In_Situ_probeprep.txt
+#	In_Situ_assay.txt
+#	In_Situ_specimen.txt
+#	In_Situ_results.txt
+#
+#	and, if the mapping's [output] compact = yes, In_Situ_defaults.txt
+#	(the probe prep, assay and specimen constants of the mapping, written
+#	once; see lib/recordlib.py)
+#
+# Exit Codes:
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	The screen file is first scanned for the distinct result codes
+#	(scanCodes()), and each is translated once (checkCodes()), so that
+#	every code that is not in the mapping is reported before anything
+#	is converted.  The screen file is then streamed into recordlib
+#	records; the results are transformed by widematrixlib.  One assay (and one probe prep and
+#	specimen) is generated per probe of each gene, numbered from 1, and is
+#	followed by its results.
+#
+#	In parallel (convert(mapping, shards)), the gene rows are split into
+#	shards of consecutive rows with about the same number of assays; the
+#	scan counts the assays of each row, so each shard's assays are
+#	numbered from where the previous shard's end.  Each shard is converted
+#	by a worker process into its own directory, and the shards' files are
+#	concatenated in order, so the output is that of a sequential conversion.
+#
+
+import sys
+import os
+import configparser
+import widematrixlib
+import recordlib
+import compresslib
+import profilelib
+
+#globals
+
+TAB = '\t'		# tab
+CRT = '\n'		# carriage return/newline
+NULL = ''
+
+# Purpose: prints error message and exits
+# Returns: nothing
+# Assumes: nothing
+# Effects: exits with exit status
+# Throws: nothing
+
+def exit(
+    status,          # numeric exit status (integer)
+    message = None   # exit message (str.
+    ):
+
+    if message is not None:
+        sys.stderr.write('\n' + str(message) + '\n')
+ 
+    sys.exit(status)
+
+# Purpose:  reads a mapping file
+# Returns:  the mapping (dictionary of section name : dictionary of option : value)
+#	    with the code tables, columns and tissue overrides parsed
+# Assumes:  nothing
+# Effects:  reads the mapping file; environment variables in values are expanded
+# Throws:   IOError if the mapping file cannot be read
+#	    KeyError/ValueError if a required section or option is missing or invalid
+
+def readMapping(
+    mappingFileName	# mapping file name (str.
+    ):
+
+    config = configparser.ConfigParser(interpolation = None)
+    config.optionxform = str
+
+    fp = open(mappingFileName, 'r')
+    config.read_file(fp)
+    fp.close()
+
+    mapping = {}
+    for section in config.sections():
+        mapping[section] = {}
+        for option, value in config.items(section):
+            mapping[section][option] = os.path.expandvars(value)
+
+    # column positions
+
+    columns = {}
+    for option, value in mapping['columns'].items():
+        if ':' in value:
+            start, end = str.split(value, ':')
+            columns[option] = (int(start), int(end))
+        else:
+            columns[option] = int(value)
+    mapping['columns'] = columns
+
+    for option in ('markerID', 'probeID'):
+        mapping['probe'][option] = int(mapping['probe'][option])
+
+    mapping['output']['compact'] = mapping['output'].get('compact', 'no') == 'yes'
+
+    # "" is the empty code (an option cannot be empty)
+
+    for section in ('strength', 'pattern'):
+        if '""' in mapping[section]:
+            mapping[section][NULL] = mapping[section].pop('""')
+
+    results = mapping['results']
+    results['presentPatterns'] = str.split(results.get('presentPatterns', ''))
+    results['describedLength'] = int(results.get('describedLength', '0'))
+
+    # tissue overrides:  [tissue <MGI tissue>]
+
+    overrides = {}
+    for section in list(mapping.keys()):
+        if section.startswith('tissue '):
+            overrides[section[len('tissue '):]] = mapping[section]
+            del mapping[section]
+    mapping['overrides'] = overrides
+
+    return mapping
+
+# Purpose:  reads the tissue translation
+# Returns:  dictionary of reported tissue : list of (MGI tissue, theiler stage, override)
+#	    override is the MGI tissue if it has a [tissue <name>] override, else None
+# Assumes:  readMapping() has parsed the overrides
+# Effects:  reads the tissue file
+# Throws:   IOError if the file cannot be read
+
+def readTissues(
+    mapping	# mapping (dictionary)
+    ):
+
+    tissueTrans = {}
+    overrides = mapping['overrides']
+
+    fp = compresslib.openFile(compresslib.findFile(mapping['input']['tissues']), 'r')
+    for line in fp:
+        tokens = str.split(line[:-1], TAB)
+        badTissue = tokens[0]
+        goodTissue = tokens[1]
+        theilerStage = tokens[2]
+        if badTissue not in tissueTrans:
+            tissueTrans[badTissue] = []
+        if goodTissue in overrides:
+            tissueTrans[badTissue].append((goodTissue, theilerStage, goodTissue))
+        else:
+            tissueTrans[badTissue].append((goodTissue, theilerStage, None))
+    fp.close()
+
+    return tissueTrans
+
+# Purpose:  reads the probe table
+# Returns:  dictionary of MGI Marker Accession ID : list of Probe MGI IDs
+# Assumes:  nothing
+# Effects:  reads the probe file
+# Throws:   IOError if the file cannot be read
+
+def readProbes(
+    mapping	# mapping (dictionary)
+    ):
+
+    probeTrans = {}
+    markerColumn = mapping['probe']['markerID']
+    probeColumn = mapping['probe']['probeID']
+
+    fp = compresslib.openFile(compresslib.findFile(mapping['input']['probes']), 'r')
+    for line in fp:
+        tokens = str.split(line[:-1], TAB)
+        mgiID = tokens[markerColumn]
+        probeID = tokens[probeColumn]
+
+        if len(mgiID) == 0:
+            continue
+
+        if mgiID not in probeTrans:
+            probeTrans[mgiID] = []
+        probeTrans[mgiID].append(probeID)
+    fp.close()
+
+    return probeTrans
+
+# Purpose:  determines the default strength/pattern of a row's empty cells
+# Returns:  (strength, pattern)
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+#
+#	the defaults are [results] defaultStrength/defaultPattern, unless the
+#	row's overall expression column is "<[overall] expression> <strength code>"
+#	(e.g. "ubiquitous **"); then the strength is that of the code and the
+#	pattern is that of [overall] pattern
+
+def rowDefaults(
+    mapping,	# mapping (dictionary)
+    tokens	# the row's fields (list)
+    ):
+
+    results = mapping['results']
+    defaults = (results.get('defaultStrength', NULL), results.get('defaultPattern', NULL))
+
+    if 'overall' not in mapping or 'overallExpression' not in mapping['columns']:
+        return defaults
+
+    overallExpression = tokens[mapping['columns']['overallExpression']]
+
+    if len(overallExpression) > 0:
+        try:
+            [oExpression, oStrength] = str.split(overallExpression, ' ')
+
+            if oExpression == mapping['overall']['expression']:
+                defaults = (mapping['strength'][oStrength],
+                            mapping['pattern'][mapping['overall']['pattern']])
+        except:
+            pass
+
+    return defaults
+
+# Purpose:  translates a result cell
+# Returns:  (strength, pattern, result note)
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   KeyError/ValueError if the cell's codes are not in the code tables
+#
+#	[results] cells = strength pattern
+#		the cell is "<strength code> <pattern code>"; a cell of one
+#		character or less takes the row defaults; if the pattern code is
+#		one of presentPatterns, the strength is looked up by the pattern code
+#	[results] cells = strength
+#		the cell is a strength code (an empty cell is emptyStrength),
+#		with pattern codedPattern; a cell of describedLength characters
+#		or more is a pattern description: describedStrength/describedPattern
+#
+#	a [tissue <name>] override replaces the pattern (a pattern code) and
+#	the result note of the tissue's cells that have results
+
+def translateResult(
+    mapping,	# mapping (dictionary)
+    cell,	# result cell (str.
+    tissue,	# MGI tissue if it has an override, else None (str.
+    defaults	# (strength, pattern) of an empty cell (tuple)
+    ):
+
+    results = mapping['results']
+    strengthTrans = mapping['strength']
+    patternTrans = mapping['pattern']
+    resultNote = NULL
+
+    if results['cells'] == 'strength':
+
+        if cell == NULL:
+            strength = results['emptyStrength']
+            pattern = results['codedPattern']
+        elif cell in strengthTrans:
+            strength = strengthTrans[cell]
+            pattern = results['codedPattern']
+        elif results['describedLength'] > 0 and len(cell) >= results['describedLength']:
+            strength = results['describedStrength']
+            pattern = results['describedPattern']
+        else:
+            raise KeyError(cell)
+
+        return (strength, pattern, resultNote)
+
+    # if there are results...
+
+    if len(cell) > 1:
+
+        [inStrength, inPattern] = str.split(cell, ' ')
+
+        if inPattern in results['presentPatterns']:
+            strength = strengthTrans[inPattern]
+            pattern = patternTrans[inPattern]
+        else:
+            strength = strengthTrans[inStrength]
+            pattern = patternTrans[inPattern]
+
+        if tissue is not None:
+            override = mapping['overrides'][tissue]
+            resultNote = override.get('note', NULL)
+            pattern = patternTrans[override['pattern']]
+
+    # no strength or pattern given
+
+    else:
+        strength, pattern = defaults
+
+    return (strength, pattern, resultNote)
+
+# Purpose:  determines the defaults of compact output
+# Returns:  record type : dictionary of field name : default value
+#	    (see recordlib.writeRecords()), or None if the output is not compact
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+#
+#	the defaults are the non-empty constants of the mapping, and the
+#	specimen # of the results (one specimen per assay)
+
+def recordDefaults(
+    mapping	# mapping (dictionary)
+    ):
+
+    if not mapping['output']['compact']:
+        return None
+
+    prep = mapping['probeprep']
+    assayConstants = mapping['assay']
+    spec = mapping['specimen']
+
+    defaults = {
+        recordlib.ProbePrep : {
+            'prepType' : prep['prepType'],
+            'hybridization' : prep['hybridization'],
+            'labelledWith' : prep['labelledWith'],
+            'visualization' : prep['visualizedWith'],
+            },
+        recordlib.Assay : {
+            'jnum' : assayConstants['reference'],
+            'assayType' : assayConstants['assayType'],
+            'reporterGene' : assayConstants.get('reporterGene', NULL),
+            'note' : assayConstants.get('note', NULL),
+            'createdBy' : assayConstants['createdBy'],
+            },
+        recordlib.Specimen : {
+            'genotypeID' : spec['genotype'],
+            'age' : spec['age'],
+            'ageNote' : spec['ageNote'],
+            'sex' : spec['sex'],
+            'fixation' : spec['fixation'],
+            'embedding' : spec['embedding'],
+            'hybridization' : spec['hybridization'],
+            'specimenNote' : spec.get('note', NULL),
+            },
+        recordlib.Result : {
+            'specimenID' : '1',
+            },
+        }
+
+    for fields in defaults.values():
+        for field in [f for f in fields if fields[f] == NULL]:
+            del fields[field]
+
+    return defaults
+
+# Purpose:  scans the result cells of the screen of a mapping
+# Returns:  (index of the result columns (see widematrixlib),
+#	     dictionary of (cell, override) : [number of results, first line number],
+#	     list of (line number, number of assays) of the rows that are converted)
+# Assumes:  nothing
+# Effects:  reads the screen file
+# Throws:   IOError if the file cannot be read
+#	    ValueError if tissue labels of the header are not in the tissue file
+#
+#	only the rows that records() converts are scanned (not the rows without
+#	a mouse gene or probe); override is that of the cell's tissue (see readTissues())
+
+def scanCodes(
+    mapping,		# mapping (dictionary)
+    tissueTrans,	# see readTissues() (dictionary)
+    probeTrans		# see readProbes() (dictionary)
+    ):
+
+    columns = mapping['columns']
+    resultStart, resultEnd = columns['results']
+
+    index = []
+    codes = {}
+    assays = []
+    lineNum = 0
+
+    inFile = compresslib.openFile(compresslib.findFile(mapping['input']['matrix']), 'r')
+
+    for line in inFile:
+
+        lineNum = lineNum + 1
+        tokens = str.split(line[:-1], TAB)
+
+        if lineNum == 1:
+            index, missing = widematrixlib.buildIndex(tokens[resultStart:resultEnd], tissueTrans)
+            if len(missing) > 0:
+                inFile.close()
+                raise ValueError('Tissue labels not in %s: %s' \
+                    % (mapping['input']['tissues'], ', '.join(missing)))
+            continue
+
+        try:
+            mouseGene = tokens[columns['mouseGene']]
+            accID = str.strip(tokens[columns['markerID']])
+        except:
+            continue
+
+        if len(mouseGene) == 0 or accID not in probeTrans:
+            continue
+
+        assays.append((lineNum, len(probeTrans[accID])))
+
+        cells = tokens[resultStart:resultEnd]
+        nCells = len(cells)
+
+        for column, result, tissue, theilerStage, override in index:
+            if column >= nCells:
+                continue
+            key = (cells[column], override)
+            if key in codes:
+                codes[key][0] = codes[key][0] + 1
+            else:
+                codes[key] = [1, lineNum]
+
+    inFile.close()
+
+    return index, codes, assays
+
+# Purpose:  validates the distinct result cells of a screen against the mapping
+# Returns:  list of (cell, number of results, first line number) of the cells
+#	    that do not translate, in line order; empty if all translate
+# Assumes:  codes is from scanCodes()
+# Effects:  nothing
+# Throws:   nothing
+
+def checkCodes(
+    mapping,	# mapping (dictionary)
+    codes	# (cell, override) : [number of results, first line number] (dictionary)
+    ):
+
+    badCodes = {}
+
+    for (cell, override), (count, lineNum) in codes.items():
+        try:
+            # the row defaults only fill empty cells; any will do
+            translateResult(mapping, cell, override, (NULL, NULL))
+        except (KeyError, ValueError):
+            if cell in badCodes:
+                badCodes[cell][0] = badCodes[cell][0] + count
+                badCodes[cell][1] = min(badCodes[cell][1], lineNum)
+            else:
+                badCodes[cell] = [count, lineNum]
+
+    badCodes = [(cell, count, lineNum) for cell, (count, lineNum) in badCodes.items()]
+    badCodes.sort(key = lambda c: c[2])
+
+    return badCodes
+
+# Purpose:  reads and validates the screen of a mapping before conversion
+# Returns:  (index of the result columns, probe translation (see readProbes()),
+#	     list of (line number, number of assays) of the rows that are converted)
+# Assumes:  nothing
+# Effects:  reads the screen, tissue and probe files
+# Throws:   IOError if a file cannot be read
+#	    ValueError if tissue labels of the header are not in the tissue file,
+#	    or result codes are not in the mapping
+
+def prepare(
+    mapping	# mapping (dictionary)
+    ):
+
+    tissueTrans = readTissues(mapping)
+    probeTrans = readProbes(mapping)
+
+    index, codes, assays = scanCodes(mapping, tissueTrans, probeTrans)
+    badCodes = checkCodes(mapping, codes)
+    if len(badCodes) > 0:
+        raise ValueError('%d result code(s) not in the code tables:\n%s' % (len(badCodes),
+            ''.join(['\t"%s": %d result(s), first at line %d\n' % c for c in badCodes])))
+
+    return index, probeTrans, assays
+
+# Purpose:  generates the records of the screen of a mapping
+# Returns:  generator of recordlib records
+# Assumes:  nothing
+# Effects:  reads the screen, tissue and probe files
+#	    writes a message to stdout for each skipped row
+# Throws:   IOError if a file cannot be read
+#	    ValueError if tissue labels of the header are not in the tissue file,
+#	    or result codes are not in the mapping (raised before the first record)
+
+def records(
+    mapping	# mapping (dictionary)
+    ):
+
+    index, probeTrans, assays = prepare(mapping)
+
+    for record in rowRecords(mapping, index, probeTrans, 2, None, 1):
+        yield record
+
+# Purpose:  generates the records of a range of rows of the screen of a mapping
+# Returns:  generator of recordlib records
+# Assumes:  index and probeTrans are from prepare()
+# Effects:  reads the screen file
+#	    writes a message to stdout for each skipped row
+# Throws:   IOError if the file cannot be read
+#
+#	the assays are numbered from firstAssay, one per probe of each row
+
+def rowRecords(
+    mapping,	# mapping (dictionary)
+    index,	# index of the result columns (list)
+    probeTrans,	# see readProbes() (dictionary)
+    firstLine,	# line number of the first row (integer); line 1 is the header
+    lastLine,	# line number after the last row (integer), or None for the end of the file
+    firstAssay	# Assay ID of the first assay (integer)
+    ):
+
+    columns = mapping['columns']
+    prep = mapping['probeprep']
+    assayConstants = mapping['assay']
+    spec = mapping['specimen']
+    resultStart, resultEnd = columns['results']
+
+    memos = {}	# row defaults : translated result cells
+    assay = firstAssay	# unique Assay ID
+    lineNum = 0
+
+    inFile = compresslib.openFile(compresslib.findFile(mapping['input']['matrix']), 'r')
+
+    for line in inFile:
+
+        lineNum = lineNum + 1
+
+        if lineNum < firstLine:
+            continue
+
+        if lastLine is not None and lineNum >= lastLine:
+            break
+
+        tokens = str.split(line[:-1], TAB)
+
+        try:
+            mouseGene = tokens[columns['mouseGene']]
+            accID = str.strip(tokens[columns['markerID']])
+            cells = tokens[resultStart:resultEnd]
+        except:
+            print('Invalid Line (%d): %s\n' % (lineNum, line))
+            continue
+
+        if len(mouseGene) == 0:
+            continue
+
+        # create one assay per probe for given marker
+
+        if accID not in probeTrans:
+            print('Cannot find MGI ID in Probe file: %s\n' % (accID))
+            continue
+
+        defaults = rowDefaults(mapping, tokens)
+        if defaults not in memos:
+            memos[defaults] = {}
+
+        results = widematrixlib.resultRows(cells, index, memos[defaults],
+            lambda cell, tissue: translateResult(mapping, cell, tissue, defaults))
+
+        for probeID in probeTrans[accID]:
+
+            assayID = str(assay)
+
+            yield recordlib.ProbePrep(assayID, probeID, prep['prepType'], prep['hybridization'],
+                prep['labelledWith'], prep['visualizedWith'])
+
+            yield recordlib.Assay(assayID, accID, assayConstants['reference'], assayConstants['assayType'],
+                assayConstants.get('reporterGene', NULL), assayConstants.get('note', NULL),
+                assayConstants['createdBy'])
+
+            # one specimen for each Assay
+
+            specimenID = '1'
+
+            yield recordlib.Specimen(assayID, specimenID, spec['label'] % (mouseGene), spec['genotype'],
+                spec['age'], spec['ageNote'], spec['sex'], spec['fixation'], spec['embedding'],
+                spec['hybridization'], spec.get('note', NULL))
+
+            # one result for each Tissue
+
+            for result, strength, pattern, tissue, theilerStage, note in results:
+                yield recordlib.Result(assayID, specimenID, result, strength, pattern,
+                    tissue, theilerStage, note, NULL)
+
+            assay = assay + 1
+
+    inFile.close()
+
+# Purpose:  splits the rows of a screen into shards
+# Returns:  list of (first line number, line number after the last row or None,
+#	     Assay ID of the first assay), in row order
+# Assumes:  assays is from prepare()
+# Effects:  nothing
+# Throws:   nothing
+
+def splitShards(
+    assays,	# list of (line number, number of assays) (list)
+    shards	# number of shards (integer)
+    ):
+
+    total = sum([n for lineNum, n in assays])
+    shards = max(1, min(shards, len(assays)))
+
+    bounds = [(2, 1)]	# (first line number, first Assay ID) of each shard
+    done = 0
+
+    for lineNum, n in assays:
+        if len(bounds) < shards and done >= total * len(bounds) / shards \
+           and lineNum > bounds[-1][0]:
+            bounds.append((lineNum, done + 1))
+        done = done + n
+
+    return [(bounds[k][0], bounds[k + 1][0] if k + 1 < len(bounds) else None, bounds[k][1])
+            for k in range(len(bounds))]
+
+# Purpose:  converts a shard of the screen of a mapping
+# Returns:  nothing
+# Assumes:  runs in a worker process of convert()
+# Effects:  writes the four insituload input files of the shard to its directory
+# Throws:   IOError if a file cannot be read or written
+
+def convertShard(
+    args	# (mapping, index, probeTrans, shard (see splitShards()), directory) (tuple)
+    ):
+
+    mapping, index, probeTrans, (firstLine, lastLine, firstAssay), directory = args
+
+    recordlib.writeRecords(rowRecords(mapping, index, probeTrans, firstLine, lastLine, firstAssay),
+        directory, recordDefaults(mapping))
+    sys.stdout.flush()
+
+# Purpose:  converts the screen of a mapping
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  writes the four insituload input files to the output directory
+#	    (and the defaults file, if the output is compact)
+#	    writes a message to stdout for each skipped row
+#	    if shards > 1, converts in that many worker processes, each in a
+#	    shard.<n> directory of the output directory (removed once done)
+# Throws:   IOError if a file cannot be read or written
+#	    ValueError if tissue labels of the header are not in the tissue file,
+#	    or result codes are not in the mapping (before any record is written)
+
+def convert(
+    mapping,	# mapping (dictionary)
+    shards = 1	# number of worker processes (integer)
+    ):
+
+    directory = mapping['output']['directory']
+
+    index, probeTrans, assays = profilelib.stage('prepare', prepare, mapping)
+
+    if shards <= 1:
+        profilelib.stage('convert', recordlib.writeRecords,
+            rowRecords(mapping, index, probeTrans, 2, None, 1), directory, recordDefaults(mapping))
+        return
+
+    import shutil
+    import multiprocessing
+
+    work = []
+    for shard in splitShards(assays, shards):
+        shardDir = os.path.join(directory, 'shard.%d' % (len(work) + 1))
+        if not os.path.isdir(shardDir):
+            os.mkdir(shardDir)
+        work.append((mapping, index, probeTrans, shard, shardDir))
+
+    sys.stdout.flush()
+
+    try:
+        pool = multiprocessing.get_context('fork').Pool(len(work))
+        try:
+            pool.map(convertShard, work, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+        profilelib.stage('concatenate', concatenate, mapping, [w[4] for w in work])
+    finally:
+        for w in work:
+            shutil.rmtree(w[4], True)
+
+# Purpose:  writes the output files of a parallel conversion
+# Returns:  nothing
+# Assumes:  the shards have been converted
+# Effects:  writes the defaults file and concatenates the shards' files
+#	    into the output directory
+# Throws:   IOError if a file cannot be read or written
+
+def concatenate(
+    mapping,	# mapping (dictionary)
+    shardDirs	# the shards' directories, in order (list)
+    ):
+
+    directory = mapping['output']['directory']
+
+    recordlib.writeDefaults(directory, recordDefaults(mapping))
+    recordlib.catRecords(shardDirs, directory)
+
+# Purpose:  reads a mapping file and converts its screen
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  see convert(), or process()
+#	    exits if a file cannot be read or written, or if the mapping
+#	    does not cover the screen
+# Throws:   nothing
+
+def run(
+    mappingFileName,	# mapping file name (str.
+    process = None	# function(mapping) to run on the mapping; default is convert()
+    ):
+
+    if process is None:
+        process = convert
+
+    try:
+        mapping = readMapping(mappingFileName)
+        profilelib.init(os.path.join(mapping['output']['directory'],
+            os.path.splitext(os.path.basename(sys.argv[0]))[0]), sys.stdout)
+        profilelib.watch(sys.modules[__name__], widematrixlib, recordlib)
+        process(mapping)
+    except (IOError, OSError) as e:
+        exit(1, 'Could not open file %s\n' % (e.filename))
+    except KeyError as e:
+        exit(1, 'Not in mapping file %s: %s\n' % (mappingFileName, e))
+    except (ValueError, configparser.Error) as e:
+        exit(1, 'Invalid mapping file %s: %s\n' % (mappingFileName, e))
@@ -0,0 +1,162 @@
+
+#
+# Program: keymaplib.py
+#
+# Purpose:
+#
+#	Key maps (input ID : database key) that move to disk once they
+#	outgrow a memory budget, so that the lookups of a load do not grow
+#	with the submission (e.g. Assay ID:Specimen ID : _Specimen_key).
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import keymaplib
+#
+#	keymaplib.memory = 256 * 1048576
+#	assaySpecimen = keymaplib.KeyMap()
+#	assaySpecimen['1:1'] = 1000
+#	if key in assaySpecimen:
+#		specimenKey = assaySpecimen[key]
+#
+# Envvars:
+#
+#	TMPDIR		directory of the spilled maps (see sqlite3); default /tmp
+#
+# Inputs:
+#
+# Outputs:
+#
+#	a temporary SQLite database per spilled map, removed when the map
+#	is closed or the process exits
+#
+# Exit Codes:
+#
+# Assumes:
+#
+#	The keys are strings; the values are integers or strings.
+#
+# Bugs:
+#
+# Implementation:
+#
+#	A KeyMap is a dictionary until its estimated size reaches the budget;
+#	it then moves its entries to a private temporary SQLite database
+#	(sqlite3.connect('')) and looks them up there, by primary key.
+#	The database needs no durability, so it has no journal or syncs.
+#	sqlite3 is imported only when a map spills.
+#
+#	Only the dictionary operations the loads use are supported:
+#	in, [], []=, get() and len().
+#
+
+#globals
+
+memory = 268435456	# bytes of entries a map holds in memory before it spills (0: always spills)
+entryOverhead = 160	# estimated bytes per entry, besides its key text
+
+# Purpose:  a map of input ID : database key that spills to disk
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+class KeyMap(object):
+
+    def __init__(self):
+
+        self.entries = {}	# the map, until it spills
+        self.size = 0		# estimated bytes of self.entries
+        self.count = 0		# number of entries
+        self.db = None		# the map, once it has spilled (sqlite3 connection)
+
+    def __contains__(self, key):
+
+        if self.db is None:
+            return key in self.entries
+
+        return self.db.execute('select 1 from keymap where k = ?', (key,)).fetchone() is not None
+
+    def __getitem__(self, key):
+
+        if self.db is None:
+            return self.entries[key]
+
+        row = self.db.execute('select v from keymap where k = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+
+        return row[0]
+
+    def get(self, key, default = None):
+
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+
+        if self.db is not None:
+            if key not in self:
+                self.count = self.count + 1
+            self.db.execute('insert or replace into keymap values (?, ?)', (key, value))
+            return
+
+        if key not in self.entries:
+            self.count = self.count + 1
+            self.size = self.size + entryOverhead + len(key)
+
+        self.entries[key] = value
+
+        if self.size >= memory:
+            self.spill()
+
+    def __len__(self):
+
+        return self.count
+
+    # Purpose:  moves the entries to a temporary database
+    # Returns:  nothing
+    # Assumes:  the map has not spilled
+    # Effects:  creates the database, empties self.entries
+    # Throws:   sqlite3.Error if the database cannot be created
+
+    def spill(self):
+
+        import sqlite3
+
+        self.db = sqlite3.connect('')
+        self.db.execute('pragma journal_mode = off')
+        self.db.execute('pragma synchronous = off')
+        self.db.execute('create table keymap (k text primary key, v) without rowid')
+        self.db.executemany('insert into keymap values (?, ?)', self.entries.items())
+        self.entries = {}
+        self.size = 0
+
+    # Purpose:  whether the map has spilled to disk
+    # Returns:  1 if it has, else 0
+    # Assumes:  nothing
+    # Effects:  nothing
+    # Throws:   nothing
+
+    def spilled(self):
+
+        return self.db is not None
+
+    # Purpose:  empties the map
+    # Returns:  nothing
+    # Assumes:  nothing
+    # Effects:  closes (and so removes) the temporary database, if any
+    # Throws:   nothing
+
+    def close(self):
+
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+        self.entries = {}
+        self.size = 0
+        self.count = 0
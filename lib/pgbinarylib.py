@@ -0,0 +1,139 @@
+
+#
+# Program: pgbinarylib.py
+#
+# Purpose:
+#
+#	Write rows in the PostgreSQL binary COPY format, so that the server
+#	loads the integer keys and dates of the largest tables (in situ
+#	results, result structures/images, gel bands) without parsing text.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import pgbinarylib
+#
+#	types = ['int4', 'int4', 'text', 'timestamp']
+#	fp = open('GXD_GelBand.bin', 'wb')
+#	fp.write(pgbinarylib.header)
+#	fp.write(pgbinarylib.encodeRow(types, [1000, 2000, '', '10/19/2026']))
+#	fp.write(pgbinarylib.trailer)
+#	fp.close()
+#
+#	cursor.copy_expert('copy mgd.GXD_GelBand from stdin with binary', open(..., 'rb'))
+#
+# Envvars:
+#
+# Inputs:
+#
+# Outputs:
+#
+# Exit Codes:
+#
+# Assumes:
+#
+#	The server has integer datetimes (the default since PostgreSQL 10),
+#	and the timestamp columns are timestamp without time zone.
+#	The text is in the client encoding (encoding).
+#
+# Bugs:
+#
+# Implementation:
+#
+#	A file is the 19 byte header, one tuple per row (16-bit field count;
+#	per field, a 32-bit length, -1 for null, and the value in network
+#	byte order) and the 16-bit -1 trailer.
+#
+#	An empty value is null, as in the text bcp files (null as '').
+#	A timestamp is microseconds since 2000-01-01; the timestamps of a
+#	load are all its load date, so each is parsed once (timestamps).
+#
+
+import struct
+
+#globals
+
+encoding = 'utf-8'	# encoding of the text values
+
+header = b'PGCOPY\n\377\r\n\0' + struct.pack('>ii', 0, 0)	# signature, flags, extension length
+trailer = struct.pack('>h', -1)
+
+types = ['int4', 'text', 'timestamp']	# the column types that can be encoded
+
+timeFormats = ['%m/%d/%Y', '%m/%d/%Y %H:%M:%S', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S']	# timestamp text formats
+epoch = (2000, 1, 1)	# PostgreSQL timestamp epoch (year, month, day)
+
+fieldCount = struct.Struct('>h')
+fieldLength = struct.Struct('>i')
+int4Field = struct.Struct('>ii')
+timestampField = struct.Struct('>iq')
+nullField = fieldLength.pack(-1)
+
+timestamps = {}		# timestamp text : encoded field
+
+# Purpose:  encodes a timestamp
+# Returns:  the encoded field (bytes)
+# Assumes:  nothing
+# Effects:  caches the field in global timestamps
+# Throws:   ValueError if the value is not in one of timeFormats
+
+def encodeTimestamp(
+    value	# timestamp (str.
+    ):
+
+    if value in timestamps:
+        return timestamps[value]
+
+    import datetime
+
+    for timeFormat in timeFormats:
+        try:
+            t = datetime.datetime.strptime(value, timeFormat)
+            break
+        except ValueError:
+            pass
+    else:
+        raise ValueError('Invalid timestamp: %s' % (value))
+
+    delta = t - datetime.datetime(*epoch)
+    micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    timestamps[value] = timestampField.pack(8, micros)
+
+    return timestamps[value]
+
+# Purpose:  encodes one row
+# Returns:  the encoded tuple (bytes)
+# Assumes:  len(fields) == len(columnTypes)
+# Effects:  nothing
+# Throws:   ValueError if an int4 or timestamp value is not valid;
+#	    the message names the column and the value
+
+def encodeRow(
+    columnTypes,	# type of each column, one of types (list)
+    fields,		# column values, in table order; '' or None is null (list)
+    columnNames = None	# name of each column, for the error message (list)
+    ):
+
+    parts = [fieldCount.pack(len(fields))]
+
+    for column, (columnType, value) in enumerate(zip(columnTypes, fields)):
+        try:
+            if value is None or value == '':
+                parts.append(nullField)
+            elif columnType == 'int4':
+                parts.append(int4Field.pack(4, int(value)))
+            elif columnType == 'timestamp':
+                parts.append(encodeTimestamp(value))
+            else:
+                data = str(value).encode(encoding)
+                parts.append(fieldLength.pack(len(data)))
+                parts.append(data)
+        except (ValueError, struct.error):
+            if columnNames is not None:
+                name = columnNames[column]
+            else:
+                name = 'column %d' % (column + 1)
+            raise ValueError('Invalid %s value for %s: %s' % (columnType, name, value))
+
+    return b''.join(parts)
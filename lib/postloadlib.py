@@ -0,0 +1,378 @@
+
+#
+# Program: postloadlib.py
+#
+# Purpose:
+#
+#	Post-load maintenance of the GXD assay loads, set-based over a
+#	batch of references:  one statement per task for all of the
+#	references, instead of one script run per J: number.
+#
+#	The batch is either a list of J: numbers, or the references of the
+#	assays loaded by a load (from its manifest; see lib/assayloadlib.py).
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import postloadlib
+#
+#	postloadlib.init()
+#	refs, missing = postloadlib.referenceKeys(['J:80502', 'J:228563'])
+#	refs = postloadlib.loadedReferences('insituload.manifest')
+#	postloadlib.setReferences(refs)
+#	counts = postloadlib.createPrbReference(createdByKey)
+#	counts = postloadlib.updatePutative()
+#
+#	keys = postloadlib.loadedKeys('insituload.manifest')
+#	for cache, nKeys, nFailed, seconds in postloadlib.refreshCaches(keys, ['gxdexpression', 'mrkref']):
+#
+# Envvars:
+#
+#	MGD_DBUSER
+#	MGD_DBPASSWORDFILE
+#	PYTHON
+#	MGICACHELOAD	(gxdexpression)
+#	ASSAYLOADCACHEJOBS	number of gxdexpression.py runs at a time; default is 4
+#
+# Inputs:
+#
+# Outputs:
+#
+# Exit Codes:
+#
+# Assumes:
+#
+#	PRB_Reference._Reference_key is generated by prb_reference_seq.
+#	${MGICACHELOAD}/gxdexpression.py -K refreshes the cache of one assay.
+#
+# Bugs:
+#
+# Implementation:
+#
+#	setReferences() loads the batch into the temp table postload_refs;
+#	each task joins to it, so that the work of a batch is one statement.
+#
+#	The caches are refreshed for the keys of the loaded assays only
+#	(loadedKeys()) instead of being rebuilt:  gxdexpression for each
+#	assay, expressionJobs runs at a time (the runs of different assays
+#	touch different cache rows), MRK_Reference (MRK_reloadReference)
+#	for each marker.
+#
+
+import os
+import time
+import db
+import gxdloadlib
+
+#globals
+
+user = os.environ['MGD_DBUSER']
+passwordFileName = os.environ['MGD_DBPASSWORDFILE']
+
+TAB = '\t'		# tab
+CRT = '\n'		# carriage return/newline
+
+refsTable = 'postload_refs'	# temp table of the batch:  _Refs_key
+
+expressionJobs = os.environ.get('ASSAYLOADCACHEJOBS', '4')	# gxdexpression.py runs at a time
+
+# Purpose:  initializes the database connection
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  sets the database login
+# Throws:   nothing
+
+def init():
+
+    db.set_sqlUser(user)
+    db.set_sqlPasswordFromFile(passwordFileName)
+
+# Purpose:  looks up the references of a list of J: numbers
+# Returns:  (dictionary of J: number : _Refs_key, list of the J: numbers not found)
+# Assumes:  nothing
+# Effects:  queries the database (one query for the list)
+# Throws:   nothing
+
+def referenceKeys(
+    jnums	# J: numbers (list of str.)
+    ):
+
+    refs = {}
+
+    if len(jnums) > 0:
+        results = db.sql('''select jnumID, _Refs_key from BIB_Citation_Cache
+            where jnumID in (%s) ''' % (','.join(["'%s'" % (j) for j in jnums])), 'auto')
+        for r in results:
+            refs[r['jnumID']] = r['_Refs_key']
+
+    return refs, [j for j in jnums if j not in refs]
+
+# Purpose:  reads the key range of the assays loaded by a load
+# Returns:  (first _Assay_key, last _Assay_key), or None if the manifest
+#	    has no loaded GXD_Assay rows
+# Assumes:  the manifest was written by lib/assayloadlib.py
+# Effects:  reads the manifest file
+# Throws:   IOError if the manifest cannot be read
+
+def assayKeyRange(
+    manifestFileName	# manifest file name (str.
+    ):
+
+    keyRange = None
+
+    fp = open(manifestFileName, 'r')
+    for line in fp:
+        tokens = str.split(line[:-1], TAB)
+        if tokens[0] == 'table' and tokens[1] == 'GXD_Assay' \
+           and tokens[7] == 'loaded' and int(tokens[5]) > 0:
+            keyRange = (int(tokens[3]), int(tokens[4]))
+    fp.close()
+
+    return keyRange
+
+# Purpose:  looks up the references of the assays loaded by a load
+# Returns:  dictionary of J: number : _Refs_key
+#	    empty if the manifest has no loaded GXD_Assay rows
+# Assumes:  the manifest was written by lib/assayloadlib.py
+# Effects:  reads the manifest file, queries the database
+# Throws:   IOError if the manifest cannot be read
+
+def loadedReferences(
+    manifestFileName	# manifest file name (str.
+    ):
+
+    refs = {}
+    keyRange = assayKeyRange(manifestFileName)
+
+    if keyRange is None:
+        return refs
+
+    results = db.sql('''select distinct c.jnumID, c._Refs_key
+        from GXD_Assay a, BIB_Citation_Cache c
+        where a._Assay_key between %d and %d
+        and a._Refs_key = c._Refs_key ''' % keyRange, 'auto')
+    for r in results:
+        refs[r['jnumID']] = r['_Refs_key']
+
+    return refs
+
+# Purpose:  loads the batch of references into the temp table
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  (re)creates the temp table refsTable with the _Refs_keys of refs
+# Throws:   nothing
+
+def setReferences(
+    refs	# J: number : _Refs_key (dictionary)
+    ):
+
+    db.sql('drop table if exists %s' % (refsTable), None)
+    db.sql('create temp table %s (_Refs_key int not null primary key)' % (refsTable), None)
+
+    keys = sorted(set(refs.values()))
+    if len(keys) > 0:
+        db.sql('insert into %s values %s' % (refsTable,
+            ','.join(['(%d)' % (k) for k in keys])), None)
+
+# Purpose:  adds the missing PRB_Reference rows of the batch
+# Returns:  dictionary of _Refs_key : number of rows added
+#	    (references that needed none are not included)
+# Assumes:  setReferences() has loaded the batch
+# Effects:  for each reference of the batch, adds a PRB_Reference row for each
+#	    probe of its assays (via GXD_ProbePrep) that is not yet associated
+#	    with it; the keys are reserved for the whole batch at once
+#	    (gxdloadlib.reserveKeys), and the rows are added in one statement
+#	    commits
+# Throws:   nothing
+#
+#	the count, the reservation and the insert are separate transactions:
+#	the insert adds no more rows than were counted (so its keys stay in
+#	the reserved range), and the count is repeated, with a new reservation,
+#	until it finds no missing rows (e.g. added by another load meanwhile)
+
+def createPrbReference(
+    createdByKey	# _CreatedBy_key/_ModifiedBy_key of the new rows (integer)
+    ):
+
+    newRows = '''select distinct a._Refs_key, pp._Probe_key
+        from %s r, GXD_Assay a, GXD_ProbePrep pp
+        where r._Refs_key = a._Refs_key
+        and a._ProbePrep_key = pp._ProbePrep_key
+        and not exists (select 1 from PRB_Reference pr
+            where pr._Probe_key = pp._Probe_key
+            and pr._Refs_key = a._Refs_key) ''' % (refsTable)
+
+    counts = {}
+
+    while True:
+
+        results = db.sql('select count(*) as n from (%s) n' % (newRows), 'auto')
+        count = results[0]['n']
+
+        if count == 0:
+            break
+
+        firstKey = gxdloadlib.reserveKeys('prb_reference_seq', 'PRB_Reference', '_Reference_key', count)
+
+        results = db.sql('''with new as (
+            select _Refs_key, _Probe_key, row_number() over (order by _Refs_key, _Probe_key) as n
+            from (%s) nr),
+            added as (
+            insert into PRB_Reference (_Reference_key, _Probe_key, _Refs_key, hasRmap, hasSequence,
+                _CreatedBy_key, _ModifiedBy_key, creation_date, modification_date)
+            select %d + n - 1, _Probe_key, _Refs_key, 0, 0, %d, %d, now(), now()
+            from new
+            where n <= %d
+            returning _Refs_key)
+            select _Refs_key, count(*) as n from added group by _Refs_key
+            ''' % (newRows, firstKey, createdByKey, createdByKey, count), 'auto')
+        db.commit()
+
+        for r in results:
+            counts[r['_Refs_key']] = counts.get(r['_Refs_key'], 0) + r['n']
+
+    return counts
+
+# Purpose:  changes the putative probe/marker relationships of the batch to encodes
+# Returns:  dictionary of _Refs_key : number of PRB_Marker rows updated
+#	    (references that needed none are not included)
+# Assumes:  setReferences() has loaded the batch
+# Effects:  sets PRB_Marker.relationship from 'P' (putative) to 'E' (encodes)
+#	    for the probe/marker of each assay of the batch (via GXD_ProbePrep),
+#	    in one statement
+#	    commits
+# Throws:   nothing
+#
+#	a PRB_Marker row shared by assays of several references of the batch
+#	is updated (and counted) once, under one of them
+
+def updatePutative():
+
+    results = db.sql('''with updated as (
+        update PRB_Marker p
+        set relationship = 'E'
+        from %s r, GXD_Assay a, GXD_ProbePrep pp
+        where r._Refs_key = a._Refs_key
+        and a._ProbePrep_key = pp._ProbePrep_key
+        and pp._Probe_key = p._Probe_key
+        and a._Marker_key = p._Marker_key
+        and p.relationship = 'P'
+        returning a._Refs_key)
+        select _Refs_key, count(*) as n from updated group by _Refs_key
+        ''' % (refsTable), 'auto')
+    db.commit()
+
+    counts = {}
+    for r in results:
+        counts[r['_Refs_key']] = r['n']
+
+    return counts
+
+# Purpose:  looks up the keys of the assays loaded by a load
+# Returns:  dictionary of '_Assay_key'/'_Refs_key'/'_Marker_key' : sorted list of keys
+#	    (the lists are empty if the manifest has no loaded GXD_Assay rows)
+# Assumes:  the manifest was written by lib/assayloadlib.py
+# Effects:  reads the manifest file, queries the database
+# Throws:   IOError if the manifest cannot be read
+
+def loadedKeys(
+    manifestFileName	# manifest file name (str.
+    ):
+
+    keys = {'_Assay_key' : set(), '_Refs_key' : set(), '_Marker_key' : set()}
+    keyRange = assayKeyRange(manifestFileName)
+
+    if keyRange is not None:
+        results = db.sql('''select _Assay_key, _Refs_key, _Marker_key from GXD_Assay
+            where _Assay_key between %d and %d ''' % keyRange, 'auto')
+        for r in results:
+            for k in keys:
+                keys[k].add(r[k])
+
+    for k in keys:
+        keys[k] = sorted(keys[k])
+
+    return keys
+
+# Purpose:  refreshes the gxdexpression cache of the loaded assays
+# Returns:  (number of assays refreshed, number that failed)
+# Assumes:  expressionJobs is a positive integer (str.)
+# Effects:  runs ${MGICACHELOAD}/gxdexpression.py -K for each assay,
+#	    expressionJobs at a time, and checks the exit status of each run
+# Throws:   nothing
+
+def refreshExpression(
+    keys	# see loadedKeys() (dictionary)
+    ):
+
+    cmd = '%s %s/gxdexpression.py -S%s -D%s -U%s -P%s -K%%d' \
+        % (os.environ.get('PYTHON', 'python3'), os.environ['MGICACHELOAD'],
+           db.get_sqlServer(), db.get_sqlDatabase(), user, passwordFileName)
+
+    assayKeys = keys['_Assay_key']
+
+    if len(assayKeys) == 0:
+        return 0, 0
+
+    # each run is its own interpreter; the threads only wait on them
+
+    import multiprocessing.pool
+
+    pool = multiprocessing.pool.ThreadPool(min(int(expressionJobs), len(assayKeys)))
+    try:
+        statuses = pool.map(os.system, [cmd % (assayKey) for assayKey in assayKeys])
+    finally:
+        pool.close()
+        pool.join()
+
+    failed = len([status for status in statuses if status != 0])
+
+    return len(assayKeys) - failed, failed
+
+# Purpose:  refreshes the MRK_Reference cache of the markers of the loaded assays
+# Returns:  (number of markers refreshed, 0)
+# Assumes:  nothing
+# Effects:  runs MRK_reloadReference for each marker, in one statement
+#	    commits
+# Throws:   nothing
+
+def refreshMarkerReference(
+    keys	# see loadedKeys() (dictionary)
+    ):
+
+    markers = keys['_Marker_key']
+
+    if len(markers) > 0:
+        db.sql('select count(MRK_reloadReference(m)) from unnest(array[%s]) m' \
+            % (','.join([str(k) for k in markers])), 'auto')
+        db.commit()
+
+    return len(markers), 0
+
+# cache name : function(keys) that refreshes it, returning (refreshed, failed)
+
+caches = {
+    'gxdexpression' : refreshExpression,
+    'mrkref' : refreshMarkerReference,
+    }
+
+# Purpose:  refreshes caches for the keys of the loaded assays
+# Returns:  list of (cache name, number of keys refreshed, number failed, elapsed seconds)
+# Assumes:  the names are in caches
+# Effects:  refreshes each cache in turn
+# Throws:   KeyError if a name is not in caches
+
+def refreshCaches(
+    keys,	# see loadedKeys() (dictionary)
+    names	# cache names, in refresh order (list)
+    ):
+
+    timings = []
+
+    for name in names:
+        start = time.time()
+        refreshed, failed = caches[name](keys)
+        timings.append((name, refreshed, failed, time.time() - start))
+
+    return timings
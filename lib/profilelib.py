@@ -0,0 +1,325 @@
+
+#
+# Program: profilelib.py
+#
+# Purpose:
+#
+#	Profile the stages of a load or conversion (ASSAYLOADPROFILE=yes):
+#	each stage is run under cProfile and a stack sampler, and writes a
+#	.pstats file and a collapsed stack file (for flamegraph.pl and the
+#	like) next to the diagnostics file of the load.
+#
+#	Report the memory of each stage (ASSAYLOADMEMORYREPORT=yes):  at the
+#	end of each stage, the top allocation sites (tracemalloc), the
+#	number of entries of each global lookup of the watched modules,
+#	and the peak memory, to a report next to the diagnostics file.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import profilelib
+#
+#	profilelib.init('insituload', diagFile)
+#	profilelib.watch(assayloadlib, gxdloadlib)
+#	referenceKey = profilelib.stage('assay', processAssayFile, inAssayFileName, 'GXD_ProbePrep')
+#
+#	python -m pstats insituload.02.assay.pstats
+#	flamegraph.pl insituload.02.assay.collapsed > assay.svg
+#
+# Envvars:
+#
+#	ASSAYLOADPROFILE	yes: profile each stage; default is no
+#	ASSAYLOADMEMORYREPORT	yes: report the memory of each stage; default is no
+#
+# Inputs:
+#
+# Outputs:
+#
+#	for each stage, <prefix>.<nn>.<stage>.pstats (cProfile) and
+#	<prefix>.<nn>.<stage>.collapsed (one "frame;frame;... count" line per
+#	sampled stack, outermost frame first), nn being the stage's order
+#	a line per stage (elapsed time, samples, files) to the report file
+#
+#	<prefix>.memory (ASSAYLOADMEMORYREPORT), for each stage:
+#		the traced memory at the end of the stage and its peak during
+#		the stage, and the peak resident set size of the process
+#		the topCount allocation sites (file:line) of the memory in use,
+#		and of the growth since the end of the previous stage
+#		the entries of each non-empty global dictionary, set, list or
+#		keymaplib.KeyMap of the watched modules
+#
+# Exit Codes:
+#
+# Assumes:
+#
+#	The stages run in the main thread, and nothing else uses SIGALRM.
+#
+# Bugs:
+#
+#	The worker processes of a parallel conversion are not profiled.
+#
+# Implementation:
+#
+#	When profiling and the memory report are off, stage() only calls
+#	the function, and cProfile, signal, resource and tracemalloc are
+#	not imported.
+#
+#	tracemalloc is started when this module is imported, so that the
+#	allocations of the whole load are traced; it slows the load down.
+#	Only the memory allocated by Python is traced (not psycopg2's or
+#	the database's); the resident set size is the whole process'.
+#
+#	The stacks are sampled every interval seconds of elapsed (not CPU)
+#	time, by a SIGALRM handler, so that the time a stage spends waiting
+#	on the database or the disk is in its flamegraph too.
+#	A stage run within a stage is part of the outer stage's profile.
+#
+
+import os
+import sys
+import time
+
+#globals
+
+enabled = os.environ.get('ASSAYLOADPROFILE', 'no') == 'yes'
+tracing = os.environ.get('ASSAYLOADMEMORYREPORT', 'no') == 'yes'
+
+interval = 0.005	# seconds between stack samples
+prefix = 'assayload'	# path and name the profile files start with
+reportFile = None	# file a line per stage is written to (file object)
+stageCount = 0		# number of stages profiled
+
+active = None		# name of the stage being profiled
+baseFrame = None	# frame of stage() for the stage being profiled
+samples = {}		# collapsed stack : number of samples, of the stage being profiled
+
+topCount = 10		# number of allocation sites reported per stage
+watched = []		# modules whose global lookups are reported (list)
+lastSnapshot = None	# tracemalloc snapshot at the end of the previous stage
+memoryFilters = [	# file names of the allocations that are not the load's (besides tracemalloc's)
+    __file__,
+    '<frozen importlib._bootstrap>',
+    '<frozen importlib._bootstrap_external>',
+    '<unknown>',
+    ]
+
+if tracing:
+    import tracemalloc
+    tracemalloc.start()
+
+# Purpose:  sets where the profiles of the stages are written
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  sets global prefix, reportFile
+#	    if reporting memory, empties <prefix>.memory
+# Throws:   IOError if the memory report cannot be written
+
+def init(
+    name,		# path and name the profile files start with (str.
+    report = None	# file a line per stage is written to (file object)
+    ):
+
+    global prefix, reportFile
+
+    prefix = name
+    reportFile = report
+
+    if tracing:
+        open(prefix + '.memory', 'w').close()
+
+# Purpose:  adds modules whose global lookups are reported
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  adds the modules to global watched
+# Throws:   nothing
+
+def watch(
+    *modules	# modules
+    ):
+
+    for module in modules:
+        if module not in watched:
+            watched.append(module)
+
+# Purpose:  samples the stack of the stage being profiled
+# Returns:  nothing
+# Assumes:  a stage is being profiled
+# Effects:  counts the stack in global samples
+# Throws:   nothing
+
+def sample(
+    signum,	# signal number (integer)
+    frame	# the frame that was interrupted
+    ):
+
+    stack = []
+
+    while frame is not None and frame is not baseFrame:
+        code = frame.f_code
+        stack.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+        frame = frame.f_back
+
+    stack.append(active)
+    key = ';'.join(reversed(stack))
+    samples[key] = samples.get(key, 0) + 1
+
+# Purpose:  writes the profiles of a stage
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  writes the .pstats and .collapsed files and a line to the report file
+# Throws:   IOError if a file cannot be written
+
+def writeProfile(
+    name,	# stage name (str.
+    profiler,	# the stage's profiler (cProfile.Profile)
+    elapsed	# elapsed seconds of the stage (float)
+    ):
+
+    fileName = '%s.%02d.%s' % (prefix, stageCount, name)
+
+    profiler.dump_stats(fileName + '.pstats')
+
+    fp = open(fileName + '.collapsed', 'w')
+    for key in sorted(samples):
+        fp.write('%s %d\n' % (key, samples[key]))
+    fp.close()
+
+    # exit() closes the diagnostics file before a failed stage ends
+    if reportFile is not None and not reportFile.closed:
+        reportFile.write('Profile : %s %.2f sec, %d samples : %s.pstats, %s.collapsed\n' \
+            % (name, elapsed, sum(samples.values()), fileName, fileName))
+        reportFile.flush()
+
+# Purpose:  returns the global lookups of the watched modules
+# Returns:  list of (module.name, number of entries), of the
+#	    non-empty dictionaries, sets, lists and KeyMaps, largest first
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def lookups():
+
+    counts = []
+
+    for module in watched:
+        for name, value in list(vars(module).items()):
+            if name.startswith('__'):
+                continue
+            if isinstance(value, (dict, set, list)) or type(value).__name__ == 'KeyMap':
+                if len(value) > 0:
+                    name = '%s.%s' % (module.__name__, name)
+                    if type(value).__name__ == 'KeyMap' and value.spilled():
+                        name = name + ' (spilled to disk)'
+                    counts.append((name, len(value)))
+
+    counts.sort(key = lambda c: -c[1])
+
+    return counts
+
+# Purpose:  writes the memory report of a stage
+# Returns:  nothing
+# Assumes:  tracemalloc is tracing
+# Effects:  takes a tracemalloc snapshot, appends the stage to
+#	    <prefix>.memory and a line to the report file
+# Throws:   IOError if the file cannot be written
+
+def writeMemory(
+    name,	# stage name (str.
+    peak	# peak traced bytes during the stage (integer)
+    ):
+
+    global lastSnapshot
+
+    import resource
+    import tracemalloc
+
+    filters = [tracemalloc.Filter(False, f) for f in [tracemalloc.__file__] + memoryFilters]
+    snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+    current = sum([s.size for s in snapshot.statistics('filename')])
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    fp = open(prefix + '.memory', 'a')
+
+    fp.write('%02d %s\n\n' % (stageCount, name))
+    fp.write('\ttraced %.1f MB, peak %.1f MB during the stage; peak RSS %.1f MB\n\n' \
+        % (current / 1048576.0, peak / 1048576.0, rss))
+
+    fp.write('\ttop allocation sites\n')
+    for s in snapshot.statistics('lineno')[:topCount]:
+        frame = s.traceback[0]
+        fp.write('\t%10.1f KB %10d blocks  %s:%d\n' % (s.size / 1024.0, s.count, frame.filename, frame.lineno))
+
+    if lastSnapshot is not None:
+        fp.write('\n\tgrowth since the previous stage\n')
+        for s in snapshot.compare_to(lastSnapshot, 'lineno')[:topCount]:
+            frame = s.traceback[0]
+            fp.write('\t%+10.1f KB %+10d blocks  %s:%d\n' \
+                % (s.size_diff / 1024.0, s.count_diff, frame.filename, frame.lineno))
+
+    fp.write('\n\tlookups\n')
+    for lookup, count in lookups():
+        fp.write('\t%10d  %s\n' % (count, lookup))
+
+    fp.write('\n')
+    fp.close()
+
+    lastSnapshot = snapshot
+
+    if reportFile is not None and not reportFile.closed:
+        reportFile.write('Memory : %s %.1f MB traced, %.1f MB peak, %.1f MB peak RSS : %s.memory\n' \
+            % (name, current / 1048576.0, peak / 1048576.0, rss, prefix))
+        reportFile.flush()
+
+# Purpose:  runs a stage, profiled if ASSAYLOADPROFILE=yes
+# Returns:  whatever function returns
+# Assumes:  nothing
+# Effects:  calls function(*args, **kwargs); if profiling, writes the
+#	    profiles of the stage (see writeProfile()); if reporting memory,
+#	    writes the memory report of the stage (see writeMemory())
+# Throws:   whatever function throws
+
+def stage(
+    name,	# stage name, used in the profile file names (str.
+    function,	# the stage
+    *args,	# arguments of function
+    **kwargs	# keyword arguments of function
+    ):
+
+    global stageCount, active, baseFrame, samples
+
+    if not (enabled or tracing) or active is not None:
+        return function(*args, **kwargs)
+
+    stageCount = stageCount + 1
+    active = name
+
+    if tracing:
+        import tracemalloc
+        tracemalloc.reset_peak()
+
+    if enabled:
+        import signal
+        import cProfile
+        baseFrame = sys._getframe()
+        samples = {}
+        profiler = cProfile.Profile()
+        previous = signal.signal(signal.SIGALRM, sample)
+        signal.setitimer(signal.ITIMER_REAL, interval, interval)
+        start = time.time()
+        profiler.enable()
+
+    try:
+        return function(*args, **kwargs)
+    finally:
+        if enabled:
+            profiler.disable()
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+            elapsed = time.time() - start
+            baseFrame = None
+        active = None
+        if enabled:
+            writeProfile(name, profiler, elapsed)
+        if tracing:
+            writeMemory(name, tracemalloc.get_traced_memory()[1])
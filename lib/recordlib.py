@@ -0,0 +1,231 @@
+
+#
+# Program: recordlib.py
+#
+# Purpose:
+#
+#	Typed records of the insituload.py input files, so that a parser
+#	can hand its output to the loader in-process (assayloadlib.processRecords)
+#	instead of writing the files for the loader to read back.
+#
+#	The fields of each record are the fields of its input file, in file
+#	order, as strings; a record can be indexed like the tokens of a line.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import recordlib
+#
+#	yield recordlib.ProbePrep(assayID, probeID, prepType, hybridization,
+#		labelledWith, visualization)
+#	...
+#	recordlib.writeRecords(records, directory)
+#
+#	or, compact, with the fields that are the same in every record of
+#	a type written once to In_Situ_defaults.txt instead of on every line:
+#
+#	recordlib.writeRecords(records, directory,
+#		{recordlib.Specimen : {'genotypeID' : 'MGI:2166653', ...}, ...})
+#
+#	defaults = recordlib.readDefaults(directory + '/In_Situ_defaults.txt')
+#
+# Envvars:
+#
+# Inputs:
+#
+# Outputs:
+#
+# Exit Codes:
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	In compact output a field that equals its default is written empty;
+#	insituload.py reads the defaults file and fills the empty fields back
+#	in (assayloadlib.readInput()).
+#
+
+import os
+import shutil
+import collections
+import tabfilelib
+
+#globals
+
+TAB = '\t'		# tab
+CRT = '\n'		# carriage return/newline
+
+# In_Situ_probeprep.txt
+ProbePrep = collections.namedtuple('ProbePrep',
+    ['assayID', 'probeID', 'prepType', 'hybridization', 'labelledWith', 'visualization'])
+
+# In_Situ_assay.txt
+Assay = collections.namedtuple('Assay',
+    ['assayID', 'markerID', 'jnum', 'assayType', 'reporterGene', 'note', 'createdBy'])
+
+# In_Situ_specimen.txt
+Specimen = collections.namedtuple('Specimen',
+    ['assayID', 'specimenID', 'specimenLabel', 'genotypeID', 'age', 'ageNote', 'sex',
+     'fixation', 'embedding', 'hybridization', 'specimenNote'])
+
+# In_Situ_results.txt
+Result = collections.namedtuple('Result',
+    ['assayID', 'specimenID', 'resultID', 'strength', 'pattern', 'emapaID', 'structureTS',
+     'resultNote', 'imagePanes'])
+
+# record type : input file name
+fileNames = {
+    ProbePrep : 'In_Situ_probeprep.txt',
+    Assay : 'In_Situ_assay.txt',
+    Specimen : 'In_Situ_specimen.txt',
+    Result : 'In_Situ_results.txt',
+    }
+
+defaultsFileName = 'In_Situ_defaults.txt'
+
+# Purpose:  writes records to the insituload input files
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  see teeRecords()
+# Throws:   see teeRecords()
+
+def writeRecords(
+    records,		# records (iterable)
+    directory,		# output directory (str.
+    defaults = None	# record type : dictionary of field name : default value
+    ):
+
+    for record in teeRecords(records, directory, defaults):
+        pass
+
+# Purpose:  writes the defaults file, or removes a stale one
+# Returns:  dictionary of record type : list of (field position, default value)
+# Assumes:  nothing
+# Effects:  writes the defaults file in directory if there are defaults,
+#	    else removes it if it exists
+# Throws:   IOError if the file cannot be written
+#	    ValueError if a default is empty (an empty field is not a default)
+
+def writeDefaults(
+    directory,		# output directory (str.
+    defaults		# record type : dictionary of field name : default value
+    ):
+
+    defaultsFile = os.path.join(directory, defaultsFileName)
+    positions = {}
+
+    if not defaults:
+        if os.path.exists(defaultsFile):
+            os.remove(defaultsFile)
+        return positions
+
+    fp = open(defaultsFile, 'w')
+
+    for recordType, fields in defaults.items():
+        positions[recordType] = []
+        for field, value in fields.items():
+            if len(value) == 0:
+                fp.close()
+                raise ValueError('empty default for %s.%s' % (recordType.__name__, field))
+            position = recordType._fields.index(field)
+            positions[recordType].append((position, value))
+            fp.write(TAB.join([fileNames[recordType], str(position + 1), value]) + CRT)
+
+    fp.close()
+
+    return positions
+
+# Purpose:  reads a defaults file (see writeDefaults())
+# Returns:  dictionary of input file name : list of (0-based column, default value)
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   IOError/OSError if the file cannot be opened
+#	    ValueError if a line is invalid
+
+def readDefaults(
+    fileName		# defaults file name (str.
+    ):
+
+    defaults = {}
+
+    for lineNum, nFields in tabfilelib.validate(fileName, 3):
+        raise ValueError('Invalid Line (%d): %d fields, expected 3' % (lineNum, nFields))
+
+    for lineNum, (inFileName, field, value) in tabfilelib.readRows(fileName, 3):
+        try:
+            column = int(field) - 1
+        except ValueError:
+            column = -1
+        if column < 0 or len(value) == 0:
+            raise ValueError('Invalid Default (%d): %s %s' % (lineNum, inFileName, field))
+        if inFileName not in defaults:
+            defaults[inFileName] = []
+        defaults[inFileName].append((column, value))
+
+    return defaults
+
+# Purpose:  passes records through, writing them to the insituload input files
+# Returns:  generator of the records
+# Assumes:  nothing
+# Effects:  writes each record to the input file of its type in directory
+#	    as it is passed on; the files are closed once records is exhausted
+#	    writes (or removes) the defaults file (see writeDefaults()); a field
+#	    that equals its default is written empty
+# Throws:   IOError if a file cannot be written
+#	    ValueError if a field that has a default is empty
+
+def teeRecords(
+    records,		# records (iterable)
+    directory,		# output directory (str.
+    defaults = None	# record type : dictionary of field name : default value
+    ):
+
+    positions = writeDefaults(directory, defaults)
+
+    files = {}
+    for recordType, fileName in fileNames.items():
+        files[recordType] = open(os.path.join(directory, fileName), 'w')
+
+    try:
+        for record in records:
+            recordType = type(record)
+            if recordType in positions:
+                fields = list(record)
+                for position, value in positions[recordType]:
+                    if fields[position] == value:
+                        fields[position] = ''
+                    elif fields[position] == '':
+                        raise ValueError('empty %s.%s has a default' \
+                            % (recordType.__name__, recordType._fields[position]))
+                files[recordType].write(TAB.join(fields) + CRT)
+            else:
+                files[recordType].write(TAB.join(record) + CRT)
+            yield record
+    finally:
+        for fp in files.values():
+            fp.close()
+
+# Purpose:  concatenates the insituload input files of several directories
+# Returns:  nothing
+# Assumes:  the files of each directory were written by writeRecords()
+#	    with the same defaults
+# Effects:  writes each input file to directory: the file of each of
+#	    directories in turn
+# Throws:   IOError if a file cannot be read or written
+
+def catRecords(
+    directories,	# directories to concatenate, in order (list)
+    directory		# output directory (str.
+    ):
+
+    for fileName in fileNames.values():
+        outFile = open(os.path.join(directory, fileName), 'wb')
+        for d in directories:
+            inFile = open(os.path.join(d, fileName), 'rb')
+            shutil.copyfileobj(inFile, outFile, 16777216)
+            inFile.close()
+        outFile.close()
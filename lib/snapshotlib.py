@@ -0,0 +1,197 @@
+
+#
+# Program: snapshotlib.py
+#
+# Purpose:
+#
+#	A snapshot of the vocabularies, accession IDs, EMAPA terms and image
+#	panes that the GXD assay loads look up, so that input files can be
+#	validated offline (validateload.py), with no database connection.
+#
+#	The snapshot is written by snapshot.py from the database; reading
+#	it needs neither the database nor the database libraries.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import snapshotlib
+#
+#	snapshotlib.writeSnapshot('assayload.snapshot', ['J:80502'])	(online)
+#	snapshot = snapshotlib.readSnapshot('assayload.snapshot')
+#	if value not in snapshot['strength']:
+#		...
+#	if (jnum, figureLabel + '|' + paneLabel) not in snapshot['pane']:
+#		...
+#
+# Envvars:
+#
+# Inputs:
+#
+# Outputs:
+#
+#	Snapshot file, a tab-delimited file in the format:
+#		field 1: Kind (see kinds)
+#		field 2: Value
+#		field 3: Image Pane (figure label|pane label), for kind 'pane'
+#			 (field 2 is the J: of the pane)
+#	lines starting with '#' are comments
+#
+# Exit Codes:
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	Each kind is the set of values that a lookup of the loads accepts
+#	(the dictionaries of lib/gxdloadlib.py, loadlib.verify*()), dumped
+#	by one query; the values are compared exactly, as the loads do.
+#
+#	Image panes are dumped only for the references given to
+#	writeSnapshot(); each is listed as kind 'panereference', so that the
+#	panes of a reference that was not dumped are not reported as invalid.
+#
+#	writeSnapshot() imports the database libraries itself, so that
+#	readSnapshot() runs where they are not installed.
+#
+
+import os
+import tabfilelib
+
+#globals
+
+TAB = '\t'		# tab
+CRT = '\n'		# carriage return/newline
+
+vocabs = {		# kind : _Vocab_key of VOC_Term (see lib/gxdloadlib.py)
+    'label' : 152,
+    'pattern' : 153,
+    'gelcontrol' : 154,
+    'embedding' : 155,
+    'fixation' : 156,
+    'visualization' : 157,
+    'sense' : 159,
+    'secondary' : 160,
+    'strength' : 163,
+    'gelrnatype' : 172,
+    'gelunits' : 173,
+    'reportergene' : 14,
+    }
+
+accessions = {		# kind : _MGIType_key of the MGI IDs in ACC_Accession
+    'marker' : 2,
+    'probe' : 3,
+    'antibody' : 6,
+    'genotype' : 12,
+    }
+
+queries = {		# kind : query of its values (column 'value')
+    'assaytype' : 'select assayType as value from GXD_AssayType',
+    'reference' : 'select jnumID as value from BIB_Citation_Cache where jnumID is not null',
+    'user' : 'select login as value from MGI_User',
+    'emapa' : '''select a.accID as value from ACC_Accession a, VOC_Term t
+        where a._MGIType_key = 13 and a._LogicalDB_key = 169
+        and a._Object_key = t._Term_key and t._Vocab_key = 90''',
+    }
+
+for kind in vocabs:
+    queries[kind] = 'select term as value from VOC_Term where _Vocab_key = %d' % (vocabs[kind])
+
+for kind in accessions:
+    queries[kind] = '''select distinct accID as value from ACC_Accession
+        where _MGIType_key = %d and _LogicalDB_key = 1''' % (accessions[kind])
+
+kinds = sorted(list(queries) + ['preptype', 'hybridization', 'panereference', 'pane'])
+
+# Purpose:  writes a snapshot from the database
+# Returns:  dictionary of kind : number of values written
+# Assumes:  the database login has been set
+# Effects:  queries the database, writes the snapshot file
+# Throws:   IOError if the file cannot be written
+
+def writeSnapshot(
+    fileName,		# snapshot file name (str.
+    jnums = []		# J: numbers whose image panes are dumped (list of str.)
+    ):
+
+    import db
+    import mgi_utils
+    import gxdloadlib
+
+    counts = {}
+
+    fp = open(fileName + '.new', 'w')
+    fp.write('# assayload snapshot of %s.%s, %s\n' \
+        % (db.get_sqlServer(), db.get_sqlDatabase(), mgi_utils.date()))
+
+    # the lists that gxdloadlib checks without a query
+
+    for kind, values in (('preptype', gxdloadlib.prepTypeList),
+                         ('hybridization', gxdloadlib.hybridizationList)):
+        for value in values:
+            fp.write(kind + TAB + value + CRT)
+        counts[kind] = len(values)
+
+    for kind in sorted(queries):
+        counts[kind] = 0
+        for r in db.sql(queries[kind], 'auto'):
+            if r['value'] is not None:
+                fp.write(kind + TAB + r['value'] + CRT)
+                counts[kind] = counts[kind] + 1
+
+    counts['panereference'] = len(jnums)
+    counts['pane'] = 0
+
+    if len(jnums) > 0:
+        for jnum in jnums:
+            fp.write('panereference' + TAB + jnum + CRT)
+        results = db.sql('''select c.jnumID, i.figureLabel, p.paneLabel
+            from BIB_Citation_Cache c, IMG_Image i, IMG_ImagePane p
+            where c.jnumID in (%s)
+            and c._Refs_key = i._Refs_key
+            and i._Image_key = p._Image_key
+            ''' % (','.join(["'%s'" % (j) for j in jnums])), 'auto')
+        for r in results:
+            paneLabel = r['paneLabel']
+            if paneLabel == None:
+                paneLabel = ''
+            fp.write('pane' + TAB + r['jnumID'] + TAB + r['figureLabel'] + '|' + paneLabel + CRT)
+            counts['pane'] = counts['pane'] + 1
+
+    fp.close()
+
+    # a failed dump leaves the previous snapshot in place
+    os.replace(fileName + '.new', fileName)
+
+    return counts
+
+# Purpose:  reads a snapshot
+# Returns:  dictionary of kind : set of values
+#	    the values of kind 'pane' are (J:, figure label|pane label) tuples
+#	    every kind is present, if empty
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   IOError/OSError if the file cannot be opened
+#	    ValueError if a line is invalid
+
+def readSnapshot(
+    fileName		# snapshot file name (str.
+    ):
+
+    snapshot = {}
+    for kind in kinds:
+        snapshot[kind] = set()
+
+    for lineNum, (kind, value, pane) in tabfilelib.readRows(fileName, 3):
+        if kind.startswith('#'):
+            continue
+        if kind not in snapshot or (kind == 'pane') != (len(pane) > 0):
+            raise ValueError('Invalid Snapshot Line (%d): %s' % (lineNum, kind))
+        if kind == 'pane':
+            snapshot[kind].add((value, pane))
+        else:
+            snapshot[kind].add(value)
+
+    return snapshot
@@ -0,0 +1,231 @@
+
+#
+# Program: sortlib.py
+#
+# Purpose:
+#
+#	Sort the rows of an input file by key columns within a memory
+#	budget (external merge sort), for the stages that group rows by
+#	input order (e.g. the structures of an in situ result).
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import sortlib
+#
+#	if not sortlib.isSorted(tabfilelib.readRows(fileName, 3), (0, 1, 2)):
+#		rows = sortlib.sortRows(rows, (0, 1, 2), 256 * 1048576)
+#	for lineNum, tokens in rows:
+#		...
+#
+# Envvars:
+#
+# Inputs:
+#
+# Outputs:
+#
+#	temporary run files, removed once the rows are merged
+#
+# Exit Codes:
+#
+# Assumes:
+#
+#	The fields do not contain tabs or newlines (they were read from a
+#	tab-delimited file).
+#
+# Bugs:
+#
+# Implementation:
+#
+#	Rows are sorted in memory until their estimated size reaches the
+#	budget; each sorted run is written to a temporary file and the runs
+#	are merged (heapq.merge), at most mergeWidth at a time.  If the rows
+#	fit, no file is written.
+#
+#	Keys are compared naturally (naturalKey()):  numeric IDs in numeric
+#	order, before other IDs.  The sort is stable (ties are in line number
+#	order), so a file that is already sorted keeps its order.
+#
+#	The modules that only a sort that does not fit uses are imported
+#	when it needs them, so that isSorted() costs no imports.
+#
+
+import os
+
+#globals
+
+TAB = '\t'		# tab
+CRT = '\n'		# carriage return/newline
+
+mergeWidth = 64		# maximum number of runs merged at a time
+rowOverhead = 120	# estimated bytes per row, besides its field text
+fieldOverhead = 50	# estimated bytes per field, besides its text
+
+# Purpose:  orders an ID naturally
+# Returns:  sort key (tuple)
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def naturalKey(
+    value	# ID (str.
+    ):
+
+    if value.isdigit():
+        return (0, int(value), '')
+
+    return (1, 0, value)
+
+# Purpose:  builds the sort key of a row
+# Returns:  sort key (tuple)
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def rowKey(
+    tokens,	# the fields of the row (tuple)
+    columns	# 0-based key columns (tuple)
+    ):
+
+    return tuple([naturalKey(tokens[c]) for c in columns])
+
+# Purpose:  checks whether rows are already in key order
+# Returns:  1 if sorted, else 0
+# Assumes:  nothing
+# Effects:  consumes rows
+# Throws:   nothing
+
+def isSorted(
+    rows,	# (line number, tuple of fields) (iterable)
+    columns	# 0-based key columns of the fields (tuple)
+    ):
+
+    prevKey = None
+
+    for lineNum, tokens in rows:
+        key = rowKey(tokens, columns)
+        if prevKey is not None and key < prevKey:
+            return 0
+        prevKey = key
+
+    return 1
+
+# Purpose:  writes a sorted run
+# Returns:  run file name (str.
+# Assumes:  nothing
+# Effects:  writes a file in directory
+# Throws:   IOError if the file cannot be written
+
+def writeRun(
+    directory,	# directory of the run files (str.
+    rows	# (line number, tuple of fields), sorted (iterable)
+    ):
+
+    import tempfile
+
+    fd, runFileName = tempfile.mkstemp(suffix = '.run', dir = directory)
+
+    with os.fdopen(fd, 'w') as fp:
+        for lineNum, tokens in rows:
+            fp.write(str(lineNum) + TAB + TAB.join(tokens) + CRT)
+
+    return runFileName
+
+# Purpose:  reads a run
+# Returns:  generator of (line number, tuple of fields)
+# Assumes:  the file was written by writeRun()
+# Effects:  reads the file
+# Throws:   IOError if the file cannot be read
+
+def readRun(
+    runFileName		# run file name (str.
+    ):
+
+    with open(runFileName, 'r') as fp:
+        for line in fp:
+            fields = line[:-1].split(TAB)
+            yield int(fields[0]), tuple(fields[1:])
+
+# Purpose:  merges runs
+# Returns:  generator of (line number, tuple of fields), in key order
+# Assumes:  nothing
+# Effects:  reads the run files
+# Throws:   IOError if a file cannot be read
+
+def mergeRuns(
+    runFileNames,	# run file names (list)
+    columns		# 0-based key columns (tuple)
+    ):
+
+    import heapq
+
+    return heapq.merge(*[readRun(r) for r in runFileNames],
+        key = lambda row: (rowKey(row[1], columns), row[0]))
+
+# Purpose:  sorts rows by key columns within a memory budget
+# Returns:  generator of (line number, tuple of fields), in key order
+#	    (rows with the same key are in line number order)
+# Assumes:  the rows are in line number order
+# Effects:  writes the runs that do not fit in memory to a temporary
+#	    directory, which is removed when the generator is exhausted
+#	    or closed
+# Throws:   IOError if a run cannot be written
+
+def sortRows(
+    rows,		# (line number, tuple of fields) (iterable)
+    columns,		# 0-based key columns of the fields (tuple)
+    memory,		# memory budget in bytes (integer)
+    tempDir = None	# parent of the temporary directory; default is tempfile's
+    ):
+
+    sortKey = lambda row: rowKey(row[1], columns)
+
+    chunk = []
+    size = 0
+    runDir = None
+    runFileNames = []
+
+    try:
+        for row in rows:
+            chunk.append(row)
+            size = size + rowOverhead + sum(map(len, row[1])) + fieldOverhead * len(row[1])
+            if size >= memory:
+                if runDir is None:
+                    import tempfile
+                    runDir = tempfile.mkdtemp(prefix = 'sortlib.', dir = tempDir)
+                # sort() is stable, and the rows are in line number order
+                chunk.sort(key = sortKey)
+                runFileNames.append(writeRun(runDir, chunk))
+                chunk = []
+                size = 0
+
+        chunk.sort(key = sortKey)
+
+        if runDir is None:
+            for row in chunk:
+                yield row
+            return
+
+        if len(chunk) > 0:
+            runFileNames.append(writeRun(runDir, chunk))
+        chunk = []
+
+        # merge until at most mergeWidth runs remain
+
+        while len(runFileNames) > mergeWidth:
+            merged = []
+            for i in range(0, len(runFileNames), mergeWidth):
+                batch = runFileNames[i:i + mergeWidth]
+                merged.append(writeRun(runDir, mergeRuns(batch, columns)))
+                for runFileName in batch:
+                    os.remove(runFileName)
+            runFileNames = merged
+
+        for row in mergeRuns(runFileNames, columns):
+            yield row
+
+    finally:
+        if runDir is not None:
+            import shutil
+            shutil.rmtree(runDir, ignore_errors = True)
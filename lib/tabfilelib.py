@@ -0,0 +1,278 @@
+
+#
+# Program: tabfilelib.py
+#
+# Purpose:
+#
+#	Read the tab-delimited input files of the GXD loads.
+#
+#	The file is memory-mapped and read a block of lines at a time, so
+#	memory use does not grow with the file (readlines() held the whole
+#	file); only the columns the caller uses are split out of a line,
+#	and column counts can be validated for the whole file in one pass
+#	before any row is processed, so that every bad line is reported
+#	at once.
+#
+#	A file may be gzip or Zstandard compressed (fileName.gz/.zst;
+#	see lib/compresslib.py); it is then decompressed as a stream.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import tabfilelib
+#
+#	badLines = tabfilelib.validate(fileName, nColumns)
+#	for lineNum, fields in tabfilelib.readRows(fileName, nColumns):
+#		...
+#	for lineNum, (assayID, note) in tabfilelib.readRows(fileName, 6, (0, 5)):
+#		...
+#	for lineNum, fields in tabfilelib.readRows(fileName, nColumns, defaults = [(6, 'Not Specified')]):
+#		...
+#
+# Envvars:
+#
+# Inputs:
+#
+#	a tab-delimited file, one row per line; fileName, or if it does not
+#	exist, fileName.gz or fileName.zst
+#
+# Outputs:
+#
+# Exit Codes:
+#
+# Assumes:
+#
+#	The file is not modified while it is being read.
+#
+# Bugs:
+#
+# Implementation:
+#
+#	Each block (blockSize bytes, cut at a newline) is decoded and split
+#	into lines with one call each; a line is split with
+#	str.split(TAB, maxsplit) so that the columns to the right of the last
+#	column used are never split apart.  The rows are tuples.
+#
+#	A plain file is memory-mapped and cut into blocks in place; a
+#	compressed file is read blockSize bytes at a time, and the partial
+#	line at the end of each read is carried over to the next block.
+#
+
+import mmap
+import itertools
+
+#globals
+
+TAB = '\t'		# tab
+CRT = '\n'		# carriage return/newline
+
+encoding = 'utf-8'	# input file encoding
+blockSize = 16777216	# bytes decoded at a time
+
+# Purpose:  memory-maps a file
+# Returns:  mmap, or None if the file is empty
+# Assumes:  nothing
+# Effects:  opens the file
+# Throws:   IOError/OSError if the file cannot be opened
+
+def mapFile(
+    fileName	# file name (str.
+    ):
+
+    with open(fileName, 'rb') as fp:
+        try:
+            return mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            # cannot map an empty file
+            return None
+
+# Purpose:  iterates over a file a block of whole lines at a time
+# Returns:  generator of bytes, each ending with a newline, except
+#	    perhaps the last
+# Assumes:  nothing
+# Effects:  reads the file (compresslib.findFile(fileName))
+# Throws:   IOError/OSError if the file cannot be opened
+
+def byteBlocks(
+    fileName	# file name (str.
+    ):
+
+    import compresslib
+
+    fileName = compresslib.findFile(fileName)
+
+    if compresslib.isCompressed(fileName):
+        fp = compresslib.openFile(fileName, 'rb')
+        try:
+            rest = b''
+            while True:
+                data = fp.read(blockSize)
+                if len(data) == 0:
+                    break
+                data = rest + data
+                newline = data.rfind(b'\n')
+                if newline < 0:
+                    # a line longer than a block
+                    rest = data
+                    continue
+                rest = data[newline + 1:]
+                yield data[:newline + 1]
+            if len(rest) > 0:
+                yield rest
+        finally:
+            fp.close()
+        return
+
+    mm = mapFile(fileName)
+    if mm is None:
+        return
+
+    size = len(mm)
+    start = 0
+
+    try:
+        while start < size:
+
+            end = start + blockSize
+
+            if end >= size:
+                end = size
+            else:
+                newline = mm.rfind(b'\n', start, end)
+                if newline < 0:
+                    # a line longer than a block
+                    newline = mm.find(b'\n', end)
+                if newline < 0:
+                    end = size
+                else:
+                    end = newline + 1
+
+            yield mm[start:end]
+
+            start = end
+    finally:
+        mm.close()
+
+# Purpose:  iterates over a file a block of whole lines at a time
+# Returns:  generator of (number of lines before the block, list of lines (str.))
+#	    the lines do not include the newline
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   IOError/OSError if the file cannot be opened
+#	    UnicodeDecodeError if the file is not in the input encoding;
+#	    its lineNum is the number of the line that is not
+
+def lineBlocks(
+    fileName	# file name (str.
+    ):
+
+    lineNum = 0
+
+    for block in byteBlocks(fileName):
+
+        try:
+            lines = block.decode(encoding).split(CRT)
+        except UnicodeDecodeError as e:
+            e.lineNum = lineNum + block.count(b'\n', 0, e.start) + 1
+            raise
+        del block
+
+        # the block ends with a newline, except perhaps at the end of the file
+        if lines[-1] == '':
+            lines.pop()
+
+        yield lineNum, lines
+
+        lineNum = lineNum + len(lines)
+
+# Purpose:  counts the lines of a file
+# Returns:  number of lines (integer)
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   IOError/OSError if the file cannot be opened
+
+def countLines(
+    fileName	# file name (str.
+    ):
+
+    count = 0
+    last = b'\n'
+
+    for block in byteBlocks(fileName):
+        count = count + block.count(b'\n')
+        last = block[-1:]
+
+    if last != b'\n':
+        count = count + 1
+
+    return count
+
+# Purpose:  validates the column count of every line of a file
+# Returns:  list of (line number, number of fields) of the lines
+#	    that have fewer than nColumns fields; empty if the file is valid
+# Assumes:  nothing
+# Effects:  reads the file
+# Throws:   IOError/OSError if the file cannot be opened
+#	    UnicodeDecodeError if the file is not in the input encoding (see lineBlocks())
+
+def validate(
+    fileName,	# file name (str.
+    nColumns	# minimum number of fields per line (integer)
+    ):
+
+    badLines = []
+    minTabs = nColumns - 1
+
+    for lineNum, lines in lineBlocks(fileName):
+        tabs = list(map(str.count, lines, itertools.repeat(TAB)))
+        if min(tabs) < minTabs:
+            for i in range(len(tabs)):
+                if tabs[i] < minTabs:
+                    badLines.append((lineNum + i + 1, tabs[i] + 1))
+
+    return badLines
+
+# Purpose:  reads the rows of a file
+# Returns:  generator of (line number, tuple of fields)
+#	    the fields are the first nColumns fields of the line,
+#	    or only the given columns, in the given order
+#	    an empty field of a column in defaults takes its default value
+# Assumes:  the file has been validated (lines with too few fields
+#	    are padded with empty fields)
+# Effects:  reads the file
+# Throws:   IOError/OSError if the file cannot be opened
+
+def readRows(
+    fileName,		# file name (str.
+    nColumns,		# number of fields per line to materialise (integer)
+    columns = None,	# 0-based columns to return (tuple); default is 0..nColumns-1
+    defaults = None	# list of (0-based column, default value); default is none
+    ):
+
+    if columns is None:
+        n = nColumns
+    else:
+        n = max(columns) + 1
+
+    if defaults is not None:
+        defaults = [d for d in defaults if d[0] < n]
+
+    padding = [''] * n
+
+    for lineNum, lines in lineBlocks(fileName):
+        for line in lines:
+            lineNum = lineNum + 1
+            fields = line.split(TAB, n)
+            if len(fields) > n:
+                del fields[n:]
+            elif len(fields) < n:
+                fields.extend(padding[len(fields):])
+            if defaults:
+                for column, value in defaults:
+                    if fields[column] == '':
+                        fields[column] = value
+            if columns is None:
+                yield lineNum, tuple(fields)
+            else:
+                yield lineNum, tuple([fields[c] for c in columns])
@@ -0,0 +1,111 @@
+
+#
+# Program: widematrixlib.py
+#
+# Purpose:
+#
+#	Transform a wide expression matrix (one row per gene, one column
+#	per reported tissue) into the long In_Situ_results.txt format
+#	read by insituload.py (one result per assay/tissue).
+#
+#	The header is parsed once into an index of the result columns:
+#	for each column, its result number and the pre-split MGI tissue,
+#	stage and flag of each tissue it translates to; labels that do not
+#	translate are all reported then, before any row is converted.
+#	A result cell is translated into its strength/pattern/note only
+#	the first time its code is seen (the screens use a handful of codes).
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	import widematrixlib
+#
+#	index, missing = widematrixlib.buildIndex(tissueLabels, tissueTrans)
+#	memo = {}
+#	for result, strength, pattern, tissue, stage, note in \
+#		widematrixlib.resultRows(cells, index, memo, code):
+#
+# Envvars:
+#
+# Inputs:
+#
+# Outputs:
+#
+# Exit Codes:
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	An index entry is a tuple:
+#		(column, result number (str.), tissue, theiler stage, flag)
+#	where column is the 0-based position of the cell in the row's
+#	result cells and flag is the third member of the tissue's translation
+#	(e.g. whether the tissue needs a special result note).  The entries
+#	are in column order, so a row is converted by one pass over the index.
+#
+#	code(cell, flag) returns (strength, pattern, result note);
+#	its results are kept in memo, keyed by (cell, flag).
+#
+
+# Purpose:  builds the index of the result columns from the header
+# Returns:  (list of index entries (see Implementation), in output order,
+#	     list of the labels that are not in tissueTrans)
+# Assumes:  nothing
+# Effects:  nothing
+# Throws:   nothing
+
+def buildIndex(
+    labels,		# tissue labels of the result columns, in column order (list)
+    tissueTrans		# label : list of (tissue, theiler stage, flag) (dictionary)
+    ):
+
+    index = []
+    missing = []
+
+    for i in range(len(labels)):
+
+        if labels[i] not in tissueTrans:
+            missing.append(labels[i])
+            continue
+
+        for tissue, theilerStage, f in tissueTrans[labels[i]]:
+            index.append((i, str(i + 1), tissue, theilerStage, f))
+
+    return index, missing
+
+# Purpose:  translates the result cells of one row of the matrix
+# Returns:  list of (result number, strength, pattern, tissue, theiler stage, result note)
+#	    (all str.), in index order
+# Assumes:  index was built by buildIndex() from the header of the matrix
+# Effects:  adds the translation of each new (cell, flag) to memo
+#	    index entries beyond the end of cells are skipped
+#	    (not every tissue was assayed)
+# Throws:   whatever code() throws for an unknown cell
+
+def resultRows(
+    cells,	# the row's result cells, in column order (list)
+    index,	# index of the result columns (list)
+    memo,	# (cell, flag) : (strength, pattern, result note) (dictionary)
+    code	# function(cell, flag) returning (strength, pattern, result note)
+    ):
+
+    nCells = len(cells)
+    rows = []
+
+    for column, result, tissue, theilerStage, f in index:
+
+        if column >= nCells:
+            continue
+
+        key = (cells[column], f)
+        if key not in memo:
+            memo[key] = code(cells[column], f)
+        strength, pattern, note = memo[key]
+
+        rows.append((result, strength, pattern, tissue, theilerStage, note))
+
+    return rows
@@ -0,0 +1,119 @@
+
+#
+# Program: refreshCaches.py
+#
+# Purpose:
+#
+#	Refresh the caches of the assays loaded by a load, for the keys of
+#	those assays only, instead of rebuilding the caches (see lib/postloadlib.py):
+#
+#	gxdexpression	the expression cache of each assay (ASSAYLOADCACHEJOBS at a time)
+#	mrkref		MRK_Reference of each marker (instead of mrkref.csh)
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	refreshCaches.py [-c cache[,cache...]] manifestFile
+#
+#	-c	the caches to refresh, in order; default is gxdexpression,mrkref
+#
+#	A load can also run this itself; see ASSAYLOADCACHES in lib/assayloadlib.py.
+#
+# Envvars:
+#
+#	ASSAYLOAD
+#	MGD_DBUSER
+#	MGD_DBPASSWORDFILE
+#	PYTHON
+#	MGICACHELOAD
+#	ASSAYLOADCACHEJOBS	gxdexpression.py runs at a time; default is 4
+#
+# Inputs:
+#
+#	the manifest file of the load (e.g. insituload.manifest)
+#
+# Outputs:
+#
+#	the number of keys refreshed and the elapsed time of each cache, to stdout
+#
+# Exit Codes:
+#
+#	0 on success, 1 on a usage error or if a refresh failed
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+
+import sys
+import os
+import getopt
+
+libpath = os.environ['ASSAYLOAD'] + '/lib'
+sys.path.insert(0, libpath)
+import postloadlib
+
+#globals
+
+usage = 'Usage: refreshCaches.py [-c cache[,cache...]] manifestFile\n'
+
+names = ['gxdexpression', 'mrkref']	# caches to refresh, in order
+
+# Purpose: prints error message and exits
+# Returns: nothing
+# Assumes: nothing
+# Effects: exits with exit status
+# Throws: nothing
+
+def exit(
+    status,          # numeric exit status (integer)
+    message = None   # exit message (str.
+    ):
+
+    if message is not None:
+        sys.stderr.write('\n' + str(message) + '\n')
+
+    sys.exit(status)
+
+#
+# Main
+#
+
+try:
+    options, args = getopt.getopt(sys.argv[1:], 'c:')
+except getopt.GetoptError:
+    exit(1, usage)
+
+for option, value in options:
+    if option == '-c':
+        names = str.split(value, ',')
+
+if len(args) != 1:
+    exit(1, usage)
+
+for name in names:
+    if name not in postloadlib.caches:
+        exit(1, 'Unknown cache %s; one of %s\n' % (name, ', '.join(sorted(postloadlib.caches))))
+
+if not postloadlib.expressionJobs.isdigit() or int(postloadlib.expressionJobs) == 0:
+    exit(1, 'Invalid ASSAYLOADCACHEJOBS:  %s\n' % (postloadlib.expressionJobs))
+
+postloadlib.init()
+
+try:
+    keys = postloadlib.loadedKeys(args[0])
+except (IOError, OSError):
+    exit(1, 'Could not open file %s\n' % (args[0]))
+
+failures = 0
+for name, refreshed, failed, seconds in postloadlib.refreshCaches(keys, names):
+    print('%s\t%d refreshed\t%d failed\t%.2f sec' % (name, refreshed, failed, seconds))
+    failures = failures + failed
+
+if failures > 0:
+    exit(1, '%d cache refresh(es) failed\n' % (failures))
+
+sys.exit(0)
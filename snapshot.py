@@ -0,0 +1,114 @@
+
+#
+# Program: snapshot.py
+#
+# Purpose:
+#
+#	Write a snapshot of the vocabularies, accession IDs, EMAPA terms and
+#	image panes that the GXD assay loads look up, for offline validation
+#	of input files with validateload.py (see lib/snapshotlib.py).
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	snapshot.py [-r J:#####[,J:#####...]] snapshotFile
+#
+#	-r	the references whose image panes are included
+#		(the references of the input files to be validated)
+#
+# Envvars:
+#
+#	ASSAYLOAD
+#	MGD_DBUSER
+#	MGD_DBPASSWORDFILE
+#
+# Inputs:
+#
+# Outputs:
+#
+#	the snapshot file
+#	the number of values of each kind, to stdout
+#
+# Exit Codes:
+#
+#	0 on success, 1 on a usage error or an unknown reference
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	A snapshot is only as current as the database it was taken from;
+#	take a new one when the vocabularies change or a reference gets
+#	new image panes.
+#
+
+import sys
+import os
+import getopt
+import db
+
+libpath = os.environ['ASSAYLOAD'] + '/lib'
+sys.path.insert(0, libpath)
+import snapshotlib
+
+#globals
+
+usage = 'Usage: snapshot.py [-r J:#####[,J:#####...]] snapshotFile\n'
+
+jnums = []		# references whose image panes are included
+
+# Purpose: prints error message and exits
+# Returns: nothing
+# Assumes: nothing
+# Effects: exits with exit status
+# Throws: nothing
+
+def exit(
+    status,          # numeric exit status (integer)
+    message = None   # exit message (str.
+    ):
+
+    if message is not None:
+        sys.stderr.write('\n' + str(message) + '\n')
+
+    sys.exit(status)
+
+#
+# Main
+#
+
+try:
+    options, args = getopt.getopt(sys.argv[1:], 'r:')
+except getopt.GetoptError:
+    exit(1, usage)
+
+for option, value in options:
+    if option == '-r':
+        jnums = jnums + str.split(value, ',')
+
+if len(args) != 1:
+    exit(1, usage)
+
+db.set_sqlUser(os.environ['MGD_DBUSER'])
+db.set_sqlPasswordFromFile(os.environ['MGD_DBPASSWORDFILE'])
+
+if len(jnums) > 0:
+    results = db.sql('select jnumID from BIB_Citation_Cache where jnumID in (%s)' \
+        % (','.join(["'%s'" % (j) for j in jnums])), 'auto')
+    found = set([r['jnumID'] for r in results])
+    missing = [j for j in jnums if j not in found]
+    if len(missing) > 0:
+        exit(1, 'Invalid Reference(s): %s\n' % (', '.join(missing)))
+
+try:
+    counts = snapshotlib.writeSnapshot(args[0], jnums)
+except (IOError, OSError):
+    exit(1, 'Could not write file %s\n' % (args[0]))
+
+for kind in sorted(counts):
+    print('%s\t%d' % (kind, counts[kind]))
+
+sys.exit(0)
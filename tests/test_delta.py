@@ -0,0 +1,89 @@
+
+#
+# Program: test_delta.py
+#
+# Purpose:
+#
+#	Fingerprint the in situ input files the way a delta load
+#	(ASSAYLOADDELTA=yes) does, so that a change to lib/deltalib.py
+#	cannot break the delta loads unnoticed.
+#
+# Usage:
+#
+#	python -m unittest discover tests
+#
+# Assumes:
+#
+#	Nothing; deltalib does not use the database or the MGI python
+#	libraries.
+#
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
+
+import deltalib
+
+prepLines = [
+    '1\tMGI:1\tRNA\tAntisense\tDigoxigenin\tAlkaline phosphatase',
+    '2\tMGI:1\tRNA\tAntisense\tDigoxigenin\tAlkaline phosphatase',
+    ]
+assayLines = [
+    '1\tMGI:2\tJ:1\tRNA In Situ\t\tnote\tuser',
+    '2\tMGI:2\tJ:1\tRNA In Situ\t\t\tuser',
+    ]
+specimenLines = [
+    '1\t1\tA\tMGI:3\tembryonic day 14.5\t\tNot Specified\t4% Paraformaldehyde\tCryosection\tsection\t',
+    '1\t2\tB\tMGI:3\tembryonic day 14.5\t\tNot Specified\t4% Paraformaldehyde\tCryosection\tsection\t',
+    '2\t1\tA\tMGI:3\tembryonic day 14.5\t\tNot Specified\t4% Paraformaldehyde\tCryosection\tsection\t',
+    '2\t2\tB\tMGI:3\tembryonic day 14.5\t\tNot Specified\t4% Paraformaldehyde\tCryosection\tsection\t',
+    ]
+resultsLines = [
+    '1\t1\t1\tStrong\tHomogeneous\tEMAPA:1\t22\t\t',
+    '1\t2\t1\tWeak\tHomogeneous\tEMAPA:2\t22\t\t',
+    '2\t1\t1\tStrong\tHomogeneous\tEMAPA:1\t22\t\t',
+    '2\t2\t1\tWeak\tHomogeneous\tEMAPA:3\t22\t\t',
+    ]
+
+class DeltaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.delta = {
+            'assay' : self.write('In_Situ_assay.txt', assayLines),
+            'prep' : self.write('In_Situ_probeprep.txt', prepLines),
+            'labels' : (self.write('In_Situ_specimen.txt', specimenLines), 2),
+            'structures' : (self.write('In_Situ_results.txt', resultsLines), 5, 6),
+            }
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, fileName, lines):
+        fileName = os.path.join(self.dir, fileName)
+        fp = open(fileName, 'w')
+        fp.write('\n'.join(lines) + '\n')
+        fp.close()
+        return fileName
+
+    def testInputFingerprints(self):
+        inputs = deltalib.inputFingerprints(self.delta)
+        self.assertEqual(sorted(inputs), ['1', '2'])
+        self.assertEqual(inputs['1'][0], 'J:1')
+        self.assertNotEqual(inputs['1'][1], inputs['2'][1])
+
+    def testLineOrder(self):
+        # the fingerprint of the database assay is built from unordered rows
+        inputs = deltalib.inputFingerprints(self.delta)
+        self.write('In_Situ_specimen.txt', list(reversed(specimenLines)))
+        self.write('In_Situ_results.txt', list(reversed(resultsLines)))
+        self.assertEqual(deltalib.inputFingerprints(self.delta), inputs)
+        self.assertEqual(inputs['1'][1], deltalib.fingerprint('J:1', 'MGI:2', 'MGI:1',
+            ['B', 'A'], ['EMAPA:2:22', 'EMAPA:1:22']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+
+#
+# Program: test_rnainsitu14.py
+#
+# Purpose:
+#
+#	Convert a sample RNA In Situ 14.5 screen (tests/data/rnainsitu14/tr4800)
+#	with insituconvert.py and mappings/rnainsitu14.ini, and compare the
+#	output with that of the original rnainsitu14.py on the same screen
+#	(tests/data/rnainsitu14/baseline), so that the mapping cannot drift
+#	from the translation it replaced (e.g. the empty strength code of
+#	the cell " U").
+#
+# Usage:
+#
+#	python -m unittest discover tests
+#
+# Assumes:
+#
+#	Nothing; the converter does not use the database or the MGI python
+#	libraries.
+#
+#	The original rnainsitu14.py wrote files in an older insituload
+#	layout:  a Label Coverage field (field 6) in In_Situ_probeprep.txt,
+#	no Assay Note field (field 6) in In_Situ_assay.txt and no Image
+#	Panes field (field 9) in In_Situ_results.txt; baselineRows() puts
+#	the baseline files in the current layout before they are compared.
+#
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+
+assayload = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+dataDir = os.path.join(assayload, 'tests', 'data', 'rnainsitu14')
+
+outputFiles = ['In_Situ_probeprep.txt', 'In_Situ_assay.txt', 'In_Situ_specimen.txt', 'In_Situ_results.txt']
+
+def readRows(fileName):
+    fp = open(fileName, 'r')
+    rows = [str.split(line[:-1], '\t') for line in fp.readlines()]
+    fp.close()
+    return rows
+
+def baselineRows(fileName):
+    rows = readRows(os.path.join(dataDir, 'baseline', fileName))
+    if fileName == 'In_Situ_probeprep.txt':
+        return [r[:5] + r[6:] for r in rows]
+    if fileName == 'In_Situ_assay.txt':
+        return [r[:5] + [''] + r[5:] for r in rows]
+    if fileName == 'In_Situ_results.txt':
+        return [r + [''] for r in rows]
+    return rows
+
+class RnaInSitu14Test(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        shutil.copytree(os.path.join(dataDir, 'tr4800'), os.path.join(self.dir, 'tr4800'))
+
+        # the full output, not the compact one the baseline cannot be compared with
+
+        fp = open(os.path.join(assayload, 'mappings', 'rnainsitu14.ini'), 'r')
+        mapping = str.replace(fp.read(), '\ncompact = yes\n', '\ncompact = no\n')
+        fp.close()
+        self.mappingFileName = os.path.join(self.dir, 'rnainsitu14.ini')
+        fp = open(self.mappingFileName, 'w')
+        fp.write(mapping)
+        fp.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testBaseline(self):
+        env = dict(os.environ, ASSAYLOAD = assayload, INSITU14DATADIR = self.dir, CREATEDBY = 'tester')
+        p = subprocess.run([sys.executable, os.path.join(assayload, 'insituconvert.py'), self.mappingFileName],
+            env = env, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, universal_newlines = True)
+        self.assertEqual(p.returncode, 0, p.stdout)
+        self.assertIn('Cannot find MGI ID in Probe file: MGI:104', p.stdout)
+
+        for fileName in outputFiles:
+            self.assertEqual(readRows(os.path.join(self.dir, fileName)), baselineRows(fileName), fileName)
+
+if __name__ == '__main__':
+    unittest.main()
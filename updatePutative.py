@@ -0,0 +1,119 @@
+
+#
+# Program: updatePutative.py
+#
+# Purpose:
+#
+#	Update the Putative Relationships to Encodes between the
+#	Probes/Markers of GXD Assays (via Probe Prep), for a batch of
+#	references (see lib/postloadlib.py).
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	updatePutative.py J:##### [J:##### ...]
+#	updatePutative.py -m manifestFile
+#
+#	-m	the references of the assays loaded by the load of the
+#		manifest file (e.g. insituload.manifest)
+#
+#	A load can also run this itself, for the references it loaded;
+#	see ASSAYLOADPUTATIVE in lib/assayloadlib.py.
+#
+# Envvars:
+#
+#	ASSAYLOAD
+#	MGD_DBUSER
+#	MGD_DBPASSWORDFILE
+#
+# Inputs:
+#
+# Outputs:
+#
+#	the number of relationships updated for each reference, to stdout
+#
+# Exit Codes:
+#
+#	0 on success, 1 on a usage error or an unknown reference
+#
+# Assumes:
+#
+# Bugs:
+#
+# Implementation:
+#
+#	Replaces the body of updatePutative.csh, which handled one
+#	J: number per run and is now a wrapper for this program.
+#
+
+import sys
+import os
+import getopt
+
+libpath = os.environ['ASSAYLOAD'] + '/lib'
+sys.path.insert(0, libpath)
+import postloadlib
+
+#globals
+
+usage = '''Usage: updatePutative.py J:##### [J:##### ...]
+       updatePutative.py -m manifestFile
+'''
+
+# Purpose: prints error message and exits
+# Returns: nothing
+# Assumes: nothing
+# Effects: exits with exit status
+# Throws: nothing
+
+def exit(
+    status,          # numeric exit status (integer)
+    message = None   # exit message (str.
+    ):
+
+    if message is not None:
+        sys.stderr.write('\n' + str(message) + '\n')
+
+    sys.exit(status)
+
+#
+# Main
+#
+
+try:
+    options, args = getopt.getopt(sys.argv[1:], 'm:')
+except getopt.GetoptError:
+    exit(1, usage)
+
+manifestFileName = None
+for option, value in options:
+    if option == '-m':
+        manifestFileName = value
+
+if (manifestFileName is None) == (len(args) == 0):
+    exit(1, usage)
+
+postloadlib.init()
+
+if manifestFileName is None:
+    refs, missing = postloadlib.referenceKeys(args)
+    if len(missing) > 0:
+        exit(1, 'Invalid Reference(s): %s\n' % (', '.join(missing)))
+else:
+    try:
+        refs = postloadlib.loadedReferences(manifestFileName)
+    except (IOError, OSError):
+        exit(1, 'Could not open file %s\n' % (manifestFileName))
+
+postloadlib.setReferences(refs)
+counts = postloadlib.updatePutative()
+
+total = 0
+for jnum in sorted(refs):
+    n = counts.get(refs[jnum], 0)
+    total = total + n
+    print('%s\t%d putative relationship(s) updated to encodes' % (jnum, n))
+print('Total\t%d putative relationship(s) updated for %d reference(s)' % (total, len(refs)))
+
+sys.exit(0)
@@ -0,0 +1,334 @@
+
+#
+# Program: validateload.py
+#
+# Purpose:
+#
+#	Validate the input files of a GXD assay load offline, against a
+#	snapshot of the database (see snapshot.py, lib/snapshotlib.py),
+#	with no database connection:  every field that the load looks up
+#	(vocabulary terms, accession IDs, EMAPA terms, image panes, ages),
+#	the column counts, and the assay/specimen/lane IDs between the files.
+#
+#	Every error of every file is reported, not just the first.
+#
+# Requirements Satisfied by This Program:
+#
+# Usage:
+#
+#	validateload.py -s snapshotFile insitu|immuno|gel [directory]
+#
+#	directory	the directory of the input files; default is the
+#			current directory
+#
+# Envvars:
+#
+#	ASSAYLOAD
+#
+# Inputs:
+#
+#	the snapshot file
+#	the input files of the load (see insituload.py, immunoload.py, gelload.py),
+#	and In_Situ_defaults.txt if there is one (insitu)
+#
+# Outputs:
+#
+#	each error, as "file name: error", to stdout
+#	the number of lines and errors of each file, to stdout
+#
+# Exit Codes:
+#
+#	0 if the input files are valid, 1 on errors or a usage error
+#
+# Assumes:
+#
+#	The snapshot was taken from the database the files will be loaded
+#	into, with -r for the references of the files (image panes).
+#
+# Bugs:
+#
+# Implementation:
+#
+#	The lookups are those of lib/assayloadlib.py, gelload.py and
+#	immunoload.py, against the sets of the snapshot instead of the
+#	database; agelib.ageMinMax() needs no database.
+#
+#	The image panes of a reference that is not in the snapshot are
+#	not validated (reported once per reference, not as errors); the
+#	load skips a pane it cannot find.
+#
+
+import sys
+import os
+import getopt
+import agelib
+
+libpath = os.environ['ASSAYLOAD'] + '/lib'
+sys.path.insert(0, libpath)
+import tabfilelib
+import recordlib
+import snapshotlib
+
+#globals
+
+usage = 'Usage: validateload.py -s snapshotFile insitu|immuno|gel [directory]\n'
+
+# load type : list of (file type, input file name), in load order
+
+loads = {
+    'insitu' : [
+        ('probeprep', 'In_Situ_probeprep.txt'),
+        ('assay', 'In_Situ_assay.txt'),
+        ('specimen', 'In_Situ_specimen.txt'),
+        ('results', 'In_Situ_results.txt'),
+        ],
+    'immuno' : [
+        ('antibodyprep', 'Immuno_prep.txt'),
+        ('assay', 'Immuno_assay.txt'),
+        ('specimen', 'Immuno_specimen.txt'),
+        ('results', 'Immuno_results.txt'),
+        ],
+    'gel' : [
+        ('probeprep', 'RT_PCR_probeprep.txt'),
+        ('assay', 'RT_PCR_assay.txt'),
+        ('gellane', 'RT_PCR_gellane.txt'),
+        ('gelband', 'RT_PCR_gelband.txt'),
+        ],
+    }
+
+defaultsFileNames = {	# load type : defaults file name (see recordlib.writeDefaults())
+    'insitu' : recordlib.defaultsFileName,
+    }
+
+# file type : (number of columns, list of (0-based column, snapshot kind, name))
+# the name is the one the load reports an invalid value with
+
+checks = {
+    'probeprep' : (6, [
+        (1, 'probe', 'Probe'),
+        (2, 'preptype', 'Prep Type'),
+        (3, 'sense', 'Sense'),
+        (4, 'label', 'Label'),
+        (5, 'visualization', 'Visualization'),
+        ]),
+    'antibodyprep' : (4, [
+        (1, 'antibody', 'Antibody'),
+        (2, 'secondary', 'Secondary'),
+        (3, 'label', 'Label'),
+        ]),
+    'assay' : (7, [
+        (1, 'marker', 'Marker'),
+        (2, 'reference', 'Reference'),
+        (3, 'assaytype', 'Assay Type'),
+        (6, 'user', 'User'),
+        ]),
+    'specimen' : (11, [
+        (3, 'genotype', 'Genotype'),
+        (7, 'fixation', 'Fixation Method'),
+        (8, 'embedding', 'Embedding Method'),
+        (9, 'hybridization', 'Hybridization'),
+        ]),
+    'results' : (9, [
+        (3, 'strength', 'Strength'),
+        (4, 'pattern', 'Pattern'),
+        (5, 'emapa', 'Structure'),
+        ]),
+    'gellane' : (13, [
+        (3, 'genotype', 'Genotype'),
+        (4, 'gelrnatype', 'RNA Type'),
+        (5, 'gelcontrol', 'Control'),
+        ]),
+    'gelband' : (8, [
+        (4, 'gelunits', 'Units'),
+        (5, 'strength', 'Strength'),
+        ]),
+    }
+
+snapshot = {}		# see snapshotlib.readSnapshot()
+errors = []		# (input file name, error) of the current file
+assayReference = {}	# Assay ID : J: of the assay file
+specimens = set()	# Assay ID:Specimen ID of the specimen file
+lanes = set()		# Assay ID:Lane ID of the gel lane file
+unvalidatedPanes = set()	# references whose image panes are not in the snapshot
+
+# Purpose: prints error message and exits
+# Returns: nothing
+# Assumes: nothing
+# Effects: exits with exit status
+# Throws: nothing
+
+def exit(
+    status,          # numeric exit status (integer)
+    message = None   # exit message (str.
+    ):
+
+    if message is not None:
+        sys.stderr.write('\n' + str(message) + '\n')
+
+    sys.exit(status)
+
+# Purpose:  records an error of the current file
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  appends to global errors
+# Throws:   nothing
+
+def error(
+    message	# error (str.
+    ):
+
+    errors.append(message)
+
+# Purpose:  checks the fields of one line that the load looks up
+# Returns:  nothing
+# Assumes:  nothing
+# Effects:  records an error for each field that is not in the snapshot
+#	    and for the IDs that are not in the files read before
+# Throws:   nothing
+
+def checkLine(
+    fileType,	# file type (see checks) (str.
+    lineNum,	# line number (integer)
+    tokens	# the fields of the line (tuple)
+    ):
+
+    for column, kind, name in checks[fileType][1]:
+        if tokens[column] not in snapshot[kind]:
+            error('Invalid %s (%d): %s' % (name, lineNum, tokens[column]))
+
+    assayID = tokens[0]
+
+    if fileType == 'assay':
+        reporterGene = tokens[4]
+        if len(reporterGene) > 0 and reporterGene not in snapshot['reportergene']:
+            error('Invalid Reporter Gene (%d): %s' % (lineNum, reporterGene))
+        assayReference[assayID] = tokens[2]
+        return
+
+    if fileType in ('specimen', 'gellane') and assayID not in assayReference:
+        error('Cannot find Assay key (%d): %s' % (lineNum, assayID))
+
+    if fileType == 'specimen':
+        age = tokens[4]
+        ageMin, ageMax = agelib.ageMinMax(age)
+        if ageMin < 0 or ageMax < 0:
+            error('Invalid Age (%d): %s' % (lineNum, age))
+        specimens.add('%s:%s' % (assayID, tokens[1]))
+
+    elif fileType == 'results':
+        key = '%s:%s' % (assayID, tokens[1])
+        if key not in specimens:
+            error('Cannot find Assay:Specimen key (%d): %s' % (lineNum, key))
+        jnum = assayReference.get(assayID)
+        if jnum is not None and jnum not in snapshot['panereference']:
+            unvalidatedPanes.add(jnum)
+        elif jnum is not None:
+            for image in str.split(tokens[8], ','):
+                if len(image) > 0 and (jnum, image) not in snapshot['pane']:
+                    error('Invalid Image Pane (%d): %s %s' % (lineNum, jnum, image))
+
+    elif fileType == 'gellane':
+        # a lane has a structure only if it is not a control
+        if tokens[5] == 'No' and tokens[11] not in snapshot['emapa']:
+            error('Invalid Structure (%d): %s' % (lineNum, tokens[11]))
+        lanes.add('%s:%s' % (assayID, tokens[1]))
+
+    elif fileType == 'gelband':
+        key = '%s:%s' % (assayID, tokens[1])
+        if key not in lanes:
+            error('Cannot find Assay:Lane key (%d): %s' % (lineNum, key))
+
+# Purpose:  validates one input file
+# Returns:  (number of lines, list of errors)
+# Assumes:  the files before it in load order have been validated
+# Effects:  reads the file
+# Throws:   nothing
+
+def validateFile(
+    fileType,		# file type (see checks) (str.
+    inFileName,		# input file name (str.
+    defaults		# list of (0-based column, default value) of the file
+    ):
+
+    global errors
+
+    errors = []
+    nColumns = checks[fileType][0]
+    nLines = 0
+
+    try:
+        for lineNum, nFields in tabfilelib.validate(inFileName, nColumns):
+            error('Invalid Line (%d): %d fields, expected %d' % (lineNum, nFields, nColumns))
+
+        # a short line is padded, so that its other fields are validated too
+        for lineNum, tokens in tabfilelib.readRows(inFileName, nColumns, defaults = defaults):
+            checkLine(fileType, lineNum, tokens)
+            nLines = lineNum
+    except (IOError, OSError):
+        error('Could not open file')
+    except UnicodeDecodeError as e:
+        error('Invalid Encoding (%d): expected %s' % (e.lineNum, tabfilelib.encoding))
+
+    return nLines, errors
+
+#
+# Main
+#
+
+try:
+    options, args = getopt.getopt(sys.argv[1:], 's:')
+except getopt.GetoptError:
+    exit(1, usage)
+
+snapshotFileName = None
+for option, value in options:
+    if option == '-s':
+        snapshotFileName = value
+
+if snapshotFileName is None or len(args) not in (1, 2) or args[0] not in loads:
+    exit(1, usage)
+
+loadType = args[0]
+if len(args) == 2:
+    directory = args[1]
+else:
+    directory = '.'
+
+try:
+    snapshot = snapshotlib.readSnapshot(snapshotFileName)
+except (IOError, OSError):
+    exit(1, 'Could not open file %s\n' % (snapshotFileName))
+except ValueError as message:
+    exit(1, '%s in %s\n' % (message, snapshotFileName))
+
+inputDefaults = {}
+if loadType in defaultsFileNames:
+    defaultsFileName = os.path.join(directory, defaultsFileNames[loadType])
+    if os.path.exists(defaultsFileName):
+        try:
+            inputDefaults = recordlib.readDefaults(defaultsFileName)
+        except (IOError, OSError):
+            exit(1, 'Could not open file %s\n' % (defaultsFileName))
+        except ValueError as message:
+            exit(1, '%s in %s\n' % (message, defaultsFileName))
+
+totalErrors = 0
+summary = []
+
+for fileType, inFileName in loads[loadType]:
+    nLines, fileErrors = validateFile(fileType, os.path.join(directory, inFileName),
+        inputDefaults.get(inFileName))
+    for message in fileErrors:
+        print('%s: %s' % (inFileName, message))
+    summary.append('%s\t%d lines\t%d errors' % (inFileName, nLines, len(fileErrors)))
+    totalErrors = totalErrors + len(fileErrors)
+
+for jnum in sorted(unvalidatedPanes):
+    print('Image Panes of %s not validated; not in snapshot %s' % (jnum, snapshotFileName))
+
+print('\n'.join(summary))
+
+if totalErrors > 0:
+    exit(1, '%d error(s) in the %s input files\n' % (totalErrors, loadType))
+
+sys.exit(0)